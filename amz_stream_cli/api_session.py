@@ -0,0 +1,145 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import email.utils
+import hashlib
+import json
+import os
+import random
+import stat
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRYABLE_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY_S = 0.5
+DEFAULT_MAX_DELAY_S = 30.0
+# Tokens are treated as expired slightly early so that a request never goes out with a token about to lapse
+TOKEN_EXPIRY_SKEW_S = 60
+
+_session = None
+
+
+def get_session() -> requests.Session:
+    """
+    Returns a process wide session, so that TLS connections to the API are pooled and reused across clients.
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        _session.mount("https://", adapter)
+    return _session
+
+
+def default_cache_dir() -> str:
+    if "AMZ_STREAM_CLI_CACHE_DIR" in os.environ:
+        return os.environ["AMZ_STREAM_CLI_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "amz_stream_cli")
+
+
+class TokenCache:
+    """
+    Caches Login with Amazon access tokens on disk until they expire.
+
+    Cache files are only readable by the current user. Files with looser permissions are ignored,
+    as they may have been tampered with.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.clock = clock
+
+    def _path(self, credentials: dict) -> str:
+        key = hashlib.sha256(
+            (credentials.get("client_id", "") + ":" + credentials.get("refresh_token", "")).encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.cache_dir, f"token-{key}.json")
+
+    def get(self, credentials: dict) -> Optional[str]:
+        path = self._path(credentials)
+        try:
+            if os.stat(path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+                return None
+            with open(path, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if cached.get("expires_at", 0) - TOKEN_EXPIRY_SKEW_S <= self.clock():
+            return None
+        return cached.get("access_token")
+
+    def put(self, credentials: dict, access_token: str, expires_in: int) -> None:
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        path = self._path(credentials)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"access_token": access_token, "expires_at": self.clock() + int(expires_in)}, f)
+        os.replace(tmp_path, path)
+
+
+def _retry_after_s(response: requests.Response) -> Optional[float]:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay_s(attempt: int, base_delay_s: float = DEFAULT_BASE_DELAY_S, max_delay_s: float = DEFAULT_MAX_DELAY_S):
+    """Full jitter exponential backoff."""
+    return random.uniform(0, min(max_delay_s, base_delay_s * 2**attempt))
+
+
+def send_with_retries(
+    send: Callable[[], requests.Response],
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    sleep: Callable[[float], None] = time.sleep,
+) -> requests.Response:
+    """
+    Calls send until it returns a non retryable response or max_retries is exhausted.
+
+    Throttled (429) and server error (5xx) responses are retried with jittered backoff. A Retry-After header
+    sent by the API takes precedence over the computed delay.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            response = send()
+        except requests.exceptions.ConnectionError:
+            if attempt == max_retries:
+                raise
+            sleep(backoff_delay_s(attempt))
+            continue
+
+        if response.status_code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+            return response
+
+        retry_after = _retry_after_s(response)
+        sleep(min(retry_after, DEFAULT_MAX_DELAY_S) if retry_after is not None else backoff_delay_s(attempt))
+    return response
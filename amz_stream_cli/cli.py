@@ -14,40 +14,97 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from amz_stream_cli import __app_name__, __version__
-from amz_stream_cli.stream_api import (
+from amz_stream_cli.stack_config import DEFAULT_CONFIG_PATH, consumer_stacks, load_config
+from amz_stream_cli.stream_types import (
     AdvertisingApiRegion,
-    Stream,
     DataSet,
     SubscriptionUpdateEntityStatus,
 )
-from rich.console import Console
-from rich.table import Table
-from typing import Optional
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, List, Optional
 import json
+import sys
 import typer
 
+if TYPE_CHECKING:
+    from amz_stream_cli.stream_api import Stream
+    from rich.console import Console
+    from rich.table import Table
+
 
 app = typer.Typer()
-console = Console()
+
+# rich and ad_api are slow to import, so they are only loaded once a command needs them.
+# This keeps --version, --help and json/ndjson output fast when the CLI is called from scripts.
+
+
+@lru_cache(maxsize=None)
+def _console() -> "Console":
+    from rich.console import Console
+
+    return Console()
+
+
+def _stream(api_region: AdvertisingApiRegion) -> "Stream":
+    from amz_stream_cli.stream_api import Stream
+
+    return Stream(marketplace=AdvertisingApiRegion.get_marketplace(api_region))
+
+
+class OutputFormat(str, Enum):
+    table = "table"
+    json = "json"
+    ndjson = "ndjson"
+
+
+def _output_option():
+    return typer.Option(
+        OutputFormat.table,
+        "--output",
+        "-o",
+        help="Output format. json and ndjson write raw API payloads to stdout for use in scripts.",
+    )
 
 
 def _version_callback(value: bool) -> None:
     if value:
-        console.print(f"{__app_name__} v{__version__}")
+        typer.echo(f"{__app_name__} v{__version__}")
         raise typer.Exit()
 
 
-def _subscription_to_table(subscription: dict) -> Optional[Table]:
+def _subscription_to_table(subscription: dict) -> Optional["Table"]:
+    from rich.table import Table
+
     table = Table("Field", "Value")
     for field, value in subscription.items():
         table.add_row(field, value)
     return table
 
 
-def _check_for_error_message_from_api(payload: dict) -> None:
+def _write_json(payload, stream=None) -> None:
+    stream = stream or sys.stdout
+    stream.write(json.dumps(payload))
+    stream.write("\n")
+
+
+def _write_records(records: Iterable[dict], output: OutputFormat) -> None:
+    """Writes records straight to stdout, bypassing rich rendering."""
+    if output == OutputFormat.ndjson:
+        for record in records:
+            _write_json(record)
+    else:
+        _write_json(list(records))
+
+
+def _check_for_error_message_from_api(payload: dict, output: OutputFormat = OutputFormat.table) -> None:
     if "message" in payload:
-        console.print("Error message received from API:")
-        console.print(payload["message"])
+        if output == OutputFormat.table:
+            _console().print("Error message received from API:")
+            _console().print(payload["message"])
+        else:
+            _write_json(payload, sys.stderr)
         raise typer.Exit(-1)
 
 
@@ -90,6 +147,7 @@ def create_subscription(
         help="Additional details associated with the subscription.",
     ),
     data_set_id: DataSet = typer.Option(..., "--data-set-id", "-d", help="DataSet ID to use for the subscription."),
+    output: OutputFormat = _output_option(),
 ) -> None:
     create_subscription_dict = {
         "destinationArn": destination_arn,
@@ -99,13 +157,14 @@ def create_subscription(
     if notes is not None:
         create_subscription_dict["notes"] = notes
 
-    response = Stream(marketplace=AdvertisingApiRegion.get_marketplace(api_region)).create_subscription(
-        body=json.dumps(create_subscription_dict)
-    )
-    _check_for_error_message_from_api(response.payload)
+    response = _stream(api_region).create_subscription(body=json.dumps(create_subscription_dict))
+    _check_for_error_message_from_api(response.payload, output)
+    if output != OutputFormat.table:
+        _write_json(response.payload)
+        return
     table = _subscription_to_table(response.payload)
-    console.print("Subscription has been created!")
-    console.print(table)
+    _console().print("Subscription has been created!")
+    _console().print(table)
 
 
 @app.command(
@@ -136,17 +195,21 @@ def update_subscription(
         ..., "--status", "-t", help="Status to use for the subscription."
     ),
     notes: str = typer.Option(None, "--notes", "-n", help="Notes for the subscription update."),
+    output: OutputFormat = _output_option(),
 ) -> None:
     update_subscription_dict = {"status": status.value}
     if notes is not None:
         update_subscription_dict["notes"] = notes
 
-    response = Stream(marketplace=AdvertisingApiRegion.get_marketplace(api_region)).update_subscription(
+    response = _stream(api_region).update_subscription(
         subscription_id=subscription_id, body=json.dumps(update_subscription_dict)
     )
 
-    _check_for_error_message_from_api(response.payload)
-    console.print("Subscription ID {} has been {}!".format(subscription_id, status.value))
+    _check_for_error_message_from_api(response.payload, output)
+    if output != OutputFormat.table:
+        _write_json({"subscriptionId": subscription_id, "status": status.value, **(response.payload or {})})
+        return
+    _console().print("Subscription ID {} has been {}!".format(subscription_id, status.value))
 
 
 @app.command(
@@ -171,14 +234,16 @@ def get_subscription(
         "-s",
         help="Subscription ID of the subscription to be fetched.",
     ),
+    output: OutputFormat = _output_option(),
 ) -> None:
-    response = Stream(marketplace=AdvertisingApiRegion.get_marketplace(api_region)).get_subscription(
-        subscription_id=subscription_id
-    )
-    _check_for_error_message_from_api(response.payload)
+    response = _stream(api_region).get_subscription(subscription_id=subscription_id)
+    _check_for_error_message_from_api(response.payload, output)
     subscription = response.payload["subscription"]
+    if output != OutputFormat.table:
+        _write_json(subscription)
+        return
     table = _subscription_to_table(subscription)
-    console.print(table)
+    _console().print(table)
 
 
 @app.command(
@@ -195,19 +260,446 @@ def list_subscriptions(
         "--api-region",
         "-a",
         help="Advertising API region to use. Default is NA.",
-    )
+    ),
+    output: OutputFormat = _output_option(),
 ) -> None:
-    response = Stream(marketplace=AdvertisingApiRegion.get_marketplace(api_region)).list_subscriptions()
-    _check_for_error_message_from_api(response.payload)
+    response = _stream(api_region).list_subscriptions()
+    _check_for_error_message_from_api(response.payload, output)
+    if output != OutputFormat.table:
+        _write_records(response.payload.get("subscriptions", []), output)
+        return
     if "subscriptions" in response.payload:
         subscriptions = sorted(response.payload["subscriptions"], key=lambda d: d["status"])
         for subscription in subscriptions:
-            console.print(_subscription_to_table(subscription))
+            _console().print(_subscription_to_table(subscription))
     else:
-        console.print("No subscriptions found!")
+        _console().print("No subscriptions found!")
         raise typer.Exit()
 
 
+@app.command(
+    name="health",
+    short_help="Reports queue depth, message age and DLQ depth of all deployed consumer stacks.",
+    help="""
+             Exits with code 1 when any queue is past the given thresholds.\n
+             Example usage:\n
+             python -m amz_stream_cli health --max-age 600 --advertising-region NA
+             """,
+)
+def pipeline_health(
+    config_path: str = typer.Option(
+        DEFAULT_CONFIG_PATH, "--config", help="Path to the stream infrastructure configuration file."
+    ),
+    advertising_regions: Optional[List[AdvertisingApiRegion]] = typer.Option(
+        None, "--advertising-region", "-a", help="Only check stacks of this advertising region. Can be repeated."
+    ),
+    data_set_ids: Optional[List[DataSet]] = typer.Option(
+        None, "--data-set-id", "-d", help="Only check stacks of this dataset. Can be repeated."
+    ),
+    max_age_s: float = typer.Option(300, "--max-age", help="Maximum age in seconds of the oldest queued message."),
+    max_messages: int = typer.Option(10000, "--max-messages", help="Maximum number of queued messages."),
+    max_dlq_messages: int = typer.Option(0, "--max-dlq-messages", help="Maximum number of messages in a DLQ."),
+    concurrency: int = typer.Option(16, "--concurrency", help="Number of concurrent AWS API calls."),
+    output: OutputFormat = _output_option(),
+) -> None:
+    from amz_stream_cli import aws_clients, health
+
+    stacks = consumer_stacks(
+        load_config(config_path),
+        [region.value for region in advertising_regions or []],
+        [data_set_id.value for data_set_id in data_set_ids or []],
+    )
+    report = health.pipeline_health(stacks, aws_clients.client, max_workers=concurrency)
+    breaches = health.threshold_breaches(report, health.HealthThresholds(max_age_s, max_messages, max_dlq_messages))
+
+    if output != OutputFormat.table:
+        _write_records((queue_health.as_dict() for queue_health in report), output)
+    else:
+        from rich.table import Table
+
+        table = Table("Stack", "Queue", "Messages", "In flight", "Oldest message age (s)")
+        for queue_health in report:
+            age = queue_health.oldest_message_age_s
+            table.add_row(
+                queue_health.queue.stack.stack_name,
+                queue_health.queue.role.value,
+                str(queue_health.messages),
+                str(queue_health.messages_in_flight),
+                "-" if age is None else f"{age:.0f}",
+            )
+        _console().print(table)
+        for breach in breaches:
+            _console().print(f"[red]{breach}[/red]")
+
+    if breaches:
+        raise typer.Exit(1)
+
+
+class RedriveQueue(str, Enum):
+    ingress = "ingress"
+    confirmation = "confirmation"
+
+
+@app.command(
+    name="redrive",
+    short_help="Moves messages from consumer stack dead-letter queues back to their source queues.",
+    help="""
+             Example usage:\n
+             python -m amz_stream_cli redrive --advertising-region NA --data-set-id sp-traffic --rate 50\n
+             python -m amz_stream_cli redrive --dry-run --message-type SubscriptionConfirmation
+             """,
+)
+def redrive_dlq(
+    config_path: str = typer.Option(
+        DEFAULT_CONFIG_PATH, "--config", help="Path to the stream infrastructure configuration file."
+    ),
+    advertising_regions: Optional[List[AdvertisingApiRegion]] = typer.Option(
+        None, "--advertising-region", "-a", help="Only redrive stacks of this advertising region. Can be repeated."
+    ),
+    data_set_ids: Optional[List[DataSet]] = typer.Option(
+        None, "--data-set-id", "-d", help="Only redrive stacks of this dataset. Can be repeated."
+    ),
+    queue: RedriveQueue = typer.Option(RedriveQueue.ingress, "--queue", help="Queue whose DLQ is redriven."),
+    message_types: Optional[List[str]] = typer.Option(
+        None,
+        "--message-type",
+        help="Only redrive messages with this value in the body Type field. Use '' for messages without a Type. "
+        "Can be repeated.",
+    ),
+    rate: float = typer.Option(100, "--rate", help="Maximum number of messages re-sent per second."),
+    receivers: int = typer.Option(8, "--receivers", help="Number of parallel DLQ receivers per queue."),
+    visibility_timeout_s: int = typer.Option(
+        300, "--visibility-timeout", help="Seconds received messages stay hidden while being redriven."
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", help="Receive and count messages by Type without re-sending or deleting them."
+    ),
+    output: OutputFormat = _output_option(),
+) -> None:
+    from amz_stream_cli import aws_clients, health, redrive
+    from amz_stream_cli.rate_limit import TokenBucket
+
+    stacks = consumer_stacks(
+        load_config(config_path),
+        [region.value for region in advertising_regions or []],
+        [data_set_id.value for data_set_id in data_set_ids or []],
+    )
+    target_role = health.QueueRole(queue.value)
+    source_role = next(source for source, target in redrive.REDRIVE_TARGETS.items() if target == target_role)
+    rate_limiter = TokenBucket(rate)
+
+    results = []
+    for stack in stacks:
+        queues = {
+            stack_queue.role: stack_queue.queue_url
+            for stack_queue in health.discover_queues(
+                stack, aws_clients.client("cloudformation", stack.installation_region)
+            )
+        }
+        if source_role not in queues or target_role not in queues:
+            continue
+
+        def on_progress(stats, stack_name=stack.stack_name):
+            if output == OutputFormat.table:
+                _console().print(
+                    f"{stack_name}: received {stats.received}, redriven {stats.redriven}, skipped {stats.skipped}",
+                    end="\r",
+                )
+
+        stats = redrive.Redrive(
+            aws_clients.client("sqs", stack.installation_region),
+            queues[source_role],
+            queues[target_role],
+            rate_limiter,
+            message_types=message_types,
+            dry_run=dry_run,
+            visibility_timeout_s=visibility_timeout_s,
+            on_progress=on_progress,
+        ).run(receivers)
+        results.append({"stackName": stack.stack_name, "dryRun": dry_run, **stats.as_dict()})
+
+    if output != OutputFormat.table:
+        _write_records(results, output)
+    else:
+        from rich.table import Table
+
+        table = Table("Stack", "Received", "Redriven", "Skipped", "Failed", "Types")
+        for result in results:
+            table.add_row(
+                result["stackName"],
+                str(result["received"]),
+                str(result["redriven"]),
+                str(result["skipped"]),
+                str(result["failed"]),
+                ", ".join(f"{message_type or '<none>'}: {count}" for message_type, count in result["types"].items()),
+            )
+        _console().print(table)
+
+    if any(result["failed"] for result in results):
+        raise typer.Exit(1)
+
+
+def _single_stack(config_path: str, advertising_region: AdvertisingApiRegion, data_set_id: DataSet):
+    (stack,) = consumer_stacks(load_config(config_path), [advertising_region.value], [data_set_id.value])
+    return stack
+
+
+@app.command(
+    name="replay",
+    short_help="Republishes landing zone history of a dataset to its fanout topic.",
+    help="""
+             Replays the records landed between --start (inclusive) and --end (exclusive), in UTC, to the data fanout
+             topic so that newly added subscribers receive history. Replayed records are not landed again.
+             Progress is checkpointed, run the same command again to resume an interrupted replay.\n
+             Example usage:\n
+             python -m amz_stream_cli replay -a NA -d sp-traffic --start 2024-05-01T00:00:00 --end 2024-05-02T00:00:00
+             """,
+)
+def replay_landing_zone(
+    config_path: str = typer.Option(
+        DEFAULT_CONFIG_PATH, "--config", help="Path to the stream infrastructure configuration file."
+    ),
+    advertising_region: AdvertisingApiRegion = typer.Option(
+        ..., "--advertising-region", "-a", help="Advertising region of the consumer stack."
+    ),
+    data_set_id: DataSet = typer.Option(..., "--data-set-id", "-d", help="Dataset of the consumer stack."),
+    start: datetime = typer.Option(..., "--start", help="Start of the replayed time range, in UTC."),
+    end: datetime = typer.Option(..., "--end", help="End of the replayed time range, in UTC."),
+    rate: float = typer.Option(200, "--rate", help="Maximum number of records published per second."),
+    workers: int = typer.Option(8, "--workers", help="Number of partitions replayed in parallel."),
+    checkpoint_path: str = typer.Option(
+        None, "--checkpoint", help="Checkpoint file. Defaults to a file named after the stack and time range."
+    ),
+    output: OutputFormat = _output_option(),
+) -> None:
+    from amz_stream_cli import aws_clients, landing_zone, replay
+    from amz_stream_cli.rate_limit import TokenBucket
+    from amz_stream_cli.stack_config import find_resource, stack_resources
+
+    stack = _single_stack(config_path, advertising_region, data_set_id)
+    resources = stack_resources(stack, aws_clients.client("cloudformation", stack.installation_region))
+    bucket = find_resource(resources, "AWS::S3::Bucket", "StorageLZ")
+    topic_arn = find_resource(resources, "AWS::SNS::Topic", "FanoutDataTopic")
+    if bucket is None or topic_arn is None:
+        _console().print(f"{stack.stack_name} is not deployed with the sqs delivery method, nothing to replay to.")
+        raise typer.Exit(-1)
+
+    checkpoint_path = checkpoint_path or f"replay-{stack.stack_name}-{start:%Y%m%d%H}-{end:%Y%m%d%H}.json"
+    prefixes = [
+        landing_zone.partition_prefix(stack.data_set_id, hour) for hour in landing_zone.partition_hours(start, end)
+    ]
+
+    def on_progress(stats):
+        if output == OutputFormat.table:
+            _console().print(f"objects {stats.objects}, published {stats.published}, failed {stats.failed}", end="\r")
+
+    stats = replay.Replay(
+        aws_clients.client("s3", stack.installation_region),
+        aws_clients.client("sns", stack.installation_region),
+        bucket,
+        topic_arn,
+        TokenBucket(rate),
+        replay.ReplayCheckpoint(checkpoint_path),
+        on_progress=on_progress,
+    ).run(prefixes, workers)
+
+    result = {
+        "stackName": stack.stack_name,
+        "partitions": len(prefixes),
+        "checkpoint": checkpoint_path,
+        **stats.as_dict(),
+    }
+    if output != OutputFormat.table:
+        _write_json(result)
+    else:
+        _console().print(
+            f"Replayed {result['published']} records from {result['objects']} objects in {result['partitions']} "
+            f"partitions of {stack.stack_name}, {result['failed']} failed."
+        )
+
+    if stats.failed:
+        raise typer.Exit(1)
+
+
+@app.command(
+    name="compact",
+    short_help="Merges the small objects of closed landing zone partitions into a few large sorted objects.",
+    help="""
+             Compacts every hourly partition within the lookback window which Firehose no longer writes to and which
+             has objects that were not compacted yet. Each compacted partition gets a _compacted.json manifest.\n
+             Example usage:\n
+             python -m amz_stream_cli compact -a NA -d sp-traffic --lookback-hours 48\n
+             python -m amz_stream_cli compact --local-root ./landing-zone -d sp-traffic
+             """,
+)
+def compact_landing_zone(
+    config_path: str = typer.Option(
+        DEFAULT_CONFIG_PATH, "--config", help="Path to the stream infrastructure configuration file."
+    ),
+    advertising_regions: Optional[List[AdvertisingApiRegion]] = typer.Option(
+        None, "--advertising-region", "-a", help="Only compact stacks of this advertising region. Can be repeated."
+    ),
+    data_set_ids: Optional[List[DataSet]] = typer.Option(
+        None, "--data-set-id", "-d", help="Only compact stacks of this dataset. Can be repeated."
+    ),
+    lookback_hours: int = typer.Option(24, "--lookback-hours", help="Number of closed hours to consider."),
+    grace_minutes: int = typer.Option(
+        20, "--grace-minutes", help="Minutes after the end of an hour before its partition is considered closed."
+    ),
+    sort_field: str = typer.Option("time_window_start", "--sort-field", help="Record field to sort objects by."),
+    target_object_mb: int = typer.Option(256, "--target-object-mb", help="Uncompressed size of compacted objects."),
+    local_root: str = typer.Option(
+        None, "--local-root", help="Compact a landing zone copy in this local directory instead of the S3 bucket."
+    ),
+    output: OutputFormat = _output_option(),
+) -> None:
+    from datetime import timedelta
+    from amz_stream_cli import aws_clients, compaction, landing_zone
+    from amz_stream_cli.object_store import LocalObjectStore, S3ObjectStore
+    from amz_stream_cli.stack_config import find_resource, stack_resources
+
+    stacks = consumer_stacks(
+        load_config(config_path),
+        [region.value for region in advertising_regions or []],
+        [data_set_id.value for data_set_id in data_set_ids or []],
+    )
+    hours = compaction.closed_partition_hours(timedelta(hours=lookback_hours), timedelta(minutes=grace_minutes))
+
+    stores = []
+    if local_root is not None:
+        stores = [
+            (data_set_id, LocalObjectStore(local_root)) for data_set_id in sorted({s.data_set_id for s in stacks})
+        ]
+    else:
+        for stack in stacks:
+            resources = stack_resources(stack, aws_clients.client("cloudformation", stack.installation_region))
+            bucket = find_resource(resources, "AWS::S3::Bucket", "StorageLZ")
+            if bucket is not None:
+                stores.append(
+                    (stack.data_set_id, S3ObjectStore(aws_clients.client("s3", stack.installation_region), bucket))
+                )
+
+    results = []
+    for data_set_id, store in stores:
+        compactor = compaction.PartitionCompactor(store, sort_field, target_object_mb * 1024 * 1024)
+        for hour in hours:
+            prefix = landing_zone.partition_prefix(data_set_id, hour)
+            manifest = compactor.compact(prefix)
+            if manifest is not None:
+                results.append(
+                    {
+                        "partition": prefix,
+                        "records": manifest["records"],
+                        "objects": len(manifest["objects"]),
+                        "replaced": len(manifest["replaced"]),
+                    }
+                )
+
+    if output != OutputFormat.table:
+        _write_records(results, output)
+    elif not results:
+        _console().print("No partitions to compact.")
+    else:
+        from rich.table import Table
+
+        table = Table("Partition", "Records", "Compacted objects", "Replaced objects")
+        for result in results:
+            table.add_row(result["partition"], str(result["records"]), str(result["objects"]), str(result["replaced"]))
+        _console().print(table)
+
+
+class PlanDeliveryMethod(str, Enum):
+    sqs = "sqs"
+    firehose = "firehose"
+
+
+@app.command(
+    name="plan",
+    short_help="Estimates the capacity and cost of the consumer stacks and recommends their settings.",
+    help="""
+             Reads expectedRecordsPerSecond and averageRecordBytes of each dataset from the configuration file,
+             models SQS requests, lambda invocations and GB-seconds, SNS publishes, Firehose records and S3 objects
+             for the current and the recommended settings. Datasets without expectedRecordsPerSecond are skipped.\n
+             Example usage:\n
+             python -m amz_stream_cli plan --advertising-region NA\n
+             python -m amz_stream_cli plan --diff | git apply
+             """,
+)
+def plan_capacity(
+    config_path: str = typer.Option(
+        DEFAULT_CONFIG_PATH, "--config", help="Path to the stream infrastructure configuration file."
+    ),
+    advertising_regions: Optional[List[AdvertisingApiRegion]] = typer.Option(
+        None, "--advertising-region", "-a", help="Only plan stacks of this advertising region. Can be repeated."
+    ),
+    data_set_ids: Optional[List[DataSet]] = typer.Option(
+        None, "--data-set-id", "-d", help="Only plan stacks of this dataset. Can be repeated."
+    ),
+    delivery_method: PlanDeliveryMethod = typer.Option(
+        PlanDeliveryMethod.sqs, "--delivery-type", help="Delivery type the stacks are deployed with."
+    ),
+    max_landing_delay_s: int = typer.Option(
+        900, "--max-landing-delay", help="Longest time in seconds records may be buffered before reaching S3."
+    ),
+    diff: bool = typer.Option(False, "--diff", help="Only write the suggested configuration diff."),
+    output: OutputFormat = _output_option(),
+) -> None:
+    from amz_stream_cli import planner
+
+    stacks = consumer_stacks(
+        load_config(config_path),
+        [region.value for region in advertising_regions or []],
+        [data_set_id.value for data_set_id in data_set_ids or []],
+    )
+    plans = planner.plan(stacks, delivery_method.value, max_landing_delay_s)
+    with open(config_path, "r") as f:
+        config_diff = planner.config_diff(f.read(), plans, config_path)
+
+    if diff:
+        sys.stdout.write(config_diff)
+    elif output != OutputFormat.table:
+        _write_records((dataset_plan.as_dict() for dataset_plan in plans), output)
+    elif not plans:
+        _console().print("No dataset sets expectedRecordsPerSecond.")
+    else:
+        from rich.table import Table
+
+        table = Table(
+            "Stack",
+            "Settings",
+            "Records/s",
+            "Records/invocation",
+            "Invocations/s",
+            "Concurrency",
+            "GB-s/s",
+            "SQS requests/s",
+            "SNS publishes/s",
+            "S3 objects/hour",
+            "Object MB",
+            "Landing delay (s)",
+            "USD/month",
+        )
+        for dataset_plan in plans:
+            for label, estimate in (("current", dataset_plan.current), ("recommended", dataset_plan.recommended)):
+                table.add_row(
+                    dataset_plan.stack.stack_name,
+                    label,
+                    f"{estimate.firehose_records:.0f}",
+                    f"{estimate.messages_per_invocation:.1f}",
+                    f"{estimate.invocations:.1f}",
+                    f"{estimate.concurrency:.1f}",
+                    f"{estimate.gb_seconds:.2f}",
+                    f"{estimate.sqs_requests:.1f}",
+                    f"{estimate.sns_publish_requests:.1f}",
+                    f"{estimate.s3_objects_per_hour:.0f}",
+                    f"{estimate.average_object_mb:.1f}",
+                    f"{estimate.landing_delay_s:.0f}",
+                    f"{estimate.monthly_cost_usd:,.0f}",
+                )
+        _console().print(table)
+        _console().print(config_diff or "The current settings are already the recommended ones.")
+
+
 @app.callback()
 def main(
     version: Optional[bool] = typer.Option(
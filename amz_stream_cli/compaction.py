@@ -0,0 +1,215 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import gzip
+import heapq
+import json
+import os
+import tempfile
+import uuid
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
+
+from amz_stream_cli.landing_zone import is_canary_line, is_data_object, iter_lines, partition_hours, truncate_to_hour
+
+# Written last, after all compacted objects. Names starting with _ are skipped by Athena, Glue and Spark readers.
+MANIFEST_NAME = "_compacted.json"
+COMPACTED_OBJECT_PREFIX = "compacted-"
+DEFAULT_SORT_FIELD = "time_window_start"
+DEFAULT_TARGET_OBJECT_BYTES = 256 * 1024 * 1024
+DEFAULT_SORT_BUFFER_BYTES = 64 * 1024 * 1024
+# Firehose buffers for at most 900 seconds, an hour is only closed once its last buffer has been flushed
+DEFAULT_GRACE_PERIOD = timedelta(minutes=20)
+
+
+def manifest_key(prefix: str) -> str:
+    return prefix + MANIFEST_NAME
+
+
+def read_manifest(store, prefix: str) -> Optional[dict]:
+    try:
+        with closing(store.open(manifest_key(prefix))) as f:
+            return json.loads(f.read())
+    except (FileNotFoundError, KeyError):
+        return None
+    except Exception as error:
+        if "NoSuchKey" in str(error):
+            return None
+        raise
+
+
+def closed_partition_hours(
+    lookback: timedelta, grace_period: timedelta = DEFAULT_GRACE_PERIOD, now: datetime = None
+) -> List[datetime]:
+    """Lists the hours within the lookback window to which Firehose no longer delivers, oldest first."""
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    end = truncate_to_hour(now - grace_period)
+    return partition_hours(end - lookback, end)
+
+
+def _sort_value(line: bytes, sort_field: str) -> str:
+    try:
+        value = json.loads(line).get(sort_field)
+    except (ValueError, AttributeError):
+        value = None
+    return "" if value is None else str(value)
+
+
+def _write_sorted_runs(lines: Iterator[bytes], sort_field: str, buffer_bytes: int, tmp_dir: str) -> List[str]:
+    """First phase of an external merge sort: spills sorted runs of at most buffer_bytes to temporary files."""
+    runs = []
+
+    def spill(buffer):
+        buffer.sort(key=lambda line: _sort_value(line, sort_field))
+        path = os.path.join(tmp_dir, f"run-{len(runs)}")
+        with open(path, "wb") as f:
+            for line in buffer:
+                f.write(line)
+                f.write(b"\n")
+        runs.append(path)
+
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_bytes:
+            spill(buffer)
+            buffer, size = [], 0
+    if buffer:
+        spill(buffer)
+    return runs
+
+
+def _merge_runs(run_paths: List[str], sort_field: str) -> Iterator[bytes]:
+    files = [open(path, "rb") for path in run_paths]
+    try:
+        yield from heapq.merge(
+            *[(line.rstrip(b"\n") for line in f) for f in files], key=lambda line: _sort_value(line, sort_field)
+        )
+    finally:
+        for f in files:
+            f.close()
+
+
+class PartitionCompactor:
+    """
+    Merges the objects of one landing zone partition into a few large, sorted, gzip compressed NDJSON objects.
+
+    The compacted objects are uploaded first, then the partition manifest listing them is written, and only then are
+    the original objects deleted. The manifest is the commit point: compacted objects it does not list are leftovers
+    of an interrupted run and are discarded, originals it lists as replaced are deleted on the next run.
+    Compacting a partition again only merges the objects which arrived since.
+    """
+
+    def __init__(
+        self,
+        store,
+        sort_field: str = DEFAULT_SORT_FIELD,
+        target_object_bytes: int = DEFAULT_TARGET_OBJECT_BYTES,
+        sort_buffer_bytes: int = DEFAULT_SORT_BUFFER_BYTES,
+    ):
+        self.store = store
+        self.sort_field = sort_field
+        self.target_object_bytes = target_object_bytes
+        self.sort_buffer_bytes = sort_buffer_bytes
+
+    def _pending_inputs(self, prefix: str, manifest: Optional[dict]) -> List[str]:
+        committed = {entry["key"] for entry in manifest["objects"]} if manifest else set()
+        replaced = set(manifest["replaced"]) if manifest else set()
+
+        inputs, discarded = [], []
+        for summary in self.store.list(prefix):
+            key = summary["Key"]
+            name = key[len(prefix) :]
+            if "/" in name or not is_data_object(key) or key in committed:
+                continue
+            if key in replaced or name.startswith(COMPACTED_OBJECT_PREFIX):
+                discarded.append(key)
+            else:
+                inputs.append(key)
+        self.store.delete(discarded)
+        return inputs
+
+    def _write_outputs(self, lines: Iterator[bytes], prefix: str, run_id: str, tmp_dir: str) -> List[dict]:
+        outputs = []
+        current = None
+
+        def close_current():
+            current["file"].close()
+            key = f"{prefix}{COMPACTED_OBJECT_PREFIX}{run_id}-{len(outputs):04d}.ndjson.gz"
+            self.store.put_file(key, current["path"])
+            outputs.append(
+                {
+                    "key": key,
+                    "records": current["records"],
+                    "bytes": os.path.getsize(current["path"]),
+                    "minSortValue": current["min"],
+                    "maxSortValue": current["max"],
+                }
+            )
+            os.remove(current["path"])
+
+        for line in lines:
+            if current is None:
+                path = os.path.join(tmp_dir, f"output-{len(outputs)}.ndjson.gz")
+                current = {"path": path, "file": gzip.open(path, "wb"), "records": 0, "size": 0, "min": None}
+            sort_value = _sort_value(line, self.sort_field)
+            current["file"].write(line)
+            current["file"].write(b"\n")
+            current["records"] += 1
+            current["size"] += len(line) + 1
+            current["min"] = sort_value if current["min"] is None else current["min"]
+            current["max"] = sort_value
+            if current["size"] >= self.target_object_bytes:
+                close_current()
+                current = None
+        if current is not None:
+            close_current()
+        return outputs
+
+    def compact(self, prefix: str) -> Optional[dict]:
+        """Compacts a partition, returns its new manifest or None if there was nothing to compact."""
+        manifest = read_manifest(self.store, prefix)
+        inputs = self._pending_inputs(prefix, manifest)
+        if not inputs:
+            return None
+
+        previous_outputs = [entry["key"] for entry in manifest["objects"]] if manifest else []
+        replaced = previous_outputs + inputs
+        run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:8]
+
+        def all_lines():
+            for key in replaced:
+                with closing(self.store.open(key)) as f:
+                    for line in iter_lines(f, gzipped=key.endswith(".gz")):
+                        # latency canaries are only needed until the canary lambda has found them
+                        if not is_canary_line(line):
+                            yield line
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            runs = _write_sorted_runs(all_lines(), self.sort_field, self.sort_buffer_bytes, tmp_dir)
+            outputs = self._write_outputs(_merge_runs(runs, self.sort_field), prefix, run_id, tmp_dir)
+
+        new_manifest = {
+            "compactedAt": datetime.now(timezone.utc).isoformat(),
+            "sortField": self.sort_field,
+            "records": sum(output["records"] for output in outputs),
+            "objects": outputs,
+            "replaced": replaced,
+        }
+        self.store.put_bytes(manifest_key(prefix), json.dumps(new_manifest).encode("utf-8"))
+        self.store.delete(replaced)
+        return new_manifest
@@ -0,0 +1,57 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+from typing import Dict, Iterable, Optional
+
+# DynamoDB BatchGetItem reads at most 100 keys per call
+MAX_BATCH_GET_KEYS = 100
+
+
+class EntityStateStore:
+    """
+    Reads the latest state of campaigns, ad groups, ads and targets from the table maintained by entity_state_lambda.
+
+    Example:
+        store = EntityStateStore(boto3.client("dynamodb"), "AmzStream-NA-campaigns-LatestStateTable...")
+        campaign = store.get("123456789")
+    """
+
+    def __init__(self, dynamodb_client, table_name: str):
+        self.dynamodb_client = dynamodb_client
+        self.table_name = table_name
+
+    def get(self, entity_id: str) -> Optional[dict]:
+        response = self.dynamodb_client.get_item(TableName=self.table_name, Key={"entityId": {"S": entity_id}})
+        item = response.get("Item")
+        return json.loads(item["record"]["S"]) if item else None
+
+    def get_many(self, entity_ids: Iterable[str]) -> Dict[str, dict]:
+        entity_ids = list(dict.fromkeys(entity_ids))
+        states = {}
+        for offset in range(0, len(entity_ids), MAX_BATCH_GET_KEYS):
+            request = {
+                self.table_name: {
+                    "Keys": [
+                        {"entityId": {"S": entity_id}} for entity_id in entity_ids[offset : offset + MAX_BATCH_GET_KEYS]
+                    ]
+                }
+            }
+            while request:
+                response = self.dynamodb_client.batch_get_item(RequestItems=request)
+                for item in response["Responses"].get(self.table_name, []):
+                    states[item["entityId"]["S"]] = json.loads(item["record"]["S"])
+                request = response.get("UnprocessedKeys")
+        return states
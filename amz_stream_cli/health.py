@@ -0,0 +1,211 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from amz_stream_cli.stack_config import ConsumerStack, stack_resources
+
+# CloudWatch GetMetricData accepts at most 500 queries per call
+MAX_METRIC_QUERIES = 500
+QUEUE_DEPTH_ATTRIBUTES = ["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible"]
+
+
+class QueueRole(str, Enum):
+    ingress = "ingress"
+    ingress_dlq = "ingress-dlq"
+    confirmation = "confirmation"
+    confirmation_dlq = "confirmation-dlq"
+    quarantine = "quarantine"
+
+    @property
+    def is_dlq(self) -> bool:
+        return self in (QueueRole.ingress_dlq, QueueRole.confirmation_dlq, QueueRole.quarantine)
+
+
+# Logical id prefixes of the queues created by StreamIngress and StreamFanout
+QUEUE_ROLE_BY_LOGICAL_ID_PREFIX = [
+    ("FanoutQuarantineQueue", QueueRole.quarantine),
+    ("IngressDlq", QueueRole.ingress_dlq),
+    ("IngressQueue", QueueRole.ingress),
+    ("FanoutSubsConfirmationDlq", QueueRole.confirmation_dlq),
+    ("FanoutSubsConfirmationQueue", QueueRole.confirmation),
+]
+
+
+class StackQueue(NamedTuple):
+    stack: ConsumerStack
+    role: QueueRole
+    queue_url: str
+
+    @property
+    def queue_name(self) -> str:
+        return self.queue_url.rsplit("/", 1)[-1]
+
+
+class QueueHealth(NamedTuple):
+    queue: StackQueue
+    messages: int
+    messages_in_flight: int
+    oldest_message_age_s: Optional[float]
+
+    def as_dict(self) -> dict:
+        return {
+            "stackName": self.queue.stack.stack_name,
+            "role": self.queue.role.value,
+            "queueUrl": self.queue.queue_url,
+            "messages": self.messages,
+            "messagesInFlight": self.messages_in_flight,
+            "oldestMessageAgeS": self.oldest_message_age_s,
+        }
+
+
+class HealthThresholds(NamedTuple):
+    max_age_s: float
+    max_messages: int
+    max_dlq_messages: int
+
+
+def queue_role(logical_resource_id: str) -> Optional[QueueRole]:
+    for prefix, role in QUEUE_ROLE_BY_LOGICAL_ID_PREFIX:
+        if logical_resource_id.startswith(prefix):
+            return role
+    return None
+
+
+def discover_queues(stack: ConsumerStack, cloudformation_client) -> List[StackQueue]:
+    """
+    Finds the queues of a deployed consumer stack. Stacks which are not deployed have no queues.
+    """
+    queues = []
+    for resource in stack_resources(stack, cloudformation_client):
+        role = queue_role(resource["LogicalResourceId"])
+        if resource["ResourceType"] == "AWS::SQS::Queue" and role is not None:
+            queues.append(StackQueue(stack, role, resource["PhysicalResourceId"]))
+    return queues
+
+
+def fetch_oldest_message_ages(queues: List[StackQueue], cloudwatch_client) -> Dict[str, float]:
+    """
+    Fetches ApproximateAgeOfOldestMessage, which SQS only publishes as a CloudWatch metric, for all queues of a region.
+    """
+    end_time = datetime.now(timezone.utc)
+    ages = {}
+    for offset in range(0, len(queues), MAX_METRIC_QUERIES):
+        chunk = queues[offset : offset + MAX_METRIC_QUERIES]
+        response = cloudwatch_client.get_metric_data(
+            MetricDataQueries=[
+                {
+                    "Id": f"q{i}",
+                    "MetricStat": {
+                        "Metric": {
+                            "Namespace": "AWS/SQS",
+                            "MetricName": "ApproximateAgeOfOldestMessage",
+                            "Dimensions": [{"Name": "QueueName", "Value": queue.queue_name}],
+                        },
+                        "Period": 60,
+                        "Stat": "Maximum",
+                    },
+                }
+                for i, queue in enumerate(chunk)
+            ],
+            StartTime=end_time - timedelta(minutes=10),
+            EndTime=end_time,
+            ScanBy="TimestampDescending",
+        )
+        for result in response["MetricDataResults"]:
+            if result["Values"]:
+                ages[chunk[int(result["Id"][1:])].queue_url] = result["Values"][0]
+    return ages
+
+
+def fetch_queue_depth(queue: StackQueue, sqs_client) -> Dict[str, int]:
+    attributes = sqs_client.get_queue_attributes(QueueUrl=queue.queue_url, AttributeNames=QUEUE_DEPTH_ATTRIBUTES)
+    return {name: int(value) for name, value in attributes["Attributes"].items()}
+
+
+def pipeline_health(
+    stacks: List[ConsumerStack],
+    client_factory: Callable[[str, str], object],
+    max_workers: int = 16,
+) -> List[QueueHealth]:
+    """
+    Reports depth and age of every queue in the given stacks, sorted with the most lagging queue first.
+
+    Stack discovery, queue attributes and CloudWatch metrics are all fetched concurrently.
+    """
+    regions = sorted({stack.installation_region for stack in stacks})
+    # boto3 client creation is not thread safe, create all clients up front
+    clients = {
+        (service, region): client_factory(service, region)
+        for region in regions
+        for service in ("cloudformation", "sqs", "cloudwatch")
+    }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        queues = [
+            queue
+            for stack_queues in executor.map(
+                lambda stack: discover_queues(stack, clients[("cloudformation", stack.installation_region)]), stacks
+            )
+            for queue in stack_queues
+        ]
+
+        age_futures = {
+            region: executor.submit(
+                fetch_oldest_message_ages,
+                [queue for queue in queues if queue.stack.installation_region == region],
+                clients[("cloudwatch", region)],
+            )
+            for region in regions
+        }
+        depths = list(
+            executor.map(
+                lambda queue: fetch_queue_depth(queue, clients[("sqs", queue.stack.installation_region)]), queues
+            )
+        )
+        ages = {}
+        for future in age_futures.values():
+            ages.update(future.result())
+
+    report = [
+        QueueHealth(
+            queue,
+            depth.get("ApproximateNumberOfMessages", 0),
+            depth.get("ApproximateNumberOfMessagesNotVisible", 0),
+            ages.get(queue.queue_url),
+        )
+        for queue, depth in zip(queues, depths)
+    ]
+    return sorted(report, key=lambda health: (-(health.oldest_message_age_s or 0), -health.messages))
+
+
+def threshold_breaches(report: List[QueueHealth], thresholds: HealthThresholds) -> List[str]:
+    breaches = []
+    for health in report:
+        name = f"{health.queue.stack.stack_name} {health.queue.role.value}"
+        if health.queue.role.is_dlq:
+            if health.messages > thresholds.max_dlq_messages:
+                breaches.append(f"{name}: {health.messages} messages in DLQ (max {thresholds.max_dlq_messages})")
+            continue
+        if health.messages > thresholds.max_messages:
+            breaches.append(f"{name}: {health.messages} messages (max {thresholds.max_messages})")
+        if health.oldest_message_age_s is not None and health.oldest_message_age_s > thresholds.max_age_s:
+            breaches.append(
+                f"{name}: oldest message is {health.oldest_message_age_s:.0f}s old (max {thresholds.max_age_s:.0f}s)"
+            )
+    return breaches
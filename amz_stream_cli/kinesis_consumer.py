@@ -0,0 +1,152 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import threading
+import time
+from typing import Iterator, List, NamedTuple, Optional
+
+# GetRecords is limited to 5 calls per second per shard
+EMPTY_POLL_INTERVAL_S = 1.0
+POLL_INTERVAL_S = 0.2
+
+
+class StreamRecord(NamedTuple):
+    shard_id: str
+    # sequence number of the Kinesis record the stream record was packed in, to checkpoint and resume after
+    sequence_number: str
+    record: dict
+    # position of the stream record within its Kinesis record, and whether it is the last one packed in it
+    sub_sequence: int = 0
+    is_last: bool = True
+
+
+def deaggregate(data: bytes) -> Iterator[dict]:
+    """
+    Yields the stream records packed into one Kinesis record by kinesis_forwarder_lambda
+    """
+    for line in data.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+def stream_records(
+    shard_id: str, kinesis_records: List[dict], after_sequence_number: Optional[str], after_sub_sequence: Optional[int]
+) -> Iterator[StreamRecord]:
+    """
+    Yields the stream records of Kinesis records, skipping those up to after_sub_sequence in the Kinesis record of
+    after_sequence_number
+    """
+    for kinesis_record in kinesis_records:
+        records = list(deaggregate(kinesis_record["Data"]))
+        start = 0
+        if after_sub_sequence is not None and kinesis_record["SequenceNumber"] == after_sequence_number:
+            start = after_sub_sequence + 1
+        for sub_sequence in range(start, len(records)):
+            is_last = sub_sequence == len(records) - 1
+            yield StreamRecord(shard_id, kinesis_record["SequenceNumber"], records[sub_sequence], sub_sequence, is_last)
+
+
+class KinesisStreamConsumer:
+    """
+    Reads the records of the Kinesis data stream of the kinesis delivery method. With a consumer_arn registered
+    through the kinesisConsumers setting, shards are read with enhanced fan-out (SubscribeToShard), so every consumer
+    gets its own read throughput. Without one, shards are polled with GetRecords.
+
+    Example:
+        consumer = KinesisStreamConsumer(boto3.client("kinesis"), "<DataStreamArn>", "<consumer ARN>")
+        for shard_id in consumer.shard_ids():
+            for stream_record in consumer.read_shard(shard_id, stop_event=stop_event):
+                ...
+    """
+
+    def __init__(self, kinesis_client, stream_arn: str, consumer_arn: Optional[str] = None, sleep=time.sleep):
+        self.kinesis_client = kinesis_client
+        self.stream_arn = stream_arn
+        self.consumer_arn = consumer_arn
+        self.sleep = sleep
+
+    def shard_ids(self) -> List[str]:
+        shard_ids = []
+        request = {"StreamARN": self.stream_arn}
+        while True:
+            response = self.kinesis_client.list_shards(**request)
+            shard_ids.extend(shard["ShardId"] for shard in response["Shards"])
+            if not response.get("NextToken"):
+                return shard_ids
+            request = {"NextToken": response["NextToken"]}
+
+    def read_shard(
+        self,
+        shard_id: str,
+        after_sequence_number: Optional[str] = None,
+        initial_position: str = "TRIM_HORIZON",
+        stop_event: Optional[threading.Event] = None,
+        after_sub_sequence: Optional[int] = None,
+    ) -> Iterator[StreamRecord]:
+        """
+        Yields the records of a shard in order, after after_sequence_number when resuming from a checkpoint or from
+        initial_position (TRIM_HORIZON or LATEST) otherwise. Ends when the shard is closed or stop_event is set.
+
+        A checkpoint taken within a Kinesis record, on a stream record whose is_last is false, also stores its
+        sub_sequence. Passing it as after_sub_sequence resumes with the next stream record of that Kinesis record.
+        """
+        stop_event = stop_event or threading.Event()
+        if after_sequence_number is None:
+            after_sub_sequence = None
+        if self.consumer_arn:
+            return self._subscribe(shard_id, after_sequence_number, after_sub_sequence, initial_position, stop_event)
+        return self._poll(shard_id, after_sequence_number, after_sub_sequence, initial_position, stop_event)
+
+    @staticmethod
+    def _starting_position(sequence_number, after_sub_sequence, initial_position) -> dict:
+        if sequence_number is None:
+            return {"Type": initial_position}
+        # within a Kinesis record, it is read again and its stream records up to after_sub_sequence are skipped
+        position_type = "AT_SEQUENCE_NUMBER" if after_sub_sequence is not None else "AFTER_SEQUENCE_NUMBER"
+        return {"Type": position_type, "SequenceNumber": sequence_number}
+
+    def _subscribe(self, shard_id, sequence_number, after_sub_sequence, initial_position, stop_event):
+        starting_position = self._starting_position(sequence_number, after_sub_sequence, initial_position)
+        while not stop_event.is_set():
+            response = self.kinesis_client.subscribe_to_shard(
+                ConsumerARN=self.consumer_arn, ShardId=shard_id, StartingPosition=starting_position
+            )
+            # a subscription delivers events for up to 5 minutes, then it is renewed from the continuation
+            for event in response["EventStream"]:
+                shard_event = event.get("SubscribeToShardEvent")
+                if shard_event is None:
+                    continue
+                yield from stream_records(shard_id, shard_event["Records"], sequence_number, after_sub_sequence)
+                continuation = shard_event.get("ContinuationSequenceNumber")
+                if continuation is None:
+                    return
+                starting_position = {"Type": "AFTER_SEQUENCE_NUMBER", "SequenceNumber": continuation}
+                if stop_event.is_set():
+                    return
+
+    def _poll(self, shard_id, sequence_number, after_sub_sequence, initial_position, stop_event):
+        starting_position = self._starting_position(sequence_number, after_sub_sequence, initial_position)
+        request = {"StreamARN": self.stream_arn, "ShardId": shard_id, "ShardIteratorType": starting_position["Type"]}
+        if sequence_number is not None:
+            request["StartingSequenceNumber"] = sequence_number
+        shard_iterator = self.kinesis_client.get_shard_iterator(**request)["ShardIterator"]
+
+        while shard_iterator and not stop_event.is_set():
+            response = self.kinesis_client.get_records(ShardIterator=shard_iterator, StreamARN=self.stream_arn)
+            yield from stream_records(shard_id, response["Records"], sequence_number, after_sub_sequence)
+            # the iterator is None once a closed shard has been read to its end
+            shard_iterator = response.get("NextShardIterator")
+            self.sleep(POLL_INTERVAL_S if response["Records"] else EMPTY_POLL_INTERVAL_S)
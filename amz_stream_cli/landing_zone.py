@@ -0,0 +1,101 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import gzip
+from datetime import datetime, timedelta
+from typing import Iterator, List
+
+# Matches the data_output_prefix of the StreamLanding Firehose, which partitions by UTC arrival hour
+PARTITION_FORMAT = "year=%Y/month=%m/day=%d/hour=%H/"
+READ_CHUNK_BYTES = 1024 * 1024
+# Field of the latency canary records landed next to the dataset records, see lambda/canary.py
+CANARY_MARKER = b'"amz_stream_canary"'
+
+
+def truncate_to_hour(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def partition_hours(start: datetime, end: datetime) -> List[datetime]:
+    """Lists the hours from start (inclusive) to end (exclusive)."""
+    hours = []
+    hour = truncate_to_hour(start)
+    while hour < end:
+        hours.append(hour)
+        hour += timedelta(hours=1)
+    return hours
+
+
+def partition_prefix(data_set_id: str, hour: datetime) -> str:
+    return f"{data_set_id}/{hour.strftime(PARTITION_FORMAT)}"
+
+
+def partition_hour(prefix: str) -> datetime:
+    """Parses the hour of a partition prefix or key created by partition_prefix."""
+    fields = dict(part.split("=", 1) for part in prefix.split("/") if "=" in part)
+    return datetime(int(fields["year"]), int(fields["month"]), int(fields["day"]), int(fields["hour"]))
+
+
+def is_data_object(key: str) -> bool:
+    """
+    Tells records objects from metadata such as compaction manifests, whose names start with an underscore.
+    """
+    return not key.rsplit("/", 1)[-1].startswith("_")
+
+
+def is_canary_line(line: bytes) -> bool:
+    return CANARY_MARKER in line
+
+
+def list_objects(s3_client, bucket: str, prefix: str) -> Iterator[dict]:
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        yield from page.get("Contents", [])
+
+
+def iter_lines(readable, gzipped: bool = False) -> Iterator[bytes]:
+    """
+    Streams the non empty lines of a newline delimited file object. Only one chunk is held in memory at a time.
+    """
+    readable = gzip.GzipFile(fileobj=readable) if gzipped else readable
+    for line in _iter_chunked_lines(readable):
+        if line.strip():
+            yield line
+
+
+def _iter_chunked_lines(readable) -> Iterator[bytes]:
+    remainder = b""
+    while True:
+        chunk = readable.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        yield from lines
+    if remainder:
+        yield remainder
+
+
+def iter_object_lines(s3_client, bucket: str, key: str) -> Iterator[bytes]:
+    """
+    Streams the non empty lines of a newline delimited object, decompressing gzip objects on the fly.
+
+    Only one chunk of the object is held in memory at a time.
+    """
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+    try:
+        yield from iter_lines(body, gzipped=key.endswith(".gz"))
+    finally:
+        body.close()
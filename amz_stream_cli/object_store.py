@@ -0,0 +1,98 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import shutil
+from typing import BinaryIO, Iterator, List
+
+# S3 DeleteObjects accepts at most 1000 keys per call
+MAX_DELETE_BATCH_SIZE = 1000
+
+
+class S3ObjectStore:
+    """Minimal object store interface over an S3 bucket, used by the landing zone maintenance jobs."""
+
+    def __init__(self, s3_client, bucket: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+
+    def list(self, prefix: str) -> Iterator[dict]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for summary in page.get("Contents", []):
+                yield {"Key": summary["Key"], "Size": summary["Size"]}
+
+    def open(self, key: str) -> BinaryIO:
+        return self.s3_client.get_object(Bucket=self.bucket, Key=key)["Body"]
+
+    def put_file(self, key: str, path: str) -> None:
+        # single PUTs are atomic, readers see either no object or the complete one
+        with open(path, "rb") as f:
+            self.s3_client.put_object(Bucket=self.bucket, Key=key, Body=f)
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        self.s3_client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def delete(self, keys: List[str]) -> None:
+        for offset in range(0, len(keys), MAX_DELETE_BATCH_SIZE):
+            self.s3_client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in keys[offset : offset + MAX_DELETE_BATCH_SIZE]]},
+            )
+
+
+class LocalObjectStore:
+    """Object store backed by a local directory, keys are paths relative to the root."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def list(self, prefix: str) -> Iterator[dict]:
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if key.startswith(prefix) and not name.endswith(".tmp"):
+                    yield {"Key": key, "Size": os.path.getsize(path)}
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def _replace(self, key: str, write) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def put_file(self, key: str, path: str) -> None:
+        self._replace(key, lambda tmp_path: shutil.copyfile(path, tmp_path))
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+
+        self._replace(key, write)
+
+    def delete(self, keys: List[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,75 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List
+
+from amz_stream_cli.lambda_modules import import_lambda_module
+from amz_stream_cli.landing_zone import partition_hours, partition_prefix
+
+EVENT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class PartitionIndex:
+    """
+    Resolves landing zone objects from the index table maintained by landing_zone_index_lambda, without listing
+    the bucket.
+
+    Example:
+        index = PartitionIndex(boto3.client("dynamodb"), "AmzStream-NA-sp-traffic-IndexTable...")
+        keys = [o["key"] for o in index.resolve("sp-traffic", datetime(2024, 5, 1), datetime(2024, 5, 2))]
+    """
+
+    def __init__(self, dynamodb_client, table_name: str, max_workers: int = 8):
+        self.dynamodb_client = dynamodb_client
+        self.table_name = table_name
+        self.max_workers = max_workers
+        self.schema = import_lambda_module("landing_zone_index")
+
+    def partition_objects(self, prefix: str) -> List[dict]:
+        """Returns the indexed objects of one partition with their size, record count and event time range."""
+        paginator = self.dynamodb_client.get_paginator("query")
+        objects = []
+        for page in paginator.paginate(
+            TableName=self.table_name,
+            KeyConditionExpression="#partition = :partition",
+            ExpressionAttributeNames={"#partition": self.schema.PARTITION_ATTRIBUTE},
+            ExpressionAttributeValues={":partition": {"S": prefix}},
+        ):
+            objects.extend(self.schema.from_item(item) for item in page["Items"])
+        return objects
+
+    def resolve(
+        self, data_set_id: str, start: datetime, end: datetime, max_lateness: timedelta = timedelta(0)
+    ) -> List[dict]:
+        """
+        Returns the objects of a dataset which landed between start (inclusive) and end (exclusive), in UTC.
+
+        Records land after their event time. With a max_lateness, partitions up to max_lateness after end are also
+        considered, and only objects whose event time range overlaps [start, end) are returned.
+        """
+        prefixes = [partition_prefix(data_set_id, hour) for hour in partition_hours(start, end + max_lateness)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            objects = [obj for partition in executor.map(self.partition_objects, prefixes) for obj in partition]
+
+        if max_lateness:
+            start_time, end_time = start.strftime(EVENT_TIME_FORMAT), end.strftime(EVENT_TIME_FORMAT)
+            objects = [
+                obj
+                for obj in objects
+                if obj["minEventTime"] is None or (obj["minEventTime"] < end_time and obj["maxEventTime"] >= start_time)
+            ]
+        return sorted(objects, key=lambda obj: obj["key"])
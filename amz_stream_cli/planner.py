@@ -0,0 +1,324 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Capacity and cost model of the consumer topology: SQS ingress queue, fanout lambda, SNS fanout topic, landing
+Firehose and S3, for the expected volume of each dataset.
+
+The model is deliberately coarse. It is meant to compare settings and to catch settings that are off by an order of
+magnitude, not to predict a bill.
+"""
+
+import difflib
+import math
+from typing import Dict, List, NamedTuple, Optional
+
+from amz_stream_cli.stack_config import ConsumerStack
+
+# Settings read by amz_stream_infra and their values when a dataset does not set them
+DEFAULT_SETTINGS = {
+    "fanoutBatchSize": 10,
+    "fanoutBatchingWindowSeconds": 0,
+    "fanoutMemoryMB": 128,
+    "firehoseBufferingIntervalSeconds": 300,
+    "firehoseBufferingSizeMB": 5,
+}
+
+SECONDS_PER_MONTH = 30 * 24 * 3600
+KB = 1024
+MB = 1024 * 1024
+
+# Service limits which bound the settings
+SQS_RECEIVE_MAX_MESSAGES = 10
+SNS_PUBLISH_BATCH_SIZE = 10
+LAMBDA_MAX_PAYLOAD_BYTES = 6 * MB
+FIREHOSE_MAX_BUFFERING_SIZE_MB = 128
+FIREHOSE_MIN_BUFFERING_INTERVAL_S = 60
+FIREHOSE_MAX_BUFFERING_INTERVAL_S = 900
+
+# Assumptions of the model
+SQS_POLLERS = 5
+RECEIVE_LATENCY_S = 0.1
+INVOCATION_OVERHEAD_MS = 20
+PUBLISH_BATCH_LATENCY_MS = 25
+# JSON decoding and validation throughput of a full vCPU, which Lambda allocates at 1769 MB
+DECODE_BYTES_PER_VCPU_SECOND = 50 * MB
+MB_PER_VCPU = 1769
+MEMORY_SIZES_MB = (128, 256, 512, 1024, 1769)
+MAX_RECOMMENDED_BATCH_SIZE = 100
+
+# us-east-1 list prices in USD
+PRICES = {
+    "lambdaGbSecond": 0.0000166667,
+    "lambdaRequest": 0.20 / 1_000_000,
+    "sqsRequest": 0.40 / 1_000_000,
+    "snsPublish": 0.50 / 1_000_000,
+    "firehoseGb": 0.029,
+    "s3Put": 0.005 / 1000,
+}
+
+
+class Volume(NamedTuple):
+    records_per_second: float
+    average_record_bytes: int
+
+
+class CapacityEstimate(NamedTuple):
+    """Steady state load of one consumer stack, per second unless the name says otherwise."""
+
+    messages_per_invocation: float
+    invocations: float
+    concurrency: float
+    invocation_duration_ms: float
+    gb_seconds: float
+    sqs_requests: float
+    sns_publish_requests: float
+    firehose_records: float
+    s3_objects_per_hour: float
+    average_object_mb: float
+    landing_delay_s: float
+    monthly_cost_usd: float
+
+    def as_dict(self) -> dict:
+        return {name: round(value, 4) for name, value in self._asdict().items()}
+
+
+class DatasetPlan(NamedTuple):
+    stack: ConsumerStack
+    volume: Volume
+    current_settings: Dict[str, float]
+    current: CapacityEstimate
+    recommended_settings: Dict[str, float]
+    recommended: CapacityEstimate
+
+    @property
+    def changed_settings(self) -> Dict[str, float]:
+        return {
+            name: value for name, value in self.recommended_settings.items() if self.current_settings[name] != value
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "stackName": self.stack.stack_name,
+            "recordsPerSecond": self.volume.records_per_second,
+            "averageRecordBytes": self.volume.average_record_bytes,
+            "currentSettings": self.current_settings,
+            "current": self.current.as_dict(),
+            "recommendedSettings": self.recommended_settings,
+            "recommended": self.recommended.as_dict(),
+        }
+
+
+def dataset_volume(dataset_config: dict) -> Optional[Volume]:
+    """Returns the expected volume set in the dataset config, or None when it is not set."""
+    if "expectedRecordsPerSecond" not in dataset_config:
+        return None
+    return Volume(
+        float(dataset_config["expectedRecordsPerSecond"]), int(dataset_config.get("averageRecordBytes", 1024))
+    )
+
+
+def current_settings(dataset_config: dict) -> Dict[str, float]:
+    return {name: dataset_config.get(name, default) for name, default in DEFAULT_SETTINGS.items()}
+
+
+def _chunks(size_bytes: float, chunk_bytes: int) -> int:
+    return max(1, math.ceil(size_bytes / chunk_bytes))
+
+
+def messages_per_invocation(volume: Volume, settings: Dict[str, float]) -> float:
+    """
+    Each poller hands the lambda what arrived during the batching window, or during one receive without a window,
+    up to the batch size and the invocation payload limit
+    """
+    batch_size = settings["fanoutBatchSize"]
+    if settings["fanoutBatchingWindowSeconds"] <= 0:
+        batch_size = min(batch_size, SQS_RECEIVE_MAX_MESSAGES)
+    wait_s = max(settings["fanoutBatchingWindowSeconds"], RECEIVE_LATENCY_S)
+    arrived = volume.records_per_second * wait_s / SQS_POLLERS
+    return max(1.0, min(batch_size, LAMBDA_MAX_PAYLOAD_BYTES // volume.average_record_bytes, arrived))
+
+
+def invocation_duration_ms(volume: Volume, batch: float, memory_mb: float) -> float:
+    publish_ms = math.ceil(batch / SNS_PUBLISH_BATCH_SIZE) * PUBLISH_BATCH_LATENCY_MS
+    return INVOCATION_OVERHEAD_MS + publish_ms + _decode_ms(volume, batch, memory_mb)
+
+
+def _decode_ms(volume: Volume, batch: float, memory_mb: float) -> float:
+    vcpus = min(1.0, memory_mb / MB_PER_VCPU)
+    return batch * volume.average_record_bytes / (DECODE_BYTES_PER_VCPU_SECOND * vcpus) * 1000
+
+
+def estimate(volume: Volume, settings: Dict[str, float], delivery_method: str = "sqs") -> CapacityEstimate:
+    rate, record_bytes = volume.records_per_second, volume.average_record_bytes
+
+    batch = invocations = concurrency = duration_ms = gb_seconds = sqs_requests = sns_requests = 0.0
+    if delivery_method == "sqs":
+        batch = messages_per_invocation(volume, settings)
+        invocations = rate / batch
+        duration_ms = invocation_duration_ms(volume, batch, settings["fanoutMemoryMB"])
+        concurrency = invocations * duration_ms / 1000
+        gb_seconds = invocations * duration_ms / 1000 * settings["fanoutMemoryMB"] / 1024
+        # SNS delivers every record, receives and deletes are batched, each request is billed per 64 KB
+        receives = rate / min(batch, SQS_RECEIVE_MAX_MESSAGES)
+        sqs_requests = rate * _chunks(record_bytes, 64 * KB) + 2 * receives * _chunks(
+            min(batch, SQS_RECEIVE_MAX_MESSAGES) * record_bytes, 64 * KB
+        )
+        publishes_per_invocation = math.ceil(batch / SNS_PUBLISH_BATCH_SIZE)
+        sns_requests = (
+            invocations * publishes_per_invocation * _chunks(batch / publishes_per_invocation * record_bytes, 64 * KB)
+        )
+
+    # Firehose writes an object when the buffer is full or the buffering interval has passed, and at least one per
+    # hourly partition
+    bytes_per_second = rate * (record_bytes + 1)
+    flush_s = min(
+        settings["firehoseBufferingIntervalSeconds"], settings["firehoseBufferingSizeMB"] * MB / bytes_per_second
+    )
+    objects_per_hour = max(1.0, 3600 / flush_s)
+    firehose_gb = rate * _chunks(record_bytes, 5 * KB) * 5 * KB / 1024**3
+
+    monthly_cost = SECONDS_PER_MONTH * (
+        gb_seconds * PRICES["lambdaGbSecond"]
+        + invocations * PRICES["lambdaRequest"]
+        + sqs_requests * PRICES["sqsRequest"]
+        + sns_requests * PRICES["snsPublish"]
+        + firehose_gb * PRICES["firehoseGb"]
+        + objects_per_hour / 3600 * PRICES["s3Put"]
+    )
+    return CapacityEstimate(
+        messages_per_invocation=batch,
+        invocations=invocations,
+        concurrency=concurrency,
+        invocation_duration_ms=duration_ms,
+        gb_seconds=gb_seconds,
+        sqs_requests=sqs_requests,
+        sns_publish_requests=sns_requests,
+        firehose_records=rate,
+        s3_objects_per_hour=objects_per_hour,
+        average_object_mb=bytes_per_second * 3600 / objects_per_hour / MB,
+        landing_delay_s=flush_s,
+        monthly_cost_usd=monthly_cost,
+    )
+
+
+def recommend(volume: Volume, max_landing_delay_s: int = FIREHOSE_MAX_BUFFERING_INTERVAL_S) -> Dict[str, float]:
+    """
+    Recommends settings for a volume:
+
+    - a one second batching window once each poller receives more than one full SNS publish batch per second, with
+      a batch size of the whole SNS publish batches which arrive in it
+    - the smallest memory size at which decoding takes at most a tenth of the invocation
+    - a Firehose buffer which writes the largest objects the landing delay allows
+    """
+    rate, record_bytes = volume.records_per_second, volume.average_record_bytes
+    per_poller = rate / SQS_POLLERS
+    if per_poller > SNS_PUBLISH_BATCH_SIZE:
+        window_s = 1
+        batch_size = int(per_poller * window_s) // SNS_PUBLISH_BATCH_SIZE * SNS_PUBLISH_BATCH_SIZE
+        batch_size = min(batch_size, MAX_RECOMMENDED_BATCH_SIZE, LAMBDA_MAX_PAYLOAD_BYTES // record_bytes)
+    else:
+        window_s, batch_size = 0, SQS_RECEIVE_MAX_MESSAGES
+
+    settings = {"fanoutBatchSize": batch_size, "fanoutBatchingWindowSeconds": window_s}
+    batch = messages_per_invocation(volume, settings)
+    memory_mb = MEMORY_SIZES_MB[-1]
+    for candidate in MEMORY_SIZES_MB:
+        io_ms = INVOCATION_OVERHEAD_MS + math.ceil(batch / SNS_PUBLISH_BATCH_SIZE) * PUBLISH_BATCH_LATENCY_MS
+        if _decode_ms(volume, batch, candidate) <= io_ms / 10:
+            memory_mb = candidate
+            break
+    settings["fanoutMemoryMB"] = memory_mb
+
+    bytes_per_second = rate * (record_bytes + 1)
+    max_interval_s = max(FIREHOSE_MIN_BUFFERING_INTERVAL_S, min(FIREHOSE_MAX_BUFFERING_INTERVAL_S, max_landing_delay_s))
+    interval_s = min(
+        max_interval_s, max(FIREHOSE_MIN_BUFFERING_INTERVAL_S, FIREHOSE_MAX_BUFFERING_SIZE_MB * MB / bytes_per_second)
+    )
+    settings["firehoseBufferingIntervalSeconds"] = int(math.ceil(interval_s))
+    settings["firehoseBufferingSizeMB"] = int(
+        min(FIREHOSE_MAX_BUFFERING_SIZE_MB, max(1, math.ceil(bytes_per_second * interval_s / MB)))
+    )
+    return settings
+
+
+def plan(
+    stacks: List[ConsumerStack], delivery_method: str = "sqs", max_landing_delay_s: int = 900
+) -> List[DatasetPlan]:
+    """Plans the stacks whose dataset config sets its expected volume."""
+    plans = []
+    for stack in stacks:
+        volume = dataset_volume(stack.dataset_config)
+        if volume is None:
+            continue
+        settings = current_settings(stack.dataset_config)
+        recommended_settings = recommend(volume, max_landing_delay_s)
+        if delivery_method != "sqs":
+            # SNS delivers straight to the Firehose, only its buffering applies
+            recommended_settings = {
+                name: value if name.startswith("firehose") else settings[name]
+                for name, value in recommended_settings.items()
+            }
+        plans.append(
+            DatasetPlan(
+                stack,
+                volume,
+                settings,
+                estimate(volume, settings, delivery_method),
+                recommended_settings,
+                estimate(volume, recommended_settings, delivery_method),
+            )
+        )
+    return plans
+
+
+def _dataset_entry_end(lines: List[str], advertising_region: str, data_set_id: str) -> Optional[tuple]:
+    """Finds the lines of a dataset entry in the config file, returns its first and past-the-end line index."""
+    in_datasets = in_region = False
+    start = None
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        indent = len(line) - len(line.lstrip())
+        if start is not None and stripped and not stripped.startswith("#") and indent <= 4:
+            return start, index
+        if line.startswith("datasets:"):
+            in_datasets = True
+        elif in_datasets and indent == 0 and stripped and not stripped.startswith("#"):
+            in_datasets = False
+        elif in_datasets and indent == 2 and stripped.endswith(":"):
+            in_region = stripped[:-1] == advertising_region
+        elif in_region and stripped.startswith("- dataSetId:") and stripped.split(":", 1)[1].strip() == data_set_id:
+            start = index
+    return (start, len(lines)) if start is not None else None
+
+
+def config_diff(config_text: str, plans: List[DatasetPlan], path: str = "stream_infrastructure_config.yml") -> str:
+    """Returns a unified diff of the config file setting the recommended settings which differ from the current."""
+    lines = config_text.splitlines(keepends=True)
+    updated = list(lines)
+    for dataset_plan in plans:
+        changed = dataset_plan.changed_settings
+        if not changed:
+            continue
+        entry = _dataset_entry_end(updated, dataset_plan.stack.advertising_region, dataset_plan.stack.data_set_id)
+        if entry is None:
+            continue
+        start, end = entry
+        while end > start + 1 and not updated[end - 1].strip():
+            end -= 1
+        entry_lines = [line for line in updated[start:end] if line.split(":", 1)[0].strip() not in changed]
+        entry_lines += [f"      {name}: {value}\n" for name, value in changed.items()]
+        updated[start:end] = entry_lines
+    return "".join(difflib.unified_diff(lines, updated, fromfile=f"a/{path}", tofile=f"b/{path}"))
@@ -0,0 +1,61 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket limiting the rate of operations shared by many worker threads.
+    """
+
+    def __init__(
+        self,
+        rate_per_s: float,
+        capacity: float = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if rate_per_s <= 0:
+            raise ValueError(f"Rate must be positive, got: {rate_per_s}")
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity if capacity is not None else max(rate_per_s, 1)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_s)
+        self._updated_at = now
+
+    def acquire(self, tokens: float = 1) -> None:
+        """
+        Blocks until the requested number of tokens is available. Requests larger than the capacity wait for a full
+        bucket and leave it in debt, so later requests wait until the rate is met again.
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                needed = min(tokens, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                wait_s = (needed - self._tokens) / self.rate_per_s
+            self.sleep(wait_s)
@@ -0,0 +1,176 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+from amz_stream_cli.health import QueueRole
+from amz_stream_cli.rate_limit import TokenBucket
+
+# SQS receive_message and send_message_batch both handle at most 10 messages per call
+MAX_SQS_BATCH_SIZE = 10
+REDRIVE_TARGETS = {
+    QueueRole.ingress_dlq: QueueRole.ingress,
+    QueueRole.confirmation_dlq: QueueRole.confirmation,
+}
+
+
+def message_type(body: str) -> str:
+    """
+    Returns the Type field of a message body, read the same way as sqs_consuming_lambda.is_subscription_confirmation.
+    """
+    try:
+        return json.loads(body).get("Type", "")
+    except (ValueError, AttributeError):
+        return ""
+
+
+class RedriveStats:
+    def __init__(self):
+        self.received = 0
+        self.redriven = 0
+        self.skipped = 0
+        self.failed = 0
+        self.types = Counter()
+        self._seen_message_ids = set()
+        self._lock = threading.Lock()
+
+    def mark_seen(self, messages: list) -> list:
+        """Returns the messages which were not received before. Only message IDs are kept."""
+        with self._lock:
+            new_messages = [m for m in messages if m["MessageId"] not in self._seen_message_ids]
+            self._seen_message_ids.update(m["MessageId"] for m in new_messages)
+            self.received += len(new_messages)
+            self.types.update(message_type(m["Body"]) for m in new_messages)
+            return new_messages
+
+    def record(self, redriven: int = 0, skipped: int = 0, failed: int = 0) -> None:
+        with self._lock:
+            self.redriven += redriven
+            self.skipped += skipped
+            self.failed += failed
+
+    def as_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "redriven": self.redriven,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "types": dict(self.types),
+        }
+
+
+class Redrive:
+    """
+    Moves messages from a dead-letter queue back to its source queue.
+
+    Many receivers long-poll the DLQ in parallel while re-sends share a token bucket, so a large backlog does not
+    flood the consumer. Each receiver stops once the DLQ returns no messages it has not seen before.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        source_queue_url: str,
+        target_queue_url: str,
+        rate_limiter: TokenBucket,
+        message_types: Optional[Iterable[str]] = None,
+        dry_run: bool = False,
+        wait_time_s: int = 2,
+        visibility_timeout_s: int = 60,
+        on_progress: Callable[[RedriveStats], None] = lambda stats: None,
+    ):
+        self.sqs_client = sqs_client
+        self.source_queue_url = source_queue_url
+        self.target_queue_url = target_queue_url
+        self.rate_limiter = rate_limiter
+        self.message_types = set(message_types) if message_types else None
+        self.dry_run = dry_run
+        self.wait_time_s = wait_time_s
+        self.visibility_timeout_s = visibility_timeout_s
+        self.on_progress = on_progress
+        self.stats = RedriveStats()
+        self._skipped_receipt_handles = []
+        self._lock = threading.Lock()
+
+    def _is_selected(self, message: dict) -> bool:
+        return self.message_types is None or message_type(message["Body"]) in self.message_types
+
+    def _redrive_batch(self, messages: list) -> None:
+        self.rate_limiter.acquire(len(messages))
+        entries = []
+        for i, message in enumerate(messages):
+            entry = {"Id": str(i), "MessageBody": message["Body"]}
+            if message.get("MessageAttributes"):
+                entry["MessageAttributes"] = message["MessageAttributes"]
+            entries.append(entry)
+
+        response = self.sqs_client.send_message_batch(QueueUrl=self.target_queue_url, Entries=entries)
+        sent = [messages[int(result["Id"])] for result in response.get("Successful", [])]
+        if sent:
+            self.sqs_client.delete_message_batch(
+                QueueUrl=self.source_queue_url,
+                Entries=[{"Id": str(i), "ReceiptHandle": message["ReceiptHandle"]} for i, message in enumerate(sent)],
+            )
+        self.stats.record(redriven=len(sent), failed=len(messages) - len(sent))
+
+    def _receive_loop(self) -> None:
+        while True:
+            response = self.sqs_client.receive_message(
+                QueueUrl=self.source_queue_url,
+                MaxNumberOfMessages=MAX_SQS_BATCH_SIZE,
+                WaitTimeSeconds=self.wait_time_s,
+                VisibilityTimeout=self.visibility_timeout_s,
+                MessageAttributeNames=["All"],
+            )
+            messages = self.stats.mark_seen(response.get("Messages", []))
+            if not messages:
+                return
+
+            selected, skipped = [], []
+            for message in messages:
+                (selected if not self.dry_run and self._is_selected(message) else skipped).append(message)
+            with self._lock:
+                self._skipped_receipt_handles.extend(message["ReceiptHandle"] for message in skipped)
+            self.stats.record(skipped=len(skipped))
+            if selected:
+                self._redrive_batch(selected)
+            self.on_progress(self.stats)
+
+    def _release_skipped(self) -> None:
+        """Makes the messages which were received but not redriven visible again, so the DLQ is left as it was."""
+        receipt_handles = self._skipped_receipt_handles
+        for start in range(0, len(receipt_handles), MAX_SQS_BATCH_SIZE):
+            self.sqs_client.change_message_visibility_batch(
+                QueueUrl=self.source_queue_url,
+                Entries=[
+                    {"Id": str(i), "ReceiptHandle": receipt_handle, "VisibilityTimeout": 0}
+                    for i, receipt_handle in enumerate(receipt_handles[start : start + MAX_SQS_BATCH_SIZE])
+                ],
+            )
+        self._skipped_receipt_handles = []
+
+    def run(self, receivers: int = 8) -> RedriveStats:
+        # skipped messages stay invisible during the scan, so receivers do not receive them again
+        try:
+            with ThreadPoolExecutor(max_workers=receivers) as executor:
+                for future in [executor.submit(self._receive_loop) for _ in range(receivers)]:
+                    future.result()
+        finally:
+            self._release_skipped()
+        return self.stats
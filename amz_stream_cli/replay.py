@@ -0,0 +1,216 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from amz_stream_cli.lambda_modules import import_lambda_module
+from amz_stream_cli.landing_zone import is_canary_line, is_data_object, iter_object_lines, list_objects
+from amz_stream_cli.rate_limit import TokenBucket
+
+CHECKPOINT_INTERVAL_S = 5
+MAX_PUBLISH_ATTEMPTS = 3
+
+
+def load_sns_publisher():
+    """
+    Imports the SNS publisher of the fanout lambda, so that replayed records are published exactly as live records.
+    """
+    return import_lambda_module("sns_publisher")
+
+
+class ReplayCheckpoint:
+    """
+    Tracks replay progress in a local JSON file: completed object keys and the number of lines already published
+    from partially replayed objects. The file is rewritten atomically so an interrupted replay can always resume.
+    """
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.monotonic):
+        self.path = path
+        self.clock = clock
+        self.completed = set()
+        self.offsets = {}
+        self._flushed_at = clock()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                state = json.load(f)
+            self.completed = set(state["completed"])
+            self.offsets = state["offsets"]
+
+    def is_completed(self, key: str) -> bool:
+        return key in self.completed
+
+    def offset(self, key: str) -> int:
+        return self.offsets.get(key, 0)
+
+    def advance(self, key: str, lines: int) -> None:
+        with self._lock:
+            self.offsets[key] = lines
+        self.flush()
+
+    def complete(self, key: str) -> None:
+        with self._lock:
+            self.completed.add(key)
+            self.offsets.pop(key, None)
+        self.flush(force=True)
+
+    def flush(self, force: bool = False) -> None:
+        with self._lock:
+            if not force and self.clock() - self._flushed_at < CHECKPOINT_INTERVAL_S:
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"completed": sorted(self.completed), "offsets": self.offsets}, f)
+            os.replace(tmp_path, self.path)
+            self._flushed_at = self.clock()
+
+
+class ReplayStats:
+    def __init__(self):
+        self.objects = 0
+        self.published = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def record(self, objects: int = 0, published: int = 0, failed: int = 0) -> None:
+        with self._lock:
+            self.objects += objects
+            self.published += published
+            self.failed += failed
+
+    def as_dict(self) -> dict:
+        return {"objects": self.objects, "published": self.published, "failed": self.failed}
+
+
+class Replay:
+    """
+    Republishes landing zone records to a fanout topic.
+
+    Partitions are replayed in parallel, objects are streamed line by line and publishing is throttled by a shared
+    token bucket. Progress is checkpointed per object, so a resumed replay skips everything already published.
+    An object stops at its first batch with records which could not be published, its checkpoint stays before that
+    batch so the next run retries it.
+    Replayed records carry the REPLAY_ATTRIBUTE message attribute, which the landing zone subscription filters out.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        sns_client,
+        bucket: str,
+        topic_arn: str,
+        rate_limiter: TokenBucket,
+        checkpoint: ReplayCheckpoint,
+        sns_publisher=None,
+        sleep: Callable[[float], None] = time.sleep,
+        on_progress: Callable[[ReplayStats], None] = lambda stats: None,
+    ):
+        self.s3_client = s3_client
+        self.sns_client = sns_client
+        self.bucket = bucket
+        self.topic_arn = topic_arn
+        self.rate_limiter = rate_limiter
+        self.checkpoint = checkpoint
+        self.sns_publisher = sns_publisher or load_sns_publisher()
+        self.sleep = sleep
+        self.on_progress = on_progress
+        self.stats = ReplayStats()
+        self._stopped = threading.Event()
+
+    def _batches(self, lines):
+        """Yields batches of bodies with the number of lines read for them, latency canaries are skipped."""
+        batch, batch_bytes, read_lines = [], 0, 0
+        for line in lines:
+            if is_canary_line(line):
+                read_lines += 1
+                continue
+            body = line.decode("utf-8")
+            size = len(self.sns_publisher.to_sns_message(body).encode("utf-8"))
+            if batch and (
+                len(batch) == self.sns_publisher.MAX_BATCH_SIZE
+                or batch_bytes + size > self.sns_publisher.MAX_BATCH_PAYLOAD_BYTES
+            ):
+                yield batch, read_lines
+                batch, batch_bytes, read_lines = [], 0, 0
+            batch.append(body)
+            batch_bytes += size
+            read_lines += 1
+        if batch:
+            yield batch, read_lines
+
+    def _publish(self, bodies: List[str]) -> int:
+        """Publishes a batch, retrying failed entries, returns the number of entries which could not be published."""
+        for attempt in range(MAX_PUBLISH_ATTEMPTS):
+            self.rate_limiter.acquire(len(bodies))
+            failures = self.sns_publisher.publish_batch(
+                self.sns_client,
+                self.topic_arn,
+                bodies,
+                message_attributes={self.sns_publisher.REPLAY_ATTRIBUTE: {"DataType": "String", "StringValue": "true"}},
+            )
+            if not failures:
+                return 0
+            bodies = [bodies[int(failure["Id"])] for failure in failures]
+            if attempt < MAX_PUBLISH_ATTEMPTS - 1:
+                self.sleep(2**attempt)
+        return len(bodies)
+
+    def replay_object(self, key: str) -> None:
+        skip = self.checkpoint.offset(key)
+        lines = iter_object_lines(self.s3_client, self.bucket, key)
+        for _ in range(skip):
+            next(lines, None)
+
+        published_lines = skip
+        for bodies, read_lines in self._batches(lines):
+            if self._stopped.is_set():
+                return
+            failed = self._publish(bodies)
+            self.stats.record(published=len(bodies) - failed, failed=failed)
+            self.on_progress(self.stats)
+            if failed:
+                # keep the checkpoint before this batch, so the next run retries it instead of skipping its failures
+                return
+            published_lines += read_lines
+            self.checkpoint.advance(key, published_lines)
+
+        self.checkpoint.complete(key)
+        self.stats.record(objects=1)
+
+    def replay_partition(self, prefix: str) -> None:
+        for summary in list_objects(self.s3_client, self.bucket, prefix):
+            if self._stopped.is_set():
+                return
+            if is_data_object(summary["Key"]) and not self.checkpoint.is_completed(summary["Key"]):
+                self.replay_object(summary["Key"])
+
+    def run(self, prefixes: List[str], workers: int = 8) -> ReplayStats:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for future in [executor.submit(self.replay_partition, prefix) for prefix in prefixes]:
+                future.result()
+        except BaseException:
+            # interrupted or failed, stop the other partitions and keep what was published so far
+            self._stopped.set()
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            self.checkpoint.flush(force=True)
+        return self.stats
@@ -0,0 +1,94 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+DEFAULT_CONFIG_PATH = "stream_infrastructure_config.yml"
+
+
+class ConsumerStack(NamedTuple):
+    stack_name: str
+    advertising_region: str
+    installation_region: str
+    data_set_id: str
+    dataset_config: dict
+
+
+def load_config(path: str = DEFAULT_CONFIG_PATH) -> dict:
+    import yaml
+
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+
+def stack_name(advertising_region: str, data_set_id: str) -> str:
+    # Must match the stack ids used by amz_stream_infra
+    return f"AmzStream-{advertising_region}-{data_set_id}"
+
+
+def consumer_stacks(
+    config: dict,
+    advertising_regions: Optional[Iterable[str]] = None,
+    data_set_ids: Optional[Iterable[str]] = None,
+) -> List[ConsumerStack]:
+    """
+    Lists the consumer stacks described by the infrastructure config, optionally filtered by region and dataset.
+    """
+    advertising_regions = set(advertising_regions) if advertising_regions else None
+    data_set_ids = set(data_set_ids) if data_set_ids else None
+    installation_regions: Dict[str, str] = config["consumerStackInstallationAwsRegion"]
+
+    stacks = []
+    for advertising_region, datasets in config["datasets"].items():
+        if advertising_regions is not None and advertising_region not in advertising_regions:
+            continue
+        for dataset_config in datasets:
+            data_set_id = dataset_config["dataSetId"]
+            if data_set_ids is not None and data_set_id not in data_set_ids:
+                continue
+            stacks.append(
+                ConsumerStack(
+                    stack_name(advertising_region, data_set_id),
+                    advertising_region,
+                    installation_regions[advertising_region],
+                    data_set_id,
+                    dataset_config,
+                )
+            )
+    return stacks
+
+
+def stack_resources(stack: ConsumerStack, cloudformation_client) -> List[dict]:
+    """
+    Lists the resource summaries of a deployed consumer stack. Stacks which are not deployed have no resources.
+    """
+    resources = []
+    paginator = cloudformation_client.get_paginator("list_stack_resources")
+    try:
+        for page in paginator.paginate(StackName=stack.stack_name):
+            resources.extend(page["StackResourceSummaries"])
+    except Exception as error:
+        if "does not exist" in str(error):
+            return []
+        raise
+    return resources
+
+
+def find_resource(resources: List[dict], resource_type: str, logical_id_prefix: str) -> Optional[str]:
+    """Returns the physical id of the first resource of the given type whose logical id has the given prefix."""
+    for resource in resources:
+        if resource["ResourceType"] == resource_type and resource["LogicalResourceId"].startswith(logical_id_prefix):
+            return resource["PhysicalResourceId"]
+    return None
@@ -13,57 +13,73 @@
 # IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
+import logging as log
 from ad_api.base import (
     ApiResponse,
     Client,
-    Marketplaces,
     sp_endpoint,
     fill_query_params,
 )
+from ad_api.auth import AccessTokenResponse
 from amz_stream_cli import __version__
-from enum import Enum
+from amz_stream_cli.api_session import DEFAULT_MAX_RETRIES, TokenCache, get_session, send_with_retries
+from amz_stream_cli.stream_types import (
+    AdvertisingApiRegion,
+    DataSet,
+    SubscriptionUpdateEntityStatus,
+)
 
 
-class AdvertisingApiRegion(str, Enum):
-    NA = "NA"
-    EU = "EU"
-    FE = "FE"
+class Stream(Client):
+    """
+    Amazon Marketing Stream subscriptions API client.
 
-    @staticmethod
-    def get_marketplace(api_region):
-        if api_region == AdvertisingApiRegion.NA:
-            return Marketplaces.NA
-        elif api_region == AdvertisingApiRegion.EU:
-            return Marketplaces.EU
-        elif api_region == AdvertisingApiRegion.FE:
-            return Marketplaces.JP
-        else:
-            raise Exception(f"Unsupported region: {api_region}")
+    Unlike the base ad_api client, requests share a pooled HTTP session, access tokens are cached on disk
+    until they expire and throttled or failed requests are retried with backoff.
+    """
 
+    def __init__(self, *args, max_retries: int = DEFAULT_MAX_RETRIES, token_cache: TokenCache = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retries = max_retries
+        self.token_cache = token_cache or TokenCache()
 
-class DataSet(str, Enum):
-    sp_traffic = "sp-traffic"
-    sp_conversion = "sp-conversion"
-    budget_usage = "budget-usage"
-    sd_traffic = "sd-traffic"
-    sd_conversion = "sd-conversion"
-    sponsored_ads_campaign_diagnostics_recommendations = "sponsored-ads-campaign-diagnostics-recommendations"
-    campaigns = "campaigns"
-    adgroups = "adgroups"
-    ads = "ads"
-    targets = "targets"
-    sb_traffic = "sb-traffic"
-    sb_conversion = "sb-conversion"
-    sb_clickstream = "sb-clickstream"
-    sb_rich_media = "sb-rich-media"
-    sp_budget_recommendations = "sp-budget-recommendations"
+    @property
+    def auth(self) -> AccessTokenResponse:
+        if self._access_token is not None:
+            return AccessTokenResponse(access_token=self._access_token)
 
+        access_token = self.token_cache.get(self.credentials)
+        if access_token is not None:
+            return AccessTokenResponse(access_token=access_token)
 
-class SubscriptionUpdateEntityStatus(str, Enum):
-    archived = "ARCHIVED"
+        response = self._auth.get_auth()
+        try:
+            self.token_cache.put(self.credentials, response.access_token, response.expires_in or 3600)
+        except OSError as error:
+            log.warning("Unable to cache access token: %s", error)
+        return response
 
+    def _request(self, path: str, data=None, params=None, headers=None) -> ApiResponse:
+        params = dict(params or {})
+        method = params.pop("method")
+        request_headers = self.headers.copy()
+        request_headers.update(headers or {})
+
+        response = send_with_retries(
+            lambda: get_session().request(
+                method,
+                self.endpoint + path,
+                params=params,
+                data=data if method in ("POST", "PUT", "PATCH") else None,
+                headers=request_headers,
+                timeout=self.timeout,
+                proxies=self.proxies,
+                verify=self.verify,
+            ),
+            max_retries=self.max_retries,
+        )
+        return self._check_response(response)
 
-class Stream(Client):
     @sp_endpoint("/streams/subscriptions", method="POST")
     def create_subscription(self, **kwargs) -> ApiResponse:
         return self._request(
@@ -16,9 +16,11 @@
 import aws_cdk as cdk
 
 from .stack_definitions import AmzStreamConsumerStack
+from .stack_definitions_dashboard import AmzStreamDashboardStack
 from .stack_definitions_firehose import AmzStreamConsumerStackFirehose
+from .stack_definitions_kinesis import AmzStreamConsumerStackKinesis
 
-SUPPORTED_DELIVERY_METHODS = ["sqs", "firehose"]
+SUPPORTED_DELIVERY_METHODS = ["sqs", "firehose", "kinesis"]
 
 
 def validate_delivery_method(delivery_method: str):
@@ -34,21 +36,40 @@ def rollout_stacks(app: cdk.App, config: dict, delivery_method: str):
     ambassadors_config = config["ambassadors"]
     datasets_config = config["datasets"]
     installation_region_config = config["consumerStackInstallationAwsRegion"]
+    # alarms and the dashboards are only created when the config has a monitoring section
+    monitoring_config = config.get("monitoring")
     for advertising_region in datasets_config:
+        consumer_stacks = []
         for dataset_config in datasets_config[advertising_region]:
             if delivery_method == "sqs":
-                AmzStreamConsumerStack(
+                stack = AmzStreamConsumerStack(
                     app,
                     advertising_region,
                     installation_region_config[advertising_region],
                     dataset_config,
                     ambassadors_config,
+                    monitoring_config,
                 )
             elif delivery_method == "firehose":
-                AmzStreamConsumerStackFirehose(
+                stack = AmzStreamConsumerStackFirehose(
                     app,
                     advertising_region,
                     installation_region_config[advertising_region],
                     dataset_config,
                     ambassadors_config,
+                    monitoring_config,
                 )
+            elif delivery_method == "kinesis":
+                stack = AmzStreamConsumerStackKinesis(
+                    app,
+                    advertising_region,
+                    installation_region_config[advertising_region],
+                    dataset_config,
+                    ambassadors_config,
+                )
+            consumer_stacks.append(stack)
+
+        if monitoring_config is not None and delivery_method != "kinesis":
+            AmzStreamDashboardStack(
+                app, advertising_region, installation_region_config[advertising_region], consumer_stacks
+            )
@@ -19,21 +19,109 @@ import os
 from aws_cdk import (
     Environment,
     Fn as fn,
+    ArnFormat,
     Duration,
+    Size,
     Stack,
     Tags,
     CfnOutput,
     aws_iam as iam,
     aws_sqs as sqs,
     aws_sns as sns,
+    aws_sns_subscriptions as sns_subscriptions,
+    aws_cloudwatch as cloudwatch,
+    aws_cloudwatch_actions as cloudwatch_actions,
+    aws_events as events,
+    aws_events_targets as events_targets,
     aws_lambda as _lambda,
     aws_lambda_event_sources as lambda_events,
     aws_s3 as s3,
+    aws_s3_notifications as s3_notifications,
+    aws_dynamodb as dynamodb,
     aws_kinesisfirehose_alpha as firehose,
     aws_kinesisfirehose_destinations_alpha as destinations,
     aws_lambda_event_sources as lambda_event_source,
 )
 
+# Entity change datasets and the record field identifying the entity
+ENTITY_ID_FIELDS = {
+    "campaigns": "campaignId",
+    "adgroups": "adGroupId",
+    "ads": "adId",
+    "targets": "targetId",
+}
+
+# Datasets with hourly rollups per advertiser and campaign, the rollup lambda knows their metric fields
+ROLLUP_DATASETS = ("sp-traffic", "sp-conversion")
+
+# Alarm thresholds used when the monitoring section of the config does not set them
+DEFAULT_MONITORING_CONFIG = {
+    "alarmPeriodMinutes": 5,
+    "alarmEvaluationPeriods": 1,
+    "ingressQueueMaxAgeSeconds": 300,
+    "dlqMaxMessages": 0,
+    "fanoutMaxErrors": 0,
+    "fanoutMaxThrottles": 0,
+    "firehoseMaxFreshnessSeconds": 900,
+    "s3DeliveryMinSuccessRatio": 1,
+}
+
+
+def ordering_key_fields(dataset_config):
+    """
+    Record fields whose value is the message group id of a dataset's records in ordered mode
+    """
+    if dataset_config.get("orderingKey", "entity") == "advertiser":
+        return ["advertiser_id", "advertiserId"]
+    data_set_id = dataset_config["dataSetId"]
+    entity_id_field = dataset_config.get("entityIdField", ENTITY_ID_FIELDS.get(data_set_id))
+    if entity_id_field is None:
+        raise ValueError(
+            f"Ordering by entity is only supported for entity datasets: {', '.join(ENTITY_ID_FIELDS)}. "
+            f"Set entityIdField or orderingKey: advertiser to use it for dataset: {data_set_id}"
+        )
+    return [entity_id_field]
+
+
+def trace_functions(scope: Construct, dataset_config):
+    """
+    Turns on X-Ray active tracing of the lambda functions in scope when the dataset sets a trace sample rate
+    """
+    sample_rate = dataset_config.get("traceSampleRate")
+    if not sample_rate:
+        return
+    for construct in scope.node.find_all():
+        if isinstance(construct, _lambda.Function):
+            construct.node.default_child.tracing_config = _lambda.CfnFunction.TracingConfigProperty(mode="Active")
+            construct.add_to_role_policy(
+                iam.PolicyStatement(actions=["xray:PutTraceSegments", "xray:PutTelemetryRecords"], resources=["*"])
+            )
+            construct.add_environment("TRACE_SAMPLE_RATE", str(sample_rate))
+
+
+def landing_record_processor(scope: Construct, dataset_config):
+    """
+    Creates the Firehose transformation lambda which normalizes the landing records when the dataset sets
+    normalizeRecords, returns its processor or None
+    """
+    if not dataset_config.get("normalizeRecords"):
+        return None
+    transform_lambda = _lambda.Function(
+        scope,
+        "TransformLambda",
+        runtime=_lambda.Runtime.PYTHON_3_9,
+        handler="firehose_transform_lambda.handler",
+        code=_lambda.Code.from_asset(path="lambda"),
+        timeout=Duration.minutes(1),
+        memory_size=256,
+        environment={"DATA_SET_ID": dataset_config["dataSetId"]},
+    )
+    return firehose.LambdaFunctionProcessor(
+        transform_lambda,
+        buffer_interval=Duration.seconds(int(dataset_config.get("normalizeRecordsBufferingIntervalSeconds", 60))),
+        buffer_size=Size.mebibytes(int(dataset_config.get("normalizeRecordsBufferingSizeMB", 1))),
+    )
+
 
 class DataSetScopedConstruct(Construct):
     """
@@ -146,23 +234,190 @@ class StreamFanout(DataSetScopedConstruct):
             ),
         )
 
+        # records failing the dataset validation are kept here instead of reaching the landing zone
+        self.quarantine_queue = sqs.Queue(
+            self,
+            "QuarantineQueue",
+            visibility_timeout=Duration.seconds(visibility_timeout_s),
+            retention_period=Duration.days(14),
+        )
+
         self.fanout_lambda = _lambda.Function(
             self,
             "Lambda",
             runtime=_lambda.Runtime.PYTHON_3_9,
             handler="stream_fanout_lambda.handler",
             code=_lambda.Code.from_asset(path="lambda"),
+            memory_size=int(dataset_config.get("fanoutMemoryMB", 128)),
             environment={
+                "DATA_SET_ID": dataset_config["dataSetId"],
                 "DATA_FANOUT_TOPIC_ARN": self.data_fanout_topic.topic_arn,
                 "SUBSCRIPTION_CONFIRMATION_QUEUE_URL": self.subscription_confirmation_queue.queue_url,
+                "QUARANTINE_QUEUE_URL": self.quarantine_queue.queue_url,
             },
         )
         self.data_fanout_topic.grant_publish(self.fanout_lambda)
         self.subscription_confirmation_queue.grant_send_messages(self.fanout_lambda)
+        self.quarantine_queue.grant_send_messages(self.fanout_lambda)
 
     def subscribe_to_stream(self, stream_ingress: StreamIngress):
-        invoke_event_source = lambda_events.SqsEventSource(stream_ingress.ingress_queue)
-        self.fanout_lambda.add_event_source(invoke_event_source)
+        max_concurrency = None
+        if self.dataset_config.get("adaptiveConcurrency", False):
+            max_concurrency = int(self.dataset_config.get("fanoutMaxConcurrency", 50))
+        batching_window_s = int(self.dataset_config.get("fanoutBatchingWindowSeconds", 0))
+        self.ingress_event_source = lambda_events.SqsEventSource(
+            stream_ingress.ingress_queue,
+            batch_size=int(self.dataset_config.get("fanoutBatchSize", 10)),
+            max_batching_window=Duration.seconds(batching_window_s) if batching_window_s else None,
+            max_concurrency=max_concurrency,
+        )
+        self.fanout_lambda.add_event_source(self.ingress_event_source)
+
+
+class ContainerIngressConsumer(DataSetScopedConstruct):
+    """
+    Task role and settings of the ingress consumer daemon, used instead of the fanout lambda event source
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        ambassadors_config,
+        dataset_config,
+        stream_ingress: StreamIngress,
+        stream_fanout: StreamFanout,
+    ) -> None:
+        super().__init__(scope, construct_id, ambassadors_config, dataset_config)
+
+        self.task_role = iam.Role(self, "TaskRole", assumed_by=iam.ServicePrincipal("ecs-tasks.amazonaws.com"))
+        stream_ingress.ingress_queue.grant_consume_messages(self.task_role)
+        stream_fanout.data_fanout_topic.grant_publish(self.task_role)
+        stream_fanout.subscription_confirmation_queue.grant_send_messages(self.task_role)
+        stream_fanout.quarantine_queue.grant_send_messages(self.task_role)
+
+        CfnOutput(self, "TaskRoleArn", value=self.task_role.role_arn)
+        CfnOutput(self, "IngressQueueUrl", value=stream_ingress.ingress_queue.queue_url)
+        CfnOutput(self, "DataFanoutTopicArn", value=stream_fanout.data_fanout_topic.topic_arn)
+        CfnOutput(
+            self, "SubscriptionConfirmationQueueUrl", value=stream_fanout.subscription_confirmation_queue.queue_url
+        )
+        CfnOutput(self, "QuarantineQueueUrl", value=stream_fanout.quarantine_queue.queue_url)
+
+
+class OrderedFanout(DataSetScopedConstruct):
+    """
+    FIFO fanout topic delivering the records of the same key in order. A forwarder lambda subscribed to the data
+    fanout topic publishes to it, so its failures are retried from its own queue and never republish to the standard
+    topic.
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        ambassadors_config,
+        dataset_config,
+        visibility_timeout_s: int = 60,
+        max_receive_count: int = 10,
+    ) -> None:
+        super().__init__(scope, construct_id, ambassadors_config, dataset_config)
+
+        self.ordered_fanout_topic = sns.Topic(self, "Topic", fifo=True)
+        CfnOutput(self, "OrderedDataTopicArn", value=self.ordered_fanout_topic.topic_arn)
+
+        self.dlq = sqs.Queue(self, "Dlq", visibility_timeout=Duration.seconds(visibility_timeout_s))
+        self.queue = sqs.Queue(
+            self,
+            "Queue",
+            visibility_timeout=Duration.seconds(visibility_timeout_s),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=max_receive_count, queue=self.dlq),
+        )
+
+        self.forwarder_lambda = _lambda.Function(
+            self,
+            "Lambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="ordered_forwarder_lambda.handler",
+            code=_lambda.Code.from_asset(path="lambda"),
+            environment={
+                "ORDERED_FANOUT_TOPIC_ARN": self.ordered_fanout_topic.topic_arn,
+                "ORDERING_KEY_FIELDS": ",".join(ordering_key_fields(dataset_config)),
+            },
+        )
+        self.ordered_fanout_topic.grant_publish(self.forwarder_lambda)
+        self.forwarder_lambda.add_event_source(
+            lambda_events.SqsEventSource(self.queue, report_batch_item_failures=True)
+        )
+
+    def subscribe_to_fanout(self, stream_fanout: StreamFanout):
+        stream_fanout.data_fanout_topic.add_subscription(
+            sns_subscriptions.SqsSubscription(
+                self.queue,
+                raw_message_delivery=True,
+                # latency canaries published by the fanout lambda are only meant for the landing zone
+                filter_policy={"amz_stream_canary": sns.SubscriptionFilter(conditions=[{"exists": False}])},
+            )
+        )
+
+
+class AdaptiveFanoutConcurrency(DataSetScopedConstruct):
+    """
+    Keeps the fanout lambda below the SNS publish limit. The fanout lambda publishes its SNS throttling as metrics and
+    limits its own publish rate, a scheduled controller adjusts the maximum concurrency of its event source.
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        ambassadors_config,
+        dataset_config,
+        stream_fanout: StreamFanout,
+    ) -> None:
+        super().__init__(scope, construct_id, ambassadors_config, dataset_config)
+
+        stream_fanout.fanout_lambda.add_environment("FANOUT_PUBLISH_METRICS", "1")
+        stream_fanout.fanout_lambda.add_environment(
+            "FANOUT_MAX_PUBLISH_RATE", str(dataset_config.get("fanoutMaxPublishRate", 3000))
+        )
+
+        self.controller_lambda = _lambda.Function(
+            self,
+            "ControllerLambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="concurrency_controller_lambda.handler",
+            code=_lambda.Code.from_asset(path="lambda"),
+            environment={
+                "DATA_SET_ID": dataset_config["dataSetId"],
+                "EVENT_SOURCE_MAPPING_ID": stream_fanout.ingress_event_source.event_source_mapping_id,
+                "MIN_CONCURRENCY": str(dataset_config.get("fanoutMinConcurrency", 2)),
+                "MAX_CONCURRENCY": str(dataset_config.get("fanoutMaxConcurrency", 50)),
+                "MAX_PUBLISH_LATENCY_MS": str(dataset_config.get("fanoutMaxPublishLatencyMs", 500)),
+            },
+        )
+        self.controller_lambda.add_to_role_policy(
+            iam.PolicyStatement(actions=["cloudwatch:GetMetricData"], resources=["*"])
+        )
+        self.controller_lambda.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["lambda:GetEventSourceMapping", "lambda:UpdateEventSourceMapping"],
+                resources=[
+                    Stack.of(self).format_arn(
+                        service="lambda",
+                        resource="event-source-mapping",
+                        resource_name=stream_fanout.ingress_event_source.event_source_mapping_id,
+                        arn_format=ArnFormat.COLON_RESOURCE_NAME,
+                    )
+                ],
+            )
+        )
+        events.Rule(
+            self,
+            "ControllerSchedule",
+            schedule=events.Schedule.rate(Duration.minutes(1)),
+            targets=[events_targets.LambdaFunction(self.controller_lambda)],
+        )
 
 
 class StreamLanding(DataSetScopedConstruct):
@@ -183,6 +438,11 @@ class StreamLanding(DataSetScopedConstruct):
                         dataset_config['dataSetId']}/{prefix}",
                     error_output_prefix=f"errors/{
                         dataset_config['dataSetId']}/",
+                    buffering_interval=Duration.seconds(
+                        int(dataset_config.get("firehoseBufferingIntervalSeconds", 300))
+                    ),
+                    buffering_size=Size.mebibytes(int(dataset_config.get("firehoseBufferingSizeMB", 5))),
+                    processor=landing_record_processor(self, dataset_config),
                 )
             ],
         )
@@ -204,6 +464,413 @@ class StreamLanding(DataSetScopedConstruct):
             protocol=sns.SubscriptionProtocol.FIREHOSE,
             subscription_role_arn=self.sns_subscriptions_role.role_arn,
             raw_message_delivery=True,
+            # records replayed from this landing zone by the CLI are tagged with amz_stream_replay, skip them
+            filter_policy={"amz_stream_replay": sns.SubscriptionFilter(conditions=[{"exists": False}])},
+        )
+
+
+class LandingZoneIndex(DataSetScopedConstruct):
+    """
+    Index of the landing zone objects per hourly partition, kept up to date from S3 event notifications
+    """
+
+    def __init__(
+        self, scope: Construct, construct_id: str, ambassadors_config, dataset_config, lz_bucket: s3.Bucket
+    ) -> None:
+        super().__init__(scope, construct_id, ambassadors_config, dataset_config)
+
+        self.index_table = dynamodb.Table(
+            self,
+            "Table",
+            partition_key=dynamodb.Attribute(name="partition", type=dynamodb.AttributeType.STRING),
+            sort_key=dynamodb.Attribute(name="key", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+        )
+        self.index_table_output = CfnOutput(self, "IndexTableName", value=self.index_table.table_name)
+
+        self.index_lambda = _lambda.Function(
+            self,
+            "Lambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="landing_zone_index_lambda.handler",
+            code=_lambda.Code.from_asset(path="lambda"),
+            timeout=Duration.minutes(5),
+            memory_size=256,
+            environment={
+                "INDEX_TABLE_NAME": self.index_table.table_name,
+                "EVENT_TIME_FIELD": dataset_config.get("eventTimeField", "time_window_start"),
+            },
+        )
+        lz_bucket.grant_read(self.index_lambda)
+        self.index_table.grant_read_write_data(self.index_lambda)
+
+        for event_type in (s3.EventType.OBJECT_CREATED, s3.EventType.OBJECT_REMOVED):
+            lz_bucket.add_event_notification(
+                event_type,
+                s3_notifications.LambdaDestination(self.index_lambda),
+                s3.NotificationKeyFilter(prefix=f"{dataset_config['dataSetId']}/"),
+            )
+
+
+class EntityStateMaterializer(DataSetScopedConstruct):
+    """
+    Latest state table of an entity change dataset, kept up to date from the fanout topic,
+    with scheduled point in time snapshots exported to the landing zone bucket
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        ambassadors_config,
+        dataset_config,
+        snapshot_bucket: s3.Bucket,
+        visibility_timeout_s: int = 60,
+        max_receive_count: int = 10,
+    ) -> None:
+        super().__init__(scope, construct_id, ambassadors_config, dataset_config)
+
+        data_set_id = dataset_config["dataSetId"]
+        entity_id_field = dataset_config.get("entityIdField", ENTITY_ID_FIELDS.get(data_set_id))
+        if entity_id_field is None:
+            raise ValueError(
+                f"Latest state is only supported for entity datasets: {', '.join(ENTITY_ID_FIELDS)}. "
+                f"Set entityIdField to use it for dataset: {data_set_id}"
+            )
+
+        self.state_table = dynamodb.Table(
+            self,
+            "Table",
+            partition_key=dynamodb.Attribute(name="entityId", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            point_in_time_recovery=True,
+        )
+        self.state_table_output = CfnOutput(self, "StateTableName", value=self.state_table.table_name)
+
+        # in ordered mode the queue is subscribed to the FIFO fanout topic, so updates of an entity arrive in order
+        ordered = dataset_config.get("orderedDelivery", False) or None
+        self.dlq = sqs.Queue(self, "Dlq", visibility_timeout=Duration.seconds(visibility_timeout_s), fifo=ordered)
+        self.queue = sqs.Queue(
+            self,
+            "Queue",
+            visibility_timeout=Duration.seconds(visibility_timeout_s),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=max_receive_count, queue=self.dlq),
+            fifo=ordered,
+        )
+
+        self.materializer_lambda = _lambda.Function(
+            self,
+            "Lambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="entity_state_lambda.handler",
+            code=_lambda.Code.from_asset(path="lambda"),
+            environment={
+                "ENTITY_STATE_TABLE_NAME": self.state_table.table_name,
+                "ENTITY_ID_FIELD": entity_id_field,
+            },
+        )
+        self.state_table.grant_read_write_data(self.materializer_lambda)
+        self.materializer_lambda.add_event_source(
+            lambda_events.SqsEventSource(self.queue, report_batch_item_failures=True)
+        )
+
+        self.snapshot_lambda = _lambda.Function(
+            self,
+            "SnapshotLambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="entity_snapshot_lambda.handler",
+            code=_lambda.Code.from_asset(path="lambda"),
+            environment={
+                "ENTITY_STATE_TABLE_ARN": self.state_table.table_arn,
+                "SNAPSHOT_BUCKET_NAME": snapshot_bucket.bucket_name,
+                "SNAPSHOT_PREFIX": f"snapshots/{data_set_id}/",
+            },
+        )
+        self.snapshot_lambda.add_to_role_policy(
+            iam.PolicyStatement(actions=["dynamodb:ExportTableToPointInTime"], resources=[self.state_table.table_arn])
+        )
+        snapshot_bucket.grant_put(self.snapshot_lambda)
+        events.Rule(
+            self,
+            "SnapshotSchedule",
+            schedule=events.Schedule.expression(dataset_config.get("latestStateSnapshotSchedule", "rate(1 day)")),
+            targets=[events_targets.LambdaFunction(self.snapshot_lambda)],
+        )
+
+    def subscribe_to_fanout(self, stream_fanout: "StreamFanout", ordered_fanout: "OrderedFanout" = None):
+        topic = ordered_fanout.ordered_fanout_topic if ordered_fanout is not None else stream_fanout.data_fanout_topic
+        topic.add_subscription(
+            sns_subscriptions.SqsSubscription(
+                self.queue,
+                raw_message_delivery=True,
+                # latency canaries published by the fanout lambda are only meant for the landing zone
+                filter_policy={"amz_stream_canary": sns.SubscriptionFilter(conditions=[{"exists": False}])},
+            )
+        )
+
+
+class HourlyRollups(DataSetScopedConstruct):
+    """
+    Hourly rollups per advertiser and campaign, kept up to date from the fanout topic,
+    with the changed hours written to the landing zone bucket as compact partitions
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        ambassadors_config,
+        dataset_config,
+        rollup_bucket: s3.Bucket,
+        visibility_timeout_s: int = 60,
+        max_receive_count: int = 10,
+        shards: int = 10,
+    ) -> None:
+        super().__init__(scope, construct_id, ambassadors_config, dataset_config)
+
+        data_set_id = dataset_config["dataSetId"]
+        if data_set_id not in ROLLUP_DATASETS and "rollupMetricFields" not in dataset_config:
+            raise ValueError(
+                f"Hourly rollups are only supported for datasets: {', '.join(ROLLUP_DATASETS)}. "
+                f"Set rollupMetricFields to use them for dataset: {data_set_id}"
+            )
+
+        self.records_table = dynamodb.Table(
+            self,
+            "RecordsTable",
+            partition_key=dynamodb.Attribute(name="id", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expiresAt",
+        )
+        self.rollups_table = dynamodb.Table(
+            self,
+            "Table",
+            partition_key=dynamodb.Attribute(name="partition", type=dynamodb.AttributeType.STRING),
+            sort_key=dynamodb.Attribute(name="key", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            stream=dynamodb.StreamViewType.KEYS_ONLY,
+        )
+        self.rollups_table_output = CfnOutput(self, "RollupsTableName", value=self.rollups_table.table_name)
+
+        self.dlq = sqs.Queue(self, "Dlq", visibility_timeout=Duration.seconds(visibility_timeout_s))
+        self.queue = sqs.Queue(
+            self,
+            "Queue",
+            visibility_timeout=Duration.seconds(visibility_timeout_s),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=max_receive_count, queue=self.dlq),
+        )
+
+        environment = {
+            "DATA_SET_ID": data_set_id,
+            "ROLLUP_RECORDS_TABLE_NAME": self.records_table.table_name,
+            "ROLLUPS_TABLE_NAME": self.rollups_table.table_name,
+            "ROLLUP_SHARDS": str(shards),
+        }
+        if "rollupMetricFields" in dataset_config:
+            environment["ROLLUP_METRIC_FIELDS"] = ",".join(dataset_config["rollupMetricFields"])
+        self.rollup_lambda = _lambda.Function(
+            self,
+            "Lambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="rollup_lambda.handler",
+            code=_lambda.Code.from_asset(path="lambda"),
+            environment=environment,
+        )
+        self.records_table.grant_read_write_data(self.rollup_lambda)
+        self.rollups_table.grant_write_data(self.rollup_lambda)
+        self.rollup_lambda.add_event_source(lambda_events.SqsEventSource(self.queue, report_batch_item_failures=True))
+
+        self.emit_lambda = _lambda.Function(
+            self,
+            "EmitLambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="rollup_emit_lambda.handler",
+            code=_lambda.Code.from_asset(path="lambda"),
+            timeout=Duration.minutes(5),
+            environment={
+                "ROLLUPS_TABLE_NAME": self.rollups_table.table_name,
+                "ROLLUP_SHARDS": str(shards),
+                "ROLLUP_BUCKET_NAME": rollup_bucket.bucket_name,
+                "ROLLUP_PREFIX": f"rollups/{data_set_id}/",
+            },
+        )
+        self.rollups_table.grant_read_data(self.emit_lambda)
+        rollup_bucket.grant_put(self.emit_lambda)
+        self.emit_lambda.add_event_source(
+            lambda_events.DynamoEventSource(
+                self.rollups_table,
+                starting_position=_lambda.StartingPosition.TRIM_HORIZON,
+                batch_size=1000,
+                max_batching_window=Duration.seconds(int(dataset_config.get("rollupEmitIntervalSeconds", 300))),
+                retry_attempts=10,
+            )
+        )
+
+    def subscribe_to_fanout(self, stream_fanout: "StreamFanout"):
+        stream_fanout.data_fanout_topic.add_subscription(
+            sns_subscriptions.SqsSubscription(
+                self.queue,
+                raw_message_delivery=True,
+                # latency canaries published by the fanout lambda are only meant for the landing zone
+                filter_policy={"amz_stream_canary": sns.SubscriptionFilter(conditions=[{"exists": False}])},
+            )
+        )
+
+
+class LatencyCanary(DataSetScopedConstruct):
+    """
+    Scheduled canary injecting a synthetic record where the dataset enters the stack, the ingress queue or without one
+    the Firehose, and measuring when it lands in the landing zone bucket
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        ambassadors_config,
+        dataset_config,
+        stream_landing,
+        stream_ingress: StreamIngress = None,
+    ) -> None:
+        super().__init__(scope, construct_id, ambassadors_config, dataset_config)
+
+        data_set_id = dataset_config["dataSetId"]
+        self.canary_lambda = _lambda.Function(
+            self,
+            "Lambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="latency_canary_lambda.handler",
+            code=_lambda.Code.from_asset(path="lambda"),
+            timeout=Duration.minutes(2),
+            memory_size=512,
+            environment={
+                "DATA_SET_ID": data_set_id,
+                "LANDING_BUCKET_NAME": stream_landing.lz_bucket.bucket_name,
+                "CANARY_TIMEOUT_SECONDS": str(dataset_config.get("latencyCanaryTimeoutSeconds", 1800)),
+            },
+        )
+        stream_landing.lz_bucket.grant_read(self.canary_lambda, f"{data_set_id}/*")
+        stream_landing.lz_bucket.grant_read_write(self.canary_lambda, f"canary/{data_set_id}/*")
+        if stream_ingress is not None:
+            self.canary_lambda.add_environment("INGRESS_QUEUE_URL", stream_ingress.ingress_queue.queue_url)
+            stream_ingress.ingress_queue.grant_send_messages(self.canary_lambda)
+        else:
+            self.canary_lambda.add_environment("DELIVERY_STREAM_NAME", stream_landing.firehose.delivery_stream_name)
+            stream_landing.firehose.grant_put_records(self.canary_lambda)
+
+        events.Rule(
+            self,
+            "Schedule",
+            schedule=events.Schedule.expression(dataset_config.get("latencyCanarySchedule", "rate(5 minutes)")),
+            targets=[events_targets.LambdaFunction(self.canary_lambda)],
+        )
+
+
+class StreamMonitoring(DataSetScopedConstruct):
+    """
+    Alarms on the backlog and delivery failures of a consumer stack. Thresholds come from the monitoring section of
+    the config, overridden by the monitoring settings of the dataset.
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, ambassadors_config, dataset_config, monitoring_config):
+        super().__init__(scope, construct_id, ambassadors_config, dataset_config)
+
+        self.thresholds = {**DEFAULT_MONITORING_CONFIG, **monitoring_config, **dataset_config.get("monitoring", {})}
+        self.period = Duration.minutes(int(self.thresholds["alarmPeriodMinutes"]))
+        self.alarms = []
+        self.alarm_action = None
+        if self.thresholds.get("alarmTopicArn"):
+            self.alarm_action = cloudwatch_actions.SnsAction(
+                sns.Topic.from_topic_arn(self, "AlarmTopic", self.thresholds["alarmTopicArn"])
+            )
+
+    def _alarm(self, construct_id, metric, threshold_name, description, below=False):
+        alarm = cloudwatch.Alarm(
+            self,
+            construct_id,
+            metric=metric,
+            threshold=self.thresholds[threshold_name],
+            comparison_operator=(
+                cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD
+                if below
+                else cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD
+            ),
+            evaluation_periods=int(self.thresholds["alarmEvaluationPeriods"]),
+            # queues and lambdas without traffic publish no data points
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+            alarm_description=f"{self.dataset_config['dataSetId']}: {description}",
+        )
+        if self.alarm_action is not None:
+            alarm.add_alarm_action(self.alarm_action)
+            alarm.add_ok_action(self.alarm_action)
+        self.alarms.append(alarm)
+        return alarm
+
+    def _queue_depth_alarm(self, construct_id, queue: sqs.Queue, description):
+        return self._alarm(
+            construct_id,
+            queue.metric_approximate_number_of_messages_visible(period=self.period, statistic="Maximum"),
+            "dlqMaxMessages",
+            description,
+        )
+
+    def monitor_ingress(self, stream_ingress: StreamIngress):
+        self._alarm(
+            "IngressQueueAge",
+            stream_ingress.ingress_queue.metric_approximate_age_of_oldest_message(
+                period=self.period, statistic="Maximum"
+            ),
+            "ingressQueueMaxAgeSeconds",
+            "age in seconds of the oldest message in the ingress queue",
+        )
+        self._queue_depth_alarm("IngressDlqDepth", stream_ingress.ingress_dlq, "messages in the ingress DLQ")
+
+    def monitor_fanout(self, stream_fanout: StreamFanout):
+        self._alarm(
+            "FanoutErrors",
+            stream_fanout.fanout_lambda.metric_errors(period=self.period, statistic="Sum"),
+            "fanoutMaxErrors",
+            "failed fanout lambda invocations",
+        )
+        self._alarm(
+            "FanoutThrottles",
+            stream_fanout.fanout_lambda.metric_throttles(period=self.period, statistic="Sum"),
+            "fanoutMaxThrottles",
+            "throttled fanout lambda invocations",
+        )
+        if self.dataset_config.get("adaptiveConcurrency", False):
+            self._alarm(
+                "FanoutPublishThrottles",
+                cloudwatch.Metric(
+                    namespace="AmzStream/Fanout",
+                    metric_name="ThrottledMessages",
+                    dimensions_map={"DataSetId": self.dataset_config["dataSetId"]},
+                    period=self.period,
+                    statistic="Sum",
+                ),
+                "fanoutMaxThrottles",
+                "fanout messages throttled by SNS",
+            )
+        self._queue_depth_alarm(
+            "SubsConfirmationDlqDepth",
+            stream_fanout.subscription_confirmation_dlq,
+            "messages in the subscription confirmation DLQ",
+        )
+        self._queue_depth_alarm("QuarantineDepth", stream_fanout.quarantine_queue, "records in the quarantine queue")
+
+    def monitor_landing(self, stream_landing):
+        self._alarm(
+            "FirehoseFreshness",
+            stream_landing.firehose.metric("DeliveryToS3.DataFreshness", period=self.period, statistic="Maximum"),
+            "firehoseMaxFreshnessSeconds",
+            "age in seconds of the oldest record in the Firehose not yet delivered to S3",
+        )
+        self._alarm(
+            "S3DeliveryFailures",
+            stream_landing.firehose.metric("DeliveryToS3.Success", period=self.period, statistic="Minimum"),
+            "s3DeliveryMinSuccessRatio",
+            "ratio of successful Firehose deliveries to S3",
+            below=True,
         )
 
 
@@ -237,6 +904,7 @@ class AmzStreamConsumerStack(Stack):
         installation_region,
         dataset_config,
         ambassadors_config,
+        monitoring_config=None,
         **kwargs,
     ) -> None:
         super().__init__(
@@ -252,7 +920,21 @@ class AmzStreamConsumerStack(Stack):
         self.stream_ingress = StreamIngress(self, "Ingress", ambassadors_config, dataset_config)
 
         self.stream_fanout = StreamFanout(self, "Fanout", ambassadors_config, dataset_config)
-        self.stream_fanout.subscribe_to_stream(self.stream_ingress)
+        if dataset_config.get("ingressConsumer", "lambda") == "container":
+            self.container_consumer = ContainerIngressConsumer(
+                self, "Consumer", ambassadors_config, dataset_config, self.stream_ingress, self.stream_fanout
+            )
+        else:
+            self.stream_fanout.subscribe_to_stream(self.stream_ingress)
+            if dataset_config.get("adaptiveConcurrency", False):
+                self.adaptive_concurrency = AdaptiveFanoutConcurrency(
+                    self, "Concurrency", ambassadors_config, dataset_config, self.stream_fanout
+                )
+
+        self.ordered_fanout = None
+        if dataset_config.get("orderedDelivery", False):
+            self.ordered_fanout = OrderedFanout(self, "OrderedFanout", ambassadors_config, dataset_config)
+            self.ordered_fanout.subscribe_to_fanout(self.stream_fanout)
 
         self.stream_storage = StreamLanding(self, "Storage", ambassadors_config, dataset_config)
         self.stream_storage.subscribe_to_fanout(self.stream_fanout)
@@ -262,4 +944,36 @@ class AmzStreamConsumerStack(Stack):
         )
         self.subscription_confirmation.subscribe_to_fanout(self.stream_fanout)
 
+        if dataset_config.get("landingZoneIndex", False):
+            self.landing_zone_index = LandingZoneIndex(
+                self, "Index", ambassadors_config, dataset_config, self.stream_storage.lz_bucket
+            )
+
+        if dataset_config.get("latencyCanary", False):
+            self.latency_canary = LatencyCanary(
+                self, "Canary", ambassadors_config, dataset_config, self.stream_storage, self.stream_ingress
+            )
+
+        if dataset_config.get("latestState", False):
+            self.entity_state = EntityStateMaterializer(
+                self, "LatestState", ambassadors_config, dataset_config, self.stream_storage.lz_bucket
+            )
+            self.entity_state.subscribe_to_fanout(self.stream_fanout, self.ordered_fanout)
+
+        if dataset_config.get("hourlyRollups", False):
+            self.hourly_rollups = HourlyRollups(
+                self, "Rollups", ambassadors_config, dataset_config, self.stream_storage.lz_bucket
+            )
+            self.hourly_rollups.subscribe_to_fanout(self.stream_fanout)
+
+        self.stream_monitoring = None
+        if monitoring_config is not None:
+            self.stream_monitoring = StreamMonitoring(
+                self, "Monitoring", ambassadors_config, dataset_config, monitoring_config
+            )
+            self.stream_monitoring.monitor_ingress(self.stream_ingress)
+            self.stream_monitoring.monitor_fanout(self.stream_fanout)
+            self.stream_monitoring.monitor_landing(self.stream_storage)
+
+        trace_functions(self, dataset_config)
         Tags.of(self).add("data_set_id", dataset_config["dataSetId"])
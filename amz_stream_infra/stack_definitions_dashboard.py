@@ -0,0 +1,62 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from typing import List
+from constructs import Construct
+from aws_cdk import (
+    Environment,
+    Stack,
+    aws_cloudwatch as cloudwatch,
+)
+
+
+class AmzStreamDashboardStack(Stack):
+    """
+    One CloudWatch dashboard for the consumer stacks of an advertising region, with the alarms of every stack
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        advertising_region,
+        installation_region,
+        consumer_stacks: List[Stack],
+        **kwargs,
+    ) -> None:
+        super().__init__(
+            scope,
+            f"AmzStream-{advertising_region}-Dashboard",
+            description=f"Amazon Marketing Stream Consumer Dashboard for Advertising region: {advertising_region}",
+            env=Environment(region=installation_region),
+            **kwargs,
+        )
+
+        monitored = [stack for stack in consumer_stacks if getattr(stack, "stream_monitoring", None) is not None]
+        self.dashboard = cloudwatch.Dashboard(self, "Dashboard", dashboard_name=f"AmzStream-{advertising_region}")
+        self.dashboard.add_widgets(
+            cloudwatch.AlarmStatusWidget(
+                title=f"Amazon Marketing Stream {advertising_region} alarms",
+                alarms=[alarm for stack in monitored for alarm in stack.stream_monitoring.alarms],
+                width=24,
+            )
+        )
+        for stack in monitored:
+            self.dashboard.add_widgets(cloudwatch.TextWidget(markdown=f"## {stack.stack_name}", width=24, height=1))
+            self.dashboard.add_widgets(
+                *[
+                    cloudwatch.AlarmWidget(alarm=alarm, title=alarm.node.id, width=6)
+                    for alarm in stack.stream_monitoring.alarms
+                ]
+            )
@@ -21,6 +21,7 @@ from aws_cdk import (
     Environment,
     Fn as fn,
     Duration,
+    Size,
     Stack,
     Tags,
     CfnOutput,
@@ -34,6 +35,13 @@ from aws_cdk import (
     aws_kinesisfirehose_destinations_alpha as destinations,
     aws_lambda_event_sources as lambda_event_source,
 )
+from .stack_definitions import (
+    LandingZoneIndex,
+    LatencyCanary,
+    StreamMonitoring,
+    landing_record_processor,
+    trace_functions,
+)
 
 
 class DataSetScopedConstruct(Construct):
@@ -155,6 +163,11 @@ class StreamLanding(DataSetScopedConstruct):
                         dataset_config['dataSetId']}/{prefix}",
                     error_output_prefix=f"errors/{
                         dataset_config['dataSetId']}/",
+                    buffering_interval=Duration.seconds(
+                        int(dataset_config.get("firehoseBufferingIntervalSeconds", 300))
+                    ),
+                    buffering_size=Size.mebibytes(int(dataset_config.get("firehoseBufferingSizeMB", 5))),
+                    processor=landing_record_processor(self, dataset_config),
                 )
             ],
         )
@@ -170,6 +183,7 @@ class AmzStreamConsumerStackFirehose(Stack):
         installation_region,
         dataset_config,
         ambassadors_config,
+        monitoring_config=None,
         **kwargs,
     ) -> None:
         super().__init__(
@@ -204,4 +218,21 @@ class AmzStreamConsumerStackFirehose(Stack):
             firehose_subscription_role_arn,
         )
 
+        if dataset_config.get("landingZoneIndex", False):
+            self.landing_zone_index = LandingZoneIndex(
+                self, "Index", ambassadors_config, dataset_config, self.stream_storage.lz_bucket
+            )
+
+        if dataset_config.get("latencyCanary", False):
+            self.latency_canary = LatencyCanary(self, "Canary", ambassadors_config, dataset_config, self.stream_storage)
+
+        # SNS delivers straight to the Firehose, so only the landing side can be monitored
+        self.stream_monitoring = None
+        if monitoring_config is not None:
+            self.stream_monitoring = StreamMonitoring(
+                self, "Monitoring", ambassadors_config, dataset_config, monitoring_config
+            )
+            self.stream_monitoring.monitor_landing(self.stream_storage)
+
+        trace_functions(self, dataset_config)
         Tags.of(self).add("data_set_id", dataset_config["dataSetId"])
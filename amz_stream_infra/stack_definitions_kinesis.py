@@ -0,0 +1,151 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from constructs import Construct
+from aws_cdk import (
+    Environment,
+    Duration,
+    Stack,
+    Tags,
+    CfnOutput,
+    aws_sqs as sqs,
+    aws_kinesis as kinesis,
+    aws_lambda as _lambda,
+    aws_lambda_event_sources as lambda_events,
+)
+from .stack_definitions import DataSetScopedConstruct, StreamIngress, SubscriptionConfirmation, trace_functions
+
+
+class KinesisForwarder(DataSetScopedConstruct):
+    """
+    Kinesis data stream of a dataset and the lambda forwarding ingress records into it, partitioned by advertiser id
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        ambassadors_config,
+        dataset_config,
+        visibility_timeout_s: int = 60,
+        max_receive_count: int = 10,
+        batch_size: int = 500,
+    ) -> None:
+        super().__init__(scope, construct_id, ambassadors_config, dataset_config)
+
+        shard_count = dataset_config.get("kinesisShardCount")
+        self.data_stream = kinesis.Stream(
+            self,
+            "DataStream",
+            stream_mode=kinesis.StreamMode.PROVISIONED if shard_count else kinesis.StreamMode.ON_DEMAND,
+            shard_count=shard_count,
+            retention_period=Duration.hours(int(dataset_config.get("kinesisRetentionHours", 24))),
+            encryption=kinesis.StreamEncryption.MANAGED,
+        )
+        CfnOutput(self, "DataStreamArn", value=self.data_stream.stream_arn)
+
+        # enhanced fan-out consumers, each reads the stream with its own dedicated throughput
+        self.stream_consumers = []
+        for i, consumer_name in enumerate(dataset_config.get("kinesisConsumers", [])):
+            stream_consumer = kinesis.CfnStreamConsumer(
+                self, f"Consumer{i}", consumer_name=consumer_name, stream_arn=self.data_stream.stream_arn
+            )
+            CfnOutput(self, f"Consumer{i}Arn", value=stream_consumer.attr_consumer_arn)
+            self.stream_consumers.append(stream_consumer)
+
+        self.subscription_confirmation_dlq = sqs.Queue(
+            self,
+            "SubsConfirmationDlq",
+            visibility_timeout=Duration.seconds(visibility_timeout_s),
+        )
+        self.subscription_confirmation_queue = sqs.Queue(
+            self,
+            "SubsConfirmationQueue",
+            visibility_timeout=Duration.seconds(visibility_timeout_s),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=max_receive_count,
+                queue=self.subscription_confirmation_dlq,
+            ),
+        )
+        self.quarantine_queue = sqs.Queue(
+            self,
+            "QuarantineQueue",
+            visibility_timeout=Duration.seconds(visibility_timeout_s),
+            retention_period=Duration.days(14),
+        )
+
+        self.forwarder_lambda = _lambda.Function(
+            self,
+            "Lambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="kinesis_forwarder_lambda.handler",
+            code=_lambda.Code.from_asset(path="lambda"),
+            timeout=Duration.seconds(30),
+            environment={
+                "DATA_SET_ID": dataset_config["dataSetId"],
+                "KINESIS_STREAM_NAME": self.data_stream.stream_name,
+                "SUBSCRIPTION_CONFIRMATION_QUEUE_URL": self.subscription_confirmation_queue.queue_url,
+                "QUARANTINE_QUEUE_URL": self.quarantine_queue.queue_url,
+            },
+        )
+        self.batch_size = batch_size
+        self.data_stream.grant_write(self.forwarder_lambda)
+        self.subscription_confirmation_queue.grant_send_messages(self.forwarder_lambda)
+        self.quarantine_queue.grant_send_messages(self.forwarder_lambda)
+
+    def subscribe_to_stream(self, stream_ingress: StreamIngress):
+        # larger batches are packed into fewer, larger PutRecords calls
+        self.forwarder_lambda.add_event_source(
+            lambda_events.SqsEventSource(
+                stream_ingress.ingress_queue,
+                batch_size=self.batch_size,
+                max_batching_window=Duration.seconds(1),
+                report_batch_item_failures=True,
+            )
+        )
+
+
+class AmzStreamConsumerStackKinesis(Stack):
+
+    def __init__(
+        self,
+        scope: Construct,
+        advertising_region,
+        installation_region,
+        dataset_config,
+        ambassadors_config,
+        **kwargs,
+    ) -> None:
+        super().__init__(
+            scope,
+            f"AmzStream-{advertising_region}-{dataset_config['dataSetId']}",
+            description=f"Amazon Marketing Stream Consumer (Kinesis) "
+            f"for Advertising region: {advertising_region} Dataset: {dataset_config['dataSetId']}",
+            env=Environment(region=installation_region),
+            **kwargs,
+        )
+
+        self.stream_ingress = StreamIngress(self, "Ingress", ambassadors_config, dataset_config)
+
+        self.stream_forwarder = KinesisForwarder(self, "Fanout", ambassadors_config, dataset_config)
+        self.stream_forwarder.subscribe_to_stream(self.stream_ingress)
+
+        self.subscription_confirmation = SubscriptionConfirmation(
+            self, "SubsConfirmation", ambassadors_config, dataset_config
+        )
+        self.subscription_confirmation.subscribe_to_fanout(self.stream_forwarder)
+
+        trace_functions(self, dataset_config)
+        Tags.of(self).add("data_set_id", dataset_config["dataSetId"])
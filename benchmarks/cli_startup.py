@@ -0,0 +1,67 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Measures CLI startup wall time.
+
+Usage:
+    python benchmarks/cli_startup.py [--runs 20]
+
+Each command is run in a fresh interpreter, the same way scripts invoke the CLI.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = [
+    ["--version"],
+    ["--help"],
+]
+
+
+def time_command(args, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "amz_stream_cli", *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20, help="Number of runs per command.")
+    args = parser.parse_args()
+
+    print(f"{'command':<36}{'min (ms)':>12}{'median (ms)':>14}{'max (ms)':>12}")
+    for command in COMMANDS:
+        timings = time_command(command, args.runs)
+        label = "python -m amz_stream_cli " + " ".join(command)
+        print(
+            f"{label:<36}{min(timings) * 1000:>12.1f}{statistics.median(timings) * 1000:>14.1f}"
+            f"{max(timings) * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Measures the per-record cost of routing in the fanout lambda.
+
+Usage:
+    python benchmarks/fanout_validation.py [--records 100000] [--data-set-id sp-traffic] [--budget-us 5]
+
+Reports the time per record of decoding the body alone, of the previous two-filter routing, and of the single-pass
+router with dataset validation. Exits with code 1 when validation adds more than the budget over decoding alone.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+# the lambda modules create their AWS clients at import, no calls are made
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import sqs_consuming_lambda  # noqa: E402
+import stream_fanout_lambda  # noqa: E402
+
+
+def synthetic_messages(count):
+    return [
+        {
+            "messageId": str(i),
+            "body": json.dumps(
+                {
+                    "idempotency_id": f"id-{i}",
+                    "dataset_id": "sp-traffic",
+                    "marketplace_id": "ATVPDKIKX0DER",
+                    "currency": "USD",
+                    "advertiser_id": "ENTITY1ABCDEFGHIJK",
+                    "campaign_id": str(100000 + i % 1000),
+                    "ad_group_id": str(200000 + i % 5000),
+                    "ad_id": str(300000 + i),
+                    "keyword_id": str(400000 + i),
+                    "keyword_text": "running shoes",
+                    "match_type": "BROAD",
+                    "placement": "Top of Search on-Amazon",
+                    "time_window_start": "2024-05-01T22:00:00.000Z",
+                    "clicks": i % 7,
+                    "impressions": 100 + i % 50,
+                    "cost": 0.42 * (i % 7),
+                }
+            ),
+        }
+        for i in range(count)
+    ]
+
+
+def time_per_record_us(route, messages):
+    start = time.perf_counter()
+    for message in messages:
+        route(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def two_filter_routing(message):
+    not sqs_consuming_lambda.is_subscription_confirmation(message)
+    sqs_consuming_lambda.is_subscription_confirmation(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100000, help="Number of synthetic records.")
+    parser.add_argument("--data-set-id", default="sp-traffic", help="Dataset whose validator is measured.")
+    parser.add_argument("--budget-us", type=float, default=5.0, help="Allowed validation overhead per record.")
+    args = parser.parse_args()
+
+    messages = synthetic_messages(args.records)
+    validate = stream_fanout_lambda.dataset_validator(args.data_set_id)
+    timings = {
+        "decode only": time_per_record_us(lambda message: json.loads(message["body"]), messages),
+        "two-filter routing": time_per_record_us(two_filter_routing, messages),
+        "single-pass routing + validation": time_per_record_us(
+            lambda message: stream_fanout_lambda.route_message(message, validate), messages
+        ),
+    }
+
+    print(f"{'step':<36}{'us/record':>12}")
+    for label, timing in timings.items():
+        print(f"{label:<36}{timing:>12.2f}")
+    overhead = timings["single-pass routing + validation"] - timings["decode only"]
+    print(f"{'validation overhead':<36}{overhead:>12.2f}")
+    if overhead > args.budget_us:
+        print(f"Validation overhead exceeds the budget of {args.budget_us}us per record")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
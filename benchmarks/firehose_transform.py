@@ -0,0 +1,131 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Measures the throughput of the Firehose transformation lambda on synthetic Firehose batches.
+
+Usage:
+    python benchmarks/firehose_transform.py [--records 100000] [--batch-size 500] [--data-set-id sp-traffic]
+        [--max-ratio 2]
+
+Reports the time per record of decoding and re-encoding the batches alone and of the full transformation, which
+flattens, casts and validates every record. Exits with code 1 when the transformation takes more than max-ratio
+times as long as decoding alone. The ratio is compared rather than absolute times, which vary with the hardware.
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+# the lambda modules create their AWS clients at import, no calls are made
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import firehose_transform_lambda  # noqa: E402
+
+
+def synthetic_batches(count, batch_size):
+    records = [
+        {
+            "recordId": str(i),
+            "data": base64.b64encode(
+                (
+                    json.dumps(
+                        {
+                            "idempotency_id": f"id-{i}",
+                            "dataset_id": "sp-traffic",
+                            "marketplace_id": "ATVPDKIKX0DER",
+                            "currency": "USD",
+                            "advertiser_id": "ENTITY1ABCDEFGHIJK",
+                            "campaign_id": 100000 + i % 1000,
+                            "ad_group_id": str(200000 + i % 5000),
+                            "ad_id": str(300000 + i),
+                            "keyword_id": str(400000 + i),
+                            "keyword_text": "running shoes",
+                            "match_type": "BROAD",
+                            "placement": {"type": "Top of Search on-Amazon", "position": i % 3},
+                            "time_window_start": "2024-05-01T22:00:00.000Z",
+                            "clicks": str(i % 7),
+                            "impressions": 100 + i % 50,
+                            "cost": 0.42 * (i % 7),
+                        }
+                    )
+                    + "\n"
+                ).encode("utf-8")
+            ).decode("ascii"),
+        }
+        for i in range(count)
+    ]
+    return [records[start : start + batch_size] for start in range(0, count, batch_size)]
+
+
+def decode_only(batch, data_set_id):
+    return [
+        {
+            "recordId": record["recordId"],
+            "result": "Ok",
+            "data": base64.b64encode(
+                "".join(
+                    json.dumps(json.loads(line), separators=(",", ":")) + "\n"
+                    for line in base64.b64decode(record["data"]).splitlines()
+                ).encode("utf-8")
+            ).decode("ascii"),
+        }
+        for record in batch
+    ]
+
+
+def time_per_record_us(transform, batches, data_set_id):
+    start = time.perf_counter()
+    for batch in batches:
+        transform(batch, data_set_id)
+    return (time.perf_counter() - start) / sum(len(batch) for batch in batches) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100000, help="Number of synthetic records.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Records per Firehose invocation.")
+    parser.add_argument("--data-set-id", default="sp-traffic", help="Dataset whose normalizer is measured.")
+    parser.add_argument(
+        "--max-ratio", type=float, default=2.0, help="Allowed time of the transformation relative to decoding alone."
+    )
+    args = parser.parse_args()
+
+    batches = synthetic_batches(args.records, args.batch_size)
+    timings = {
+        "decode + encode only": time_per_record_us(decode_only, batches, args.data_set_id),
+        "normalizing transformation": time_per_record_us(
+            firehose_transform_lambda.transform_records, batches, args.data_set_id
+        ),
+    }
+
+    print(f"{'step':<36}{'us/record':>12}{'records/s':>12}")
+    for label, timing in timings.items():
+        print(f"{label:<36}{timing:>12.2f}{1e6 / timing:>12.0f}")
+    overhead = timings["normalizing transformation"] - timings["decode + encode only"]
+    ratio = timings["normalizing transformation"] / timings["decode + encode only"]
+    print(f"{'normalization overhead':<36}{overhead:>12.2f}")
+    print(f"{'ratio to decode + encode only':<36}{ratio:>12.2f}")
+    if ratio > args.max_ratio:
+        print(f"The transformation takes more than {args.max_ratio} times as long as decoding alone")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+
+METRICS_NAMESPACE = "AmzStream/Fanout"
+# SNS reports throttled publishes with codes such as Throttling and Throttled
+THROTTLING_CODE_PREFIX = "Throttl"
+# EMF accepts at most 100 values per metric and line
+MAX_METRIC_VALUES = 100
+
+
+def is_throttling(code):
+    return bool(code) and code.startswith(THROTTLING_CODE_PREFIX)
+
+
+class AimdRateLimiter:
+    """
+    Publish rate limiter of a lambda container. The rate grows by increase_per_s every second while publishes go
+    through, and is multiplied by decrease_factor when SNS throttles, at most once per cooldown_s so one burst of
+    throttled entries counts as a single congestion signal.
+    """
+
+    def __init__(
+        self,
+        max_rate,
+        min_rate=10.0,
+        increase_per_s=None,
+        decrease_factor=0.5,
+        cooldown_s=1.0,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase_per_s = increase_per_s if increase_per_s is not None else max_rate / 20
+        self.decrease_factor = decrease_factor
+        self.cooldown_s = cooldown_s
+        self.clock = clock
+        self.sleep = sleep
+        self.rate = max_rate
+        self._tokens = max_rate
+        self._updated_at = clock()
+        self._decreased_at = None
+        self._lock = threading.Lock()
+
+    def acquire(self, count):
+        """
+        Blocks until count messages may be published at the current rate
+        """
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= min(count, self.rate):
+                    self._tokens -= count
+                    return
+                wait_s = (min(count, self.rate) - self._tokens) / self.rate
+            self.sleep(wait_s)
+
+    def on_result(self, elapsed_s, throttled):
+        with self._lock:
+            now = self.clock()
+            if throttled:
+                if self._decreased_at is None or now - self._decreased_at >= self.cooldown_s:
+                    self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                    self._tokens = min(self._tokens, self.rate)
+                    self._decreased_at = now
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase_per_s * elapsed_s)
+
+
+@lru_cache(maxsize=None)
+def publish_rate_limiter():
+    """
+    Returns the limiter of this container, or None when FANOUT_MAX_PUBLISH_RATE is not set
+    """
+    max_rate = os.environ.get("FANOUT_MAX_PUBLISH_RATE")
+    if not max_rate:
+        return None
+    return AimdRateLimiter(float(max_rate), min_rate=float(os.environ.get("FANOUT_MIN_PUBLISH_RATE", "10")))
+
+
+class PublishMetrics:
+    """
+    Publish outcomes of an invocation, written as one CloudWatch embedded metric format log line
+    """
+
+    def __init__(self):
+        self.published = 0
+        self.throttled = 0
+        self.latencies_ms = []
+        self.rate = None
+
+    def record(self, published, throttled, latency_ms, rate=None):
+        self.published += published
+        self.throttled += throttled
+        if len(self.latencies_ms) < MAX_METRIC_VALUES:
+            self.latencies_ms.append(round(latency_ms, 1))
+        self.rate = rate
+
+    def as_emf(self, data_set_id, timestamp_ms=None):
+        metrics = [
+            {"Name": "PublishedMessages", "Unit": "Count"},
+            {"Name": "ThrottledMessages", "Unit": "Count"},
+            {"Name": "PublishLatencyMs", "Unit": "Milliseconds"},
+        ]
+        document = {
+            "DataSetId": data_set_id,
+            "PublishedMessages": self.published,
+            "ThrottledMessages": self.throttled,
+            "PublishLatencyMs": self.latencies_ms,
+        }
+        if self.rate is not None:
+            metrics.append({"Name": "PublishRateLimit", "Unit": "Count/Second"})
+            document["PublishRateLimit"] = round(self.rate, 1)
+        document["_aws"] = {
+            "Timestamp": timestamp_ms if timestamp_ms is not None else int(time.time() * 1000),
+            "CloudWatchMetrics": [{"Namespace": METRICS_NAMESPACE, "Dimensions": [["DataSetId"]], "Metrics": metrics}],
+        }
+        return json.dumps(document)
+
+    def flush(self, data_set_id):
+        if self.latencies_ms:
+            print(self.as_emf(data_set_id))
@@ -17,3 +17,9 @@ import boto3
 
 sns_client = boto3.client("sns")
 sqs_client = boto3.client("sqs")
+s3_client = boto3.client("s3")
+dynamodb_client = boto3.client("dynamodb")
+kinesis_client = boto3.client("kinesis")
+cloudwatch_client = boto3.client("cloudwatch")
+lambda_client = boto3.client("lambda")
+firehose_client = boto3.client("firehose")
@@ -14,6 +14,16 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
+import itertools
+
+
 def batch_of(data, max_batch_size):
-    for i in range(0, len(data), max_batch_size):
-        yield data[i : i + max_batch_size]
+    """
+    Yields lists of up to max_batch_size items, data can be any iterable and is consumed lazily
+    """
+    iterator = iter(data)
+    while True:
+        next_batch = list(itertools.islice(iterator, max_batch_size))
+        if not next_batch:
+            return
+        yield next_batch
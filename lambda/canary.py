@@ -0,0 +1,48 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Synthetic records injected by latency_canary_lambda and followed to the landing zone. They carry CANARY_FIELD, the
+# fanout lambda publishes them with the CANARY_ATTRIBUTE message attribute so that only the landing zone receives them.
+
+import json
+import time
+import uuid
+
+CANARY_FIELD = "amz_stream_canary"
+METRICS_NAMESPACE = "AmzStream/Canary"
+
+
+def is_canary(record):
+    return type(record) is dict and CANARY_FIELD in record
+
+
+def new_canary(data_set_id, injected_at_ms):
+    return {CANARY_FIELD: uuid.uuid4().hex, "dataset_id": data_set_id, "injectedAt": injected_at_ms}
+
+
+def as_emf(data_set_id, values, timestamp_ms=None):
+    """
+    Writes metric values, keyed by name with a (value, unit) pair, as one CloudWatch embedded metric format line
+    """
+    document = {"DataSetId": data_set_id}
+    metrics = []
+    for name, (value, unit) in values.items():
+        metrics.append({"Name": name, "Unit": unit})
+        document[name] = value
+    document["_aws"] = {
+        "Timestamp": timestamp_ms if timestamp_ms is not None else int(time.time() * 1000),
+        "CloudWatchMetrics": [{"Namespace": METRICS_NAMESPACE, "Dimensions": [["DataSetId"]], "Metrics": metrics}],
+    }
+    return json.dumps(document)
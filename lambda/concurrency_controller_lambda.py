@@ -0,0 +1,125 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+import aws_clients
+from adaptive_rate import METRICS_NAMESPACE
+
+# SQS event sources accept a maximum concurrency between 2 and 1000
+MIN_MAXIMUM_CONCURRENCY = 2
+DECREASE_FACTOR = 0.5
+PUBLISH_OUTCOME_STATS = (("PublishedMessages", "Sum"), ("ThrottledMessages", "Sum"), ("PublishLatencyMs", "p90"))
+
+
+def next_concurrency(
+    current,
+    published,
+    throttled,
+    latency_p90_ms,
+    min_concurrency,
+    max_concurrency,
+    step,
+    max_throttle_ratio,
+    max_latency_ms,
+):
+    """
+    Additive increase while publishes go through, multiplicative decrease when the share of throttled publishes
+    exceeds max_throttle_ratio or the p90 publish latency exceeds max_latency_ms. Without traffic the concurrency is
+    left as is.
+    """
+    attempted = published + throttled
+    if attempted == 0:
+        return current
+    if throttled / attempted > max_throttle_ratio or (latency_p90_ms is not None and latency_p90_ms > max_latency_ms):
+        return max(min_concurrency, int(current * DECREASE_FACTOR))
+    return min(max_concurrency, current + step)
+
+
+def publish_outcomes(data_set_id, window):
+    """
+    Returns the published and throttled message counts of the window, and the p90 publish latency or None
+    """
+    end = datetime.now(timezone.utc)
+    queries = [
+        {
+            "Id": metric_name.lower(),
+            "MetricStat": {
+                "Metric": {
+                    "Namespace": METRICS_NAMESPACE,
+                    "MetricName": metric_name,
+                    "Dimensions": [{"Name": "DataSetId", "Value": data_set_id}],
+                },
+                "Period": int(window.total_seconds()),
+                "Stat": stat,
+            },
+        }
+        for metric_name, stat in PUBLISH_OUTCOME_STATS
+    ]
+    response = aws_clients.cloudwatch_client.get_metric_data(
+        MetricDataQueries=queries, StartTime=end - window, EndTime=end
+    )
+    values = {result["Id"]: result["Values"] for result in response["MetricDataResults"]}
+    latencies_ms = values.get("publishlatencyms", [])
+    return (
+        sum(values.get("publishedmessages", [])),
+        sum(values.get("throttledmessages", [])),
+        max(latencies_ms) if latencies_ms else None,
+    )
+
+
+def handler(event, context):
+    """
+    Adjusts the maximum concurrency of the fanout lambda's ingress event source to the SNS throttling and publish
+    latency of the last window, so bursts scale out until SNS pushes back instead of turning into retry storms.
+    """
+    min_concurrency = max(MIN_MAXIMUM_CONCURRENCY, int(os.environ.get("MIN_CONCURRENCY", "2")))
+    max_concurrency = int(os.environ["MAX_CONCURRENCY"])
+    mapping_id = os.environ["EVENT_SOURCE_MAPPING_ID"]
+
+    published, throttled, latency_p90_ms = publish_outcomes(
+        os.environ["DATA_SET_ID"], timedelta(seconds=int(os.environ.get("WINDOW_S", "300")))
+    )
+    mapping = aws_clients.lambda_client.get_event_source_mapping(UUID=mapping_id)
+    current = mapping.get("ScalingConfig", {}).get("MaximumConcurrency", max_concurrency)
+    concurrency = next_concurrency(
+        current,
+        published,
+        throttled,
+        latency_p90_ms,
+        min_concurrency,
+        max_concurrency,
+        int(os.environ.get("CONCURRENCY_STEP", "2")),
+        float(os.environ.get("MAX_THROTTLE_RATIO", "0.01")),
+        float(os.environ.get("MAX_PUBLISH_LATENCY_MS", "500")),
+    )
+    if concurrency != current:
+        aws_clients.lambda_client.update_event_source_mapping(
+            UUID=mapping_id, ScalingConfig={"MaximumConcurrency": concurrency}
+        )
+    print(
+        json.dumps(
+            {
+                "event": "fanout_concurrency",
+                "published": published,
+                "throttled": throttled,
+                "latencyP90Ms": latency_p90_ms,
+                "previous": current,
+                "concurrency": concurrency,
+            }
+        )
+    )
+    return {"concurrency": concurrency}
@@ -0,0 +1,34 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+from datetime import datetime, timezone
+import aws_clients
+
+
+def handler(event, context):
+    """
+    Exports the latest state table as a point in time snapshot. The export is a compacted copy of the state, one item
+    per entity, written by DynamoDB without consuming table capacity.
+    """
+    now = datetime.now(timezone.utc)
+    response = aws_clients.dynamodb_client.export_table_to_point_in_time(
+        TableArn=os.environ["ENTITY_STATE_TABLE_ARN"],
+        S3Bucket=os.environ["SNAPSHOT_BUCKET_NAME"],
+        S3Prefix=f"{os.environ['SNAPSHOT_PREFIX']}snapshot={now:%Y-%m-%dT%H%M%SZ}",
+        ExportFormat="DYNAMODB_JSON",
+    )
+    print(f"Started export {response['ExportDescription']['ExportArn']}")
+    return {"exportArn": response["ExportDescription"]["ExportArn"]}
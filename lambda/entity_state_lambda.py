@@ -0,0 +1,98 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+from datetime import datetime
+import aws_clients
+import sqs_consuming_lambda as sqs_lambda
+
+ENTITY_ID_ATTRIBUTE = "entityId"
+VERSION_ATTRIBUTE = "version"
+# audit.lastUpdatedDateTime once flattened by record_normalization
+FLATTENED_UPDATED_AT_FIELD = "audit_lastUpdatedDateTime"
+
+
+def record_version(record):
+    """
+    Orders updates of an entity: the record version when present, else the last update time in epoch milliseconds.
+    Records replayed from a normalized landing zone carry the update time flattened as audit_lastUpdatedDateTime.
+    """
+    if record.get("version") is not None:
+        return int(record["version"])
+    updated_at = (record.get("audit") or {}).get("lastUpdatedDateTime") or record.get(FLATTENED_UPDATED_AT_FIELD)
+    if updated_at is None:
+        raise ValueError("Record has neither a version nor an audit.lastUpdatedDateTime")
+    return int(datetime.fromisoformat(updated_at.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+def upsert_latest(record, table_name, entity_id_field):
+    """
+    Stores the record as the latest state of its entity unless a newer or the same version is already stored,
+    returns whether the record was stored. The version check is part of the write, so concurrent and out of order
+    updates always converge on the newest version.
+    """
+    version = record_version(record)
+    try:
+        aws_clients.dynamodb_client.put_item(
+            TableName=table_name,
+            Item={
+                ENTITY_ID_ATTRIBUTE: {"S": str(record[entity_id_field])},
+                VERSION_ATTRIBUTE: {"N": str(version)},
+                "record": {"S": json.dumps(record)},
+            },
+            ConditionExpression="attribute_not_exists(#version) OR #version < :version",
+            ExpressionAttributeNames={"#version": VERSION_ATTRIBUTE},
+            ExpressionAttributeValues={":version": {"N": str(version)}},
+        )
+    except aws_clients.dynamodb_client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
+
+
+def is_from_fifo_queue(message):
+    return message.get("eventSourceARN", "").endswith(".fifo")
+
+
+def on_materialize(messages_batch, batch_failures, error_handler):
+    """
+    Stores the records of a batch. Messages of a FIFO queue, used in ordered mode, are processed in order: after the
+    first failure the remaining messages are reported as failed too, as Lambda requires for FIFO event sources.
+    """
+    table_name = os.environ["ENTITY_STATE_TABLE_NAME"]
+    entity_id_field = os.environ["ENTITY_ID_FIELD"]
+    for message in messages_batch:
+        if len(batch_failures) and is_from_fifo_queue(message):
+            batch_failures.append(message)
+            continue
+        try:
+            upsert_latest(sqs_lambda.get_message_body(message), table_name, entity_id_field)
+        except Exception as error:
+            batch_failures.append(message)
+            error_handler(error, message.get("messageId"))
+
+
+def on_entire_batch(all_messages, batch_failures):
+    sqs_lambda.process_messages_in_batches(
+        all_messages,
+        lambda x: True,
+        on_materialize,
+        batch_failures,
+        max_batch_size=10,
+    )
+
+
+def handler(event, context):
+    return sqs_lambda.batch_handler(event, on_entire_batch)
@@ -0,0 +1,67 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import base64
+import json
+import os
+import canary
+from record_normalization import normalizer_for
+
+DATA_SET_ID = os.environ.get("DATA_SET_ID")
+
+
+def _encode(record):
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def transform_record(record, normalize):
+    """
+    Normalizes the newline delimited JSON records of one Firehose record. A Firehose record with any record which can
+    not be parsed or does not match the dataset schema is returned unchanged as ProcessingFailed, so Firehose writes
+    it under the processing-failed error prefix.
+    """
+    lines = []
+    for line in base64.b64decode(record["data"]).splitlines():
+        if not line.strip():
+            continue
+        try:
+            decoded = json.loads(line)
+        except ValueError:
+            return {"recordId": record["recordId"], "result": "ProcessingFailed", "data": record["data"]}
+        if canary.is_canary(decoded):
+            # the canary lambda looks up its own records in the landing zone, they are kept as they were sent
+            lines.append(_encode(decoded))
+            continue
+        normalized, problem = normalize(decoded)
+        if problem:
+            return {"recordId": record["recordId"], "result": "ProcessingFailed", "data": record["data"]}
+        lines.append(_encode(normalized))
+    if not lines:
+        return {"recordId": record["recordId"], "result": "Dropped", "data": record["data"]}
+    data = base64.b64encode("".join(lines).encode("utf-8")).decode("ascii")
+    return {"recordId": record["recordId"], "result": "Ok", "data": data}
+
+
+def transform_records(records, data_set_id):
+    normalize = normalizer_for(data_set_id)
+    return [transform_record(record, normalize) for record in records]
+
+
+def handler(event, context):
+    transformed = transform_records(event["records"], DATA_SET_ID)
+    failed = sum(1 for record in transformed if record["result"] == "ProcessingFailed")
+    if failed:
+        print(f"{failed} of {len(transformed)} records of dataset {DATA_SET_ID} failed processing")
+    return {"records": transformed}
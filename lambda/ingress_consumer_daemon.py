@@ -0,0 +1,231 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Long-running consumer of the ingress queue, an alternative to the fanout lambda for high volume datasets.
+
+Runs as a plain process or in a container (see container/Dockerfile), configured by environment variables:
+    INGRESS_QUEUE_URL, DATA_SET_ID, DATA_FANOUT_TOPIC_ARN, SUBSCRIPTION_CONFIRMATION_QUEUE_URL, QUARANTINE_QUEUE_URL
+    RECEIVERS (default 10), WAIT_TIME_S (default 20), VISIBILITY_TIMEOUT_S (default 60)
+
+Messages are routed by the fanout lambda code. SIGTERM and SIGINT stop receiving, batches in progress are finished.
+"""
+
+import itertools
+import logging
+import os
+import signal
+import threading
+import time
+import aws_clients
+import sqs_consuming_lambda as sqs_lambda
+import stream_fanout_lambda
+
+# SQS ReceiveMessage, DeleteMessageBatch and ChangeMessageVisibilityBatch accept at most 10 messages
+MAX_SQS_BATCH_SIZE = 10
+
+log = logging.getLogger("ingress_consumer")
+
+
+def to_lambda_message(message):
+    """
+    Converts a ReceiveMessage result to the shape of an SQS event record of a lambda
+    """
+    return {"messageId": message["MessageId"], "receiptHandle": message["ReceiptHandle"], "body": message["Body"]}
+
+
+class VisibilityExtender:
+    """
+    Extends the visibility timeout of received messages still being processed when it is about to expire
+    """
+
+    def __init__(self, sqs, queue_url, visibility_timeout_s, margin_s, clock=time.monotonic):
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.visibility_timeout_s = visibility_timeout_s
+        self.margin_s = margin_s
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._tokens = itertools.count()
+        self._in_flight = {}
+
+    def track(self, receipt_handles):
+        with self._lock:
+            token = next(self._tokens)
+            self._in_flight[token] = [receipt_handles, self.clock() + self.visibility_timeout_s]
+        return token
+
+    def release(self, token):
+        with self._lock:
+            self._in_flight.pop(token, None)
+
+    def extend_due(self):
+        now = self.clock()
+        with self._lock:
+            due = []
+            for batch in self._in_flight.values():
+                if batch[1] - now <= self.margin_s:
+                    due.extend(batch[0])
+                    batch[1] = now + self.visibility_timeout_s
+
+        for i in range(0, len(due), MAX_SQS_BATCH_SIZE):
+            entries = [
+                {"Id": str(n), "ReceiptHandle": receipt_handle, "VisibilityTimeout": self.visibility_timeout_s}
+                for n, receipt_handle in enumerate(due[i : i + MAX_SQS_BATCH_SIZE])
+            ]
+            try:
+                failed = self.sqs.change_message_visibility_batch(QueueUrl=self.queue_url, Entries=entries).get(
+                    "Failed", []
+                )
+            except Exception:
+                log.exception("Could not extend the visibility of %d messages", len(entries))
+                continue
+            if failed:
+                # messages deleted while being extended are reported here and need no action
+                log.debug("Visibility not extended for %d messages: %s", len(failed), failed)
+        return len(due)
+
+    def run(self, stop_event, interval_s=1.0):
+        while not stop_event.wait(interval_s):
+            self.extend_due()
+
+
+class IngressConsumer:
+    """
+    Long-polls a queue with concurrent receivers and processes every received batch with entire_batch_callback, the
+    same callback the lambda passes to sqs_consuming_lambda.batch_handler. Processed messages are batch-deleted,
+    failed messages are left to become visible again and reach the dead-letter queue after maxReceiveCount.
+    """
+
+    def __init__(
+        self,
+        sqs,
+        queue_url,
+        entire_batch_callback,
+        receivers=10,
+        wait_time_s=20,
+        visibility_timeout_s=60,
+        extension_margin_s=15,
+    ):
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.entire_batch_callback = entire_batch_callback
+        self.receivers = receivers
+        self.wait_time_s = wait_time_s
+        self.visibility_timeout_s = visibility_timeout_s
+        self.extender = VisibilityExtender(sqs, queue_url, visibility_timeout_s, extension_margin_s)
+        self.stats = {"received": 0, "deleted": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, **counts):
+        with self._stats_lock:
+            for name, count in counts.items():
+                self.stats[name] += count
+
+    def process(self, messages):
+        records = [to_lambda_message(message) for message in messages]
+        receipt_handles = {record["messageId"]: record["receiptHandle"] for record in records}
+        token = self.extender.track(list(receipt_handles.values()))
+        try:
+            result = sqs_lambda.batch_handler({"Records": records}, self.entire_batch_callback)
+        except Exception:
+            log.exception("Batch of %d messages failed, leaving it for redelivery", len(messages))
+            self._count(received=len(messages), failed=len(messages))
+            return
+        finally:
+            self.extender.release(token)
+
+        failed_ids = {failure["itemIdentifier"] for failure in result["batchItemFailures"]}
+        entries = [
+            {"Id": str(i), "ReceiptHandle": receipt_handle}
+            for i, (message_id, receipt_handle) in enumerate(receipt_handles.items())
+            if message_id not in failed_ids
+        ]
+        not_deleted = []
+        if entries:
+            try:
+                not_deleted = self.sqs.delete_message_batch(QueueUrl=self.queue_url, Entries=entries).get("Failed", [])
+            except Exception:
+                log.exception("Could not delete %d processed messages", len(entries))
+                not_deleted = entries
+            if not_deleted:
+                log.warning("%d processed messages were not deleted and will be redelivered", len(not_deleted))
+        self._count(received=len(messages), deleted=len(entries) - len(not_deleted), failed=len(failed_ids))
+
+    def receive_loop(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                response = self.sqs.receive_message(
+                    QueueUrl=self.queue_url,
+                    MaxNumberOfMessages=MAX_SQS_BATCH_SIZE,
+                    WaitTimeSeconds=self.wait_time_s,
+                    VisibilityTimeout=self.visibility_timeout_s,
+                )
+            except Exception:
+                log.exception("Receive failed, retrying")
+                stop_event.wait(1)
+                continue
+            messages = response.get("Messages", [])
+            if messages:
+                self.process(messages)
+
+    def run(self, stop_event):
+        """
+        Runs until stop_event is set, then waits for the batches in progress. Visibility keeps being extended until
+        the last batch is done.
+        """
+        extender_stop = threading.Event()
+        extender = threading.Thread(target=self.extender.run, args=(extender_stop,), name="visibility-extender")
+        receivers = [
+            threading.Thread(target=self.receive_loop, args=(stop_event,), name=f"receiver-{i}")
+            for i in range(self.receivers)
+        ]
+        extender.start()
+        for receiver in receivers:
+            receiver.start()
+        for receiver in receivers:
+            receiver.join()
+        extender_stop.set()
+        extender.join()
+        log.info("Stopped: %s", self.stats)
+        return self.stats
+
+
+def main():
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(threadName)s %(message)s"
+    )
+    consumer = IngressConsumer(
+        aws_clients.sqs_client,
+        os.environ["INGRESS_QUEUE_URL"],
+        stream_fanout_lambda.on_entire_batch,
+        receivers=int(os.environ.get("RECEIVERS", "10")),
+        wait_time_s=int(os.environ.get("WAIT_TIME_S", "20")),
+        visibility_timeout_s=int(os.environ.get("VISIBILITY_TIMEOUT_S", "60")),
+    )
+    stop_event = threading.Event()
+
+    def on_signal(signum, frame):
+        log.info("Received signal %d, finishing batches in progress", signum)
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    log.info("Consuming %s with %d receivers", consumer.queue_url, consumer.receivers)
+    consumer.run(stop_event)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+import time
+import aws_clients
+import sqs_consuming_lambda as sqs_lambda
+import stream_fanout_lambda
+
+# PutRecords accepts at most 500 records and 5 MiB per request, and 1 MiB per record
+MAX_PUT_RECORDS = 500
+MAX_PUT_RECORDS_BYTES = 5 * 1024 * 1024
+# records of an advertiser are packed into NDJSON blobs of up to one PUT payload unit
+AGGREGATE_TARGET_BYTES = 25 * 1024
+MAX_PUT_ATTEMPTS = 3
+PARTITION_KEY_FIELDS = ("advertiser_id", "advertiserId")
+
+
+def partition_key(record, fallback):
+    """
+    Returns the advertiser id of a record, so all records of an advertiser land on the same shard in order
+    """
+    if type(record) is dict:
+        for field in PARTITION_KEY_FIELDS:
+            if record.get(field):
+                return str(record[field])
+    return fallback
+
+
+def aggregate(messages_batch, target_bytes=AGGREGATE_TARGET_BYTES):
+    """
+    Packs the records of a batch into NDJSON blobs per partition key, keeping their order within a key.
+    Returns a list of (partition key, data, messages) tuples.
+    """
+    aggregates = []
+    open_aggregates = {}
+    for message in messages_batch:
+        body = message["body"]
+        record = json.loads(body)
+        line = (json.dumps(record) if "\n" in body else body).encode("utf-8") + b"\n"
+        key = partition_key(record, message.get("messageId"))
+        current = open_aggregates.get(key)
+        if current is not None and len(current[1]) + len(line) > target_bytes:
+            current = None
+        if current is None:
+            current = open_aggregates[key] = [key, bytearray(), []]
+            aggregates.append(current)
+        current[1] += line
+        current[2].append(message)
+    return [(key, bytes(data), messages) for key, data, messages in aggregates]
+
+
+def _put_requests(aggregates):
+    request, request_bytes = [], 0
+    for entry in aggregates:
+        entry_bytes = len(entry[0]) + len(entry[1])
+        if request and (len(request) == MAX_PUT_RECORDS or request_bytes + entry_bytes > MAX_PUT_RECORDS_BYTES):
+            yield request
+            request, request_bytes = [], 0
+        request.append(entry)
+        request_bytes += entry_bytes
+    if request:
+        yield request
+
+
+def _retried_entries(request, results):
+    """
+    Returns the failed entries of a request together with the later entries of their partition keys, already written
+    or not, so that retried records are again followed by the records which came after them
+    """
+    failed_keys = set()
+    retried = []
+    for entry, result in zip(request, results):
+        if "ErrorCode" in result:
+            failed_keys.add(entry[0])
+        if entry[0] in failed_keys:
+            retried.append(entry)
+    return retried
+
+
+def put_aggregates(kinesis_client, stream_name, aggregates, sleep=time.sleep):
+    """
+    Writes aggregates with PutRecords, retrying the entries rejected by throttling or internal errors.
+    Returns the messages of the aggregates which could not be written. Once an aggregate could not be written, the
+    later aggregates of its partition key are not written either, so they cannot overtake it.
+    """
+    failed_messages = []
+    failed_keys = set()
+    for request in _put_requests(aggregates):
+        skipped = [entry for entry in request if entry[0] in failed_keys]
+        request = [entry for entry in request if entry[0] not in failed_keys]
+        for attempt in range(MAX_PUT_ATTEMPTS):
+            if not request:
+                break
+            if attempt:
+                sleep(0.1 * 2**attempt)
+            response = kinesis_client.put_records(
+                StreamName=stream_name,
+                Records=[{"PartitionKey": key, "Data": data} for key, data, _ in request],
+            )
+            if not response.get("FailedRecordCount"):
+                request = []
+                break
+            request = _retried_entries(request, response["Records"])
+        for key, _, messages in skipped + request:
+            failed_keys.add(key)
+            failed_messages.extend(messages)
+    return failed_messages
+
+
+def on_route_to_kinesis(messages_batch, batch_failures, error_handler, stream_name):
+    failed_messages = put_aggregates(aws_clients.kinesis_client, stream_name, aggregate(messages_batch))
+    if failed_messages:
+        error_handler(
+            f"Partial batch failure from Kinesis, {len(failed_messages)} failed out of {len(messages_batch)}",
+            [message.get("messageId") for message in failed_messages],
+        )
+
+    batch_failures.extend(failed_messages)
+
+
+def on_entire_batch(all_messages, batch_failures):
+    validate = stream_fanout_lambda.dataset_validator(os.environ.get("DATA_SET_ID", ""))
+    route_callbacks = {
+        stream_fanout_lambda.DATA_ROUTE: lambda x, y, z: on_route_to_kinesis(
+            x, y, z, os.environ["KINESIS_STREAM_NAME"]
+        ),
+        stream_fanout_lambda.CONFIRMATION_ROUTE: lambda x, y, z: stream_fanout_lambda.on_route_to_sqs(
+            x, y, z, os.environ["SUBSCRIPTION_CONFIRMATION_QUEUE_URL"]
+        ),
+        stream_fanout_lambda.QUARANTINE_ROUTE: lambda x, y, z: stream_fanout_lambda.on_route_to_quarantine(
+            x, y, z, os.environ["QUARANTINE_QUEUE_URL"], validate
+        ),
+        # the Kinesis stack has no landing zone to follow latency canaries to, they are dropped
+        stream_fanout_lambda.CANARY_ROUTE: lambda x, y, z: None,
+    }
+
+    sqs_lambda.process_routed_messages(
+        all_messages,
+        lambda x: stream_fanout_lambda.route_message(x, validate),
+        route_callbacks,
+        batch_failures,
+        max_batch_size={
+            stream_fanout_lambda.DATA_ROUTE: MAX_PUT_RECORDS,
+            stream_fanout_lambda.CONFIRMATION_ROUTE: 10,
+            stream_fanout_lambda.QUARANTINE_ROUTE: 10,
+            stream_fanout_lambda.CANARY_ROUTE: 10,
+        },
+    )
+
+
+def handler(event, context):
+    return sqs_lambda.batch_handler(event, on_entire_batch)
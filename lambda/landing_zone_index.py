@@ -0,0 +1,90 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Schema of the landing zone index table, shared by landing_zone_index_lambda and the amz_stream_cli index reader.
+# Items are keyed by the hourly partition prefix and the object key, so the objects of a partition are a single Query.
+
+import gzip
+import json
+
+PARTITION_ATTRIBUTE = "partition"
+KEY_ATTRIBUTE = "key"
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+def partition_of(key):
+    """
+    Returns the hourly partition prefix of a data object key, or None for keys which are not indexed:
+    Firehose error output, and metadata objects such as compaction manifests whose names start with an underscore.
+    """
+    prefix, _, name = key.rpartition("/")
+    if not prefix or name.startswith("_") or key.startswith("errors/") or "/hour=" not in prefix:
+        return None
+    return prefix + "/"
+
+
+def iter_lines(readable):
+    """Streams the lines of a file object, holding one chunk in memory at a time."""
+    remainder = b""
+    while True:
+        chunk = readable.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        yield from lines
+    yield remainder
+
+
+def object_stats(body, gzipped, event_time_field):
+    """Counts the records of a newline delimited object and finds their min and max event time in one pass."""
+    readable = gzip.GzipFile(fileobj=body) if gzipped else body
+    records = 0
+    min_event_time = max_event_time = None
+    for line in iter_lines(readable):
+        if not line.strip():
+            continue
+        records += 1
+        try:
+            event_time = json.loads(line).get(event_time_field)
+        except (ValueError, AttributeError):
+            continue
+        if isinstance(event_time, str):
+            min_event_time = event_time if min_event_time is None else min(min_event_time, event_time)
+            max_event_time = event_time if max_event_time is None else max(max_event_time, event_time)
+    return {"records": records, "minEventTime": min_event_time, "maxEventTime": max_event_time}
+
+
+def to_item(key, size, stats):
+    item = {
+        PARTITION_ATTRIBUTE: {"S": partition_of(key)},
+        KEY_ATTRIBUTE: {"S": key},
+        "size": {"N": str(size)},
+        "records": {"N": str(stats["records"])},
+    }
+    for name in ("minEventTime", "maxEventTime"):
+        if stats[name] is not None:
+            item[name] = {"S": stats[name]}
+    return item
+
+
+def from_item(item):
+    return {
+        "key": item[KEY_ATTRIBUTE]["S"],
+        "size": int(item["size"]["N"]),
+        "records": int(item["records"]["N"]),
+        "minEventTime": item.get("minEventTime", {}).get("S"),
+        "maxEventTime": item.get("maxEventTime", {}).get("S"),
+    }
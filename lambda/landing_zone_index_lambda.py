@@ -0,0 +1,57 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import logging as log
+import os
+import urllib.parse
+import aws_clients
+import landing_zone_index as index
+
+
+def on_object_created(bucket, key, table_name, event_time_field):
+    response = aws_clients.s3_client.get_object(Bucket=bucket, Key=key)
+    try:
+        stats = index.object_stats(response["Body"], key.endswith(".gz"), event_time_field)
+    finally:
+        response["Body"].close()
+    aws_clients.dynamodb_client.put_item(
+        TableName=table_name, Item=index.to_item(key, response["ContentLength"], stats)
+    )
+
+
+def on_object_removed(key, table_name):
+    aws_clients.dynamodb_client.delete_item(
+        TableName=table_name,
+        Key={index.PARTITION_ATTRIBUTE: {"S": index.partition_of(key)}, index.KEY_ATTRIBUTE: {"S": key}},
+    )
+
+
+def handler(event, context):
+    table_name = os.environ["INDEX_TABLE_NAME"]
+    event_time_field = os.environ.get("EVENT_TIME_FIELD", "time_window_start")
+
+    for record in event.get("Records", []):
+        bucket = record["s3"]["bucket"]["name"]
+        key = urllib.parse.unquote_plus(record["s3"]["object"]["key"])
+        if index.partition_of(key) is None:
+            continue
+
+        # failures are raised so that the asynchronous invocation is retried and the index does not miss objects
+        if record["eventName"].startswith("ObjectCreated"):
+            on_object_created(bucket, key, table_name, event_time_field)
+        elif record["eventName"].startswith("ObjectRemoved"):
+            on_object_removed(key, table_name)
+        else:
+            log.warning("Ignoring event %s for %s", record["eventName"], key)
@@ -0,0 +1,155 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+import time
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+import aws_clients
+import canary
+import landing_zone_index
+
+# Matches the data_output_prefix of the StreamLanding Firehose, which partitions by UTC arrival hour
+PARTITION_FORMAT = "year=%Y/month=%m/day=%d/hour=%H/"
+# S3 last modified times have a resolution of one second
+LAST_MODIFIED_RESOLUTION_MS = 1000
+CANARY_FIELD_BYTES = canary.CANARY_FIELD.encode("utf-8")
+
+
+def state_key(data_set_id):
+    return f"canary/{data_set_id}/pending.json"
+
+
+def load_state(bucket, data_set_id):
+    try:
+        body = aws_clients.s3_client.get_object(Bucket=bucket, Key=state_key(data_set_id))["Body"]
+    except aws_clients.s3_client.exceptions.NoSuchKey:
+        return {"checkedAt": None, "pending": []}
+    return json.loads(body.read())
+
+
+def save_state(bucket, data_set_id, state):
+    aws_clients.s3_client.put_object(Bucket=bucket, Key=state_key(data_set_id), Body=json.dumps(state).encode("utf-8"))
+
+
+def partition_prefixes(data_set_id, start_ms, end_ms):
+    hour = datetime.fromtimestamp(start_ms / 1000, timezone.utc).replace(minute=0, second=0, microsecond=0)
+    end = datetime.fromtimestamp(end_ms / 1000, timezone.utc)
+    prefixes = []
+    while hour <= end:
+        prefixes.append(f"{data_set_id}/{hour.strftime(PARTITION_FORMAT)}")
+        hour += timedelta(hours=1)
+    return prefixes
+
+
+def _is_delivered_object(key):
+    # compacted objects and manifests only ever hold records which were already delivered
+    name = key.rsplit("/", 1)[-1]
+    return not (name.startswith("_") or name.startswith("compacted-"))
+
+
+def _canary_records(bucket, key):
+    """Streams an object line by line, yields the parsed canary records it holds"""
+    body = aws_clients.s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+    try:
+        for line in landing_zone_index.iter_lines(body):
+            if CANARY_FIELD_BYTES in line:
+                yield json.loads(line)
+    finally:
+        body.close()
+
+
+def find_landed(bucket, data_set_id, pending, since_ms, now_ms):
+    """
+    Searches the objects delivered since since_ms for the pending canaries, returns (record, landed_at_ms) pairs.
+    The search stops as soon as every pending canary is found.
+    """
+    ids = {entry["id"] for entry in pending}
+    landed = []
+    paginator = aws_clients.s3_client.get_paginator("list_objects_v2")
+    for prefix in partition_prefixes(data_set_id, since_ms, now_ms):
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for summary in page.get("Contents", []):
+                landed_at_ms = int(summary["LastModified"].timestamp() * 1000)
+                if landed_at_ms < since_ms or not _is_delivered_object(summary["Key"]):
+                    continue
+                with closing(_canary_records(bucket, summary["Key"])) as records:
+                    for record in records:
+                        if record.get(canary.CANARY_FIELD) in ids:
+                            ids.discard(record[canary.CANARY_FIELD])
+                            landed.append((record, landed_at_ms))
+                            if not ids:
+                                return landed
+    return landed
+
+
+def latency_metrics(landed, lost):
+    total_ms = [landed_at_ms - record["injectedAt"] for record, landed_at_ms in landed]
+    delivery_ms = [landed_at_ms - record["fanoutAt"] for record, landed_at_ms in landed if "fanoutAt" in record]
+    metrics = {"LostCanaries": (lost, "Count")}
+    if total_ms:
+        metrics["TotalLatencyMs"] = (total_ms, "Milliseconds")
+    if delivery_ms:
+        metrics["DeliveryLatencyMs"] = (delivery_ms, "Milliseconds")
+    return metrics
+
+
+def inject(record):
+    """
+    Sends a canary where the dataset records enter the stack, the ingress queue or, without one, the Firehose
+    """
+    body = json.dumps(record)
+    if os.environ.get("INGRESS_QUEUE_URL"):
+        aws_clients.sqs_client.send_message(QueueUrl=os.environ["INGRESS_QUEUE_URL"], MessageBody=body)
+    else:
+        aws_clients.firehose_client.put_record(
+            DeliveryStreamName=os.environ["DELIVERY_STREAM_NAME"], Record={"Data": (body + "\n").encode("utf-8")}
+        )
+
+
+def handler(event, context):
+    """
+    Measures the canaries which reached the landing zone since the previous invocation, counts those which did not
+    arrive within the timeout as lost, and injects a new one
+    """
+    data_set_id = os.environ["DATA_SET_ID"]
+    bucket = os.environ["LANDING_BUCKET_NAME"]
+    timeout_ms = int(os.environ.get("CANARY_TIMEOUT_SECONDS", "1800")) * 1000
+    now_ms = int(time.time() * 1000)
+
+    state = load_state(bucket, data_set_id)
+    pending = state["pending"]
+    if pending:
+        # no pending canary can be in an object delivered before it was injected or searched by the previous run
+        since_ms = min(entry["injectedAt"] for entry in pending)
+        if state["checkedAt"] is not None:
+            since_ms = max(since_ms, state["checkedAt"])
+        since_ms -= LAST_MODIFIED_RESOLUTION_MS
+        landed = find_landed(bucket, data_set_id, pending, since_ms, now_ms)
+    else:
+        landed = []
+
+    landed_ids = {record[canary.CANARY_FIELD] for record, _ in landed}
+    waiting = [entry for entry in pending if entry["id"] not in landed_ids]
+    still_pending = [entry for entry in waiting if now_ms - entry["injectedAt"] < timeout_ms]
+    lost = len(waiting) - len(still_pending)
+    print(canary.as_emf(data_set_id, latency_metrics(landed, lost), now_ms))
+
+    record = canary.new_canary(data_set_id, now_ms)
+    inject(record)
+    still_pending.append({"id": record[canary.CANARY_FIELD], "injectedAt": now_ms})
+    save_state(bucket, data_set_id, {"checkedAt": now_ms, "pending": still_pending})
+    return {"landed": len(landed), "lost": lost, "pending": len(still_pending)}
@@ -0,0 +1,79 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import hashlib
+import json
+import os
+import aws_clients
+import sns_publisher
+import sqs_consuming_lambda as sqs_lambda
+import tracing
+
+
+def ordering_key(body, ordering_key_fields, fallback):
+    """
+    Returns the message group id of a record, the value of the first of its ordering key fields which is set
+    """
+    record = json.loads(body)
+    for field in ordering_key_fields:
+        if type(record) is dict and record.get(field):
+            return str(record[field])[:128]
+    return fallback
+
+
+def deduplication_id(body):
+    # redelivered messages have the same body, so FIFO topics drop their second publish
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def on_forward(messages_batch, batch_failures, error_handler):
+    """
+    Publishes records received from the data fanout topic to the FIFO fanout topic, grouped by their ordering key
+    """
+    ordering_key_fields = os.environ["ORDERING_KEY_FIELDS"].split(",")
+    # raw delivery keeps the newline the fanout lambda terminated records with, publish_batch adds it again
+    bodies = [message["body"].rstrip("\n") for message in messages_batch]
+    failures = sns_publisher.publish_batch(
+        aws_clients.sns_client,
+        os.environ["ORDERED_FANOUT_TOPIC_ARN"],
+        bodies,
+        message_attributes=tracing.get_tracer().message_attributes(),
+        message_group_ids=[
+            ordering_key(body, ordering_key_fields, message.get("messageId"))
+            for body, message in zip(bodies, messages_batch)
+        ],
+        deduplication_ids=[deduplication_id(body) for body in bodies],
+    )
+    if failures:
+        error_handler(
+            f"Partial batch failure from SNS, {len(failures)} failed out of {len(messages_batch)}",
+            json.dumps(failures),
+        )
+
+    batch_failures.extend([messages_batch[int(failure["Id"])] for failure in failures])
+
+
+def on_entire_batch(all_messages, batch_failures):
+    sqs_lambda.process_messages_in_batches(
+        all_messages,
+        lambda x: True,
+        on_forward,
+        batch_failures,
+        max_batch_size=sns_publisher.MAX_BATCH_SIZE,
+    )
+
+
+def handler(event, context):
+    return sqs_lambda.batch_handler(event, on_entire_batch)
@@ -0,0 +1,103 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import math
+from record_validation import DATASET_SCHEMAS, NUMBER, STRING, compile_validator
+
+# Joins the keys of nested objects into the name of the flattened field
+FIELD_SEPARATOR = "_"
+
+
+def _flatten(record, prefix, flat):
+    for key, value in record.items():
+        if type(value) is dict:
+            _flatten(value, f"{prefix}{key}{FIELD_SEPARATOR}", flat)
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def flatten(record):
+    """
+    Returns a record without nested objects, {"budget": {"amount": 1}} becomes {"budget_amount": 1}. Lists are kept.
+    """
+    for value in record.values():
+        if type(value) is dict:
+            return _flatten(record, "", {})
+    return record
+
+
+def to_number(value):
+    """
+    Returns a numeric string as an int or a finite float, any other value unchanged
+    """
+    if type(value) is not str:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return number if math.isfinite(number) else value
+
+
+def to_string(value):
+    """
+    Returns a number as a string, any other value unchanged
+    """
+    if type(value) in (int, float):
+        return str(value)
+    return value
+
+
+def compile_normalizer(required=(), optional=()):
+    """
+    Returns a function that flattens a decoded record, casts the schema fields to their type and validates the result.
+    It returns (record, None) for a valid record and (None, problem) otherwise.
+    """
+    casts = tuple(
+        (name, to_number if types == NUMBER else to_string)
+        for name, types in list(required) + list(optional)
+        if types in (NUMBER, STRING)
+    )
+    validate = compile_validator(required, optional)
+
+    def normalize(record):
+        if type(record) is not dict:
+            return None, "record is not a JSON object"
+        record = flatten(record)
+        for name, cast in casts:
+            value = record.get(name)
+            if value is not None:
+                record[name] = cast(value)
+        problem = validate(record)
+        if problem:
+            return None, problem
+        return record, None
+
+    return normalize
+
+
+NORMALIZERS = {data_set_id: compile_normalizer(**schema) for data_set_id, schema in DATASET_SCHEMAS.items()}
+
+
+def normalizer_for(data_set_id):
+    """
+    Returns the normalizer of a dataset, records of datasets without a schema are only flattened
+    """
+    return NORMALIZERS.get(data_set_id) or compile_normalizer()
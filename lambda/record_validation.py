@@ -0,0 +1,94 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+NUMBER = (int, float)
+STRING = (str,)
+TYPE_NAMES = {NUMBER: "number", STRING: "string"}
+
+# Identifiers present on every record of the hourly traffic and conversion datasets
+_METRICS_IDS = [
+    ("idempotency_id", STRING),
+    ("dataset_id", STRING),
+    ("marketplace_id", STRING),
+    ("advertiser_id", STRING),
+    ("campaign_id", STRING),
+    ("time_window_start", STRING),
+]
+_TRAFFIC = {"required": _METRICS_IDS + [("impressions", NUMBER), ("clicks", NUMBER), ("cost", NUMBER)]}
+_CONVERSION = {
+    "required": _METRICS_IDS,
+    "optional": [
+        (f"attributed_{metric}_{window}d", NUMBER)
+        for metric in ("conversions", "sales", "units_ordered")
+        for window in (1, 7, 14, 30)
+    ],
+}
+_ENTITY_IDS = [("advertiserId", STRING), ("marketplaceId", STRING)]
+
+# Fields every record of a dataset must have, and fields that must have the given type when present.
+# Datasets without a published field list are only checked to be JSON objects.
+DATASET_SCHEMAS = {
+    "sp-traffic": _TRAFFIC,
+    "sp-conversion": _CONVERSION,
+    "sd-traffic": _TRAFFIC,
+    "sd-conversion": _CONVERSION,
+    "sb-traffic": _TRAFFIC,
+    "sb-conversion": _CONVERSION,
+    "sb-clickstream": {},
+    "sb-rich-media": {},
+    "budget-usage": {"required": [("advertiserId", STRING), ("marketplaceId", STRING), ("budgetScopeId", STRING)]},
+    "campaigns": {"required": _ENTITY_IDS + [("campaignId", STRING)]},
+    "adgroups": {"required": _ENTITY_IDS + [("campaignId", STRING), ("adGroupId", STRING)]},
+    "ads": {"required": _ENTITY_IDS + [("adGroupId", STRING), ("adId", STRING)]},
+    "targets": {"required": _ENTITY_IDS + [("adGroupId", STRING), ("targetId", STRING)]},
+    "sponsored-ads-campaign-diagnostics-recommendations": {},
+    "sp-budget-recommendations": {},
+}
+
+
+def compile_validator(required=(), optional=()):
+    """
+    Returns a function that checks a decoded record against a schema and returns the first problem found, or None
+    for a valid record. Field lists are bound once, so checking a record is a few dict lookups and type checks.
+    """
+    required = tuple((name, types, types == NUMBER, TYPE_NAMES[types]) for name, types in required)
+    optional = tuple((name, types, types == NUMBER, TYPE_NAMES[types]) for name, types in optional)
+
+    def validate(record):
+        if type(record) is not dict:
+            return "record is not a JSON object"
+        for name, types, numeric, type_name in required:
+            value = record.get(name)
+            if value is None:
+                return f"missing field {name}"
+            if not isinstance(value, types) or (numeric and type(value) is bool):
+                return f"field {name} is not a {type_name}"
+        for name, types, numeric, type_name in optional:
+            value = record.get(name)
+            if value is not None and (not isinstance(value, types) or (numeric and type(value) is bool)):
+                return f"field {name} is not a {type_name}"
+        return None
+
+    return validate
+
+
+VALIDATORS = {data_set_id: compile_validator(**schema) for data_set_id, schema in DATASET_SCHEMAS.items()}
+
+
+def validator_for(data_set_id):
+    """
+    Returns the validator of a dataset, datasets added to the stream after this list only get the JSON object check
+    """
+    return VALIDATORS.get(data_set_id) or compile_validator()
@@ -0,0 +1,90 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+from decimal import Decimal
+import aws_clients
+
+ROLLUP_OBJECT_NAME = "rollup.ndjson"
+ROLLUP_ATTRIBUTES = ("partition", "key")
+
+
+def changed_hours(event):
+    """
+    Returns the hours of the rollups changed by a DynamoDB stream batch
+    """
+    hours = set()
+    for record in event.get("Records", []):
+        hours.add(record["dynamodb"]["Keys"]["partition"]["S"].split("#")[0])
+    return sorted(hours)
+
+
+def rollup_object_key(prefix, hour):
+    """
+    Returns the landing bucket key of the compact rollup of an hour, hour in the form 2024-05-01T22
+    """
+    return f"{prefix}year={hour[0:4]}/month={hour[5:7]}/day={hour[8:10]}/hour={hour[11:13]}/{ROLLUP_OBJECT_NAME}"
+
+
+def _number(value):
+    number = Decimal(value)
+    return int(number) if number == number.to_integral_value() else float(number)
+
+
+def to_row(item):
+    row = {}
+    for name, value in item.items():
+        if name in ROLLUP_ATTRIBUTES:
+            continue
+        row[name] = _number(value["N"]) if "N" in value else value["S"]
+    row["hour"] = f"{row['hour']}:00:00Z"
+    return row
+
+
+def hour_rollups(table_name, hour, shards):
+    rows = []
+    paginator = aws_clients.dynamodb_client.get_paginator("query")
+    for shard in range(shards):
+        for page in paginator.paginate(
+            TableName=table_name,
+            KeyConditionExpression="#partition = :partition",
+            ExpressionAttributeNames={"#partition": "partition"},
+            ExpressionAttributeValues={":partition": {"S": f"{hour}#{shard}"}},
+        ):
+            # rollups whose only record was revised into another hour are left with no records
+            rows.extend(to_row(item) for item in page.get("Items", []) if int(item["records"]["N"]) > 0)
+    return sorted(rows, key=lambda row: (row["advertiser_id"], row["campaign_id"]))
+
+
+def handler(event, context):
+    """
+    Rewrites the compact rollup partition of every hour changed since the previous invocation. Each hour is a single
+    object with one line per advertiser and campaign, replaced atomically so readers never see a partial hour.
+    """
+    table_name = os.environ["ROLLUPS_TABLE_NAME"]
+    shards = int(os.environ.get("ROLLUP_SHARDS", "10"))
+    written = []
+    for hour in changed_hours(event):
+        rows = hour_rollups(table_name, hour, shards)
+        key = rollup_object_key(os.environ["ROLLUP_PREFIX"], hour)
+        aws_clients.s3_client.put_object(
+            Bucket=os.environ["ROLLUP_BUCKET_NAME"],
+            Key=key,
+            Body="".join(json.dumps(row) + "\n" for row in rows).encode("utf-8"),
+            ContentType="application/x-ndjson",
+        )
+        written.append(key)
+    return {"written": written}
@@ -0,0 +1,176 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import aws_clients
+import sqs_consuming_lambda as sqs_lambda
+
+_CONVERSION_METRICS = [
+    f"attributed_{metric}_{window}d{suffix}"
+    for metric in ("conversions", "sales", "units_ordered")
+    for window in (1, 7, 14, 30)
+    for suffix in ("", "_same_sku")
+]
+DEFAULT_METRIC_FIELDS = {
+    "sp-traffic": ["impressions", "clicks", "cost"],
+    "sp-conversion": _CONVERSION_METRICS,
+}
+# Conversions are revised for weeks, revisions are remembered long enough to be applied as deltas
+RECORD_RETENTION = timedelta(days=60)
+MAX_TRANSACTION_ATTEMPTS = 5
+
+
+def metric_fields():
+    if os.environ.get("ROLLUP_METRIC_FIELDS"):
+        return os.environ["ROLLUP_METRIC_FIELDS"].split(",")
+    return DEFAULT_METRIC_FIELDS[os.environ["DATA_SET_ID"]]
+
+
+def rollup_key(record, shards):
+    """
+    Returns the (partition, sort key) of the rollup a record belongs to. Rollups of an hour are spread over shards
+    partitions so that the current hour does not become a hot partition.
+    """
+    hour = record["time_window_start"][:13]
+    sort_key = f"{record['advertiser_id']}#{record['campaign_id']}"
+    return f"{hour}#{zlib.crc32(sort_key.encode('utf-8')) % shards}", sort_key
+
+
+def _metrics(record, fields):
+    return {field: Decimal(str(record.get(field) or 0)) for field in fields}
+
+
+def _rollup_update(table_name, key, record, deltas, record_count_delta):
+    names = {f"#m{i}": field for i, field in enumerate(deltas)}
+    values = {f":m{i}": {"N": str(delta)} for i, delta in enumerate(deltas.values())}
+    return {
+        "Update": {
+            "TableName": table_name,
+            "Key": {"partition": {"S": key[0]}, "key": {"S": key[1]}},
+            "UpdateExpression": "ADD "
+            + ", ".join(f"{name} {value}" for name, value in zip(names, values))
+            + ", #records :records SET #advertiser = :advertiser, #campaign = :campaign, #hour = :hour",
+            "ExpressionAttributeNames": {
+                **names,
+                "#records": "records",
+                "#advertiser": "advertiser_id",
+                "#campaign": "campaign_id",
+                "#hour": "hour",
+            },
+            "ExpressionAttributeValues": {
+                **values,
+                ":records": {"N": str(record_count_delta)},
+                ":advertiser": {"S": str(record["advertiser_id"])},
+                ":campaign": {"S": str(record["campaign_id"])},
+                ":hour": {"S": key[0].split("#")[0]},
+            },
+        }
+    }
+
+
+def apply_record(record, records_table, rollups_table, fields, shards):
+    """
+    Applies a record to its hourly rollup as an idempotent upsert keyed by idempotency_id.
+
+    The stored revision of the record is subtracted and the new one added in a single transaction, conditional on
+    the stored revision not having changed in between. Redelivered records change nothing, revised records replace
+    the contribution of their previous revision.
+    """
+    record_id = record["idempotency_id"]
+    key = rollup_key(record, shards)
+    metrics = _metrics(record, fields)
+
+    for _ in range(MAX_TRANSACTION_ATTEMPTS):
+        previous = aws_clients.dynamodb_client.get_item(
+            TableName=records_table, Key={"id": {"S": record_id}}, ConsistentRead=True
+        ).get("Item")
+
+        if previous is None:
+            revision = 0
+            condition = "attribute_not_exists(#id)"
+            updates = [_rollup_update(rollups_table, key, record, metrics, 1)]
+        else:
+            revision = int(previous["revision"]["N"])
+            condition = "#revision = :revision"
+            previous_key = (previous["rollupPartition"]["S"], previous["rollupKey"]["S"])
+            previous_metrics = {field: Decimal(value["N"]) for field, value in previous["metrics"]["M"].items()}
+            if previous_key == key and previous_metrics == metrics:
+                return False
+            if previous_key == key:
+                deltas = {field: metrics[field] - previous_metrics.get(field, Decimal(0)) for field in fields}
+                updates = [_rollup_update(rollups_table, key, record, deltas, 0)]
+            else:
+                negated = {field: -value for field, value in previous_metrics.items()}
+                updates = [
+                    _rollup_update(rollups_table, previous_key, record, negated, -1),
+                    _rollup_update(rollups_table, key, record, metrics, 1),
+                ]
+
+        expires_at = datetime.now(timezone.utc) + RECORD_RETENTION
+        put_record = {
+            "Put": {
+                "TableName": records_table,
+                "Item": {
+                    "id": {"S": record_id},
+                    "revision": {"N": str(revision + 1)},
+                    "rollupPartition": {"S": key[0]},
+                    "rollupKey": {"S": key[1]},
+                    "metrics": {"M": {field: {"N": str(value)} for field, value in metrics.items()}},
+                    "expiresAt": {"N": str(int(expires_at.timestamp()))},
+                },
+                "ConditionExpression": condition,
+                "ExpressionAttributeNames": {"#id": "id"} if previous is None else {"#revision": "revision"},
+            }
+        }
+        if previous is not None:
+            put_record["Put"]["ExpressionAttributeValues"] = {":revision": {"N": str(revision)}}
+
+        try:
+            aws_clients.dynamodb_client.transact_write_items(TransactItems=[put_record] + updates)
+            return True
+        except aws_clients.dynamodb_client.exceptions.TransactionCanceledException:
+            # another invocation applied a revision of the same record first, re-read and try again
+            continue
+    raise RuntimeError(f"Could not apply record {record_id} after {MAX_TRANSACTION_ATTEMPTS} attempts")
+
+
+def on_rollup(messages_batch, batch_failures, error_handler):
+    records_table = os.environ["ROLLUP_RECORDS_TABLE_NAME"]
+    rollups_table = os.environ["ROLLUPS_TABLE_NAME"]
+    shards = int(os.environ.get("ROLLUP_SHARDS", "10"))
+    fields = metric_fields()
+    for message in messages_batch:
+        try:
+            apply_record(sqs_lambda.get_message_body(message), records_table, rollups_table, fields, shards)
+        except Exception as error:
+            batch_failures.append(message)
+            error_handler(error, message.get("messageId"))
+
+
+def on_entire_batch(all_messages, batch_failures):
+    sqs_lambda.process_messages_in_batches(
+        all_messages,
+        lambda x: True,
+        on_rollup,
+        batch_failures,
+        max_batch_size=10,
+    )
+
+
+def handler(event, context):
+    return sqs_lambda.batch_handler(event, on_entire_batch)
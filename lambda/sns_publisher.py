@@ -0,0 +1,50 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Shared by stream_fanout_lambda and the landing zone replay tool, so replayed records are published exactly as
+# live records are.
+
+MAX_BATCH_SIZE = 10
+MAX_BATCH_PAYLOAD_BYTES = 256 * 1024
+# Set on replayed records, the landing zone subscription filters them out so history is not landed twice
+REPLAY_ATTRIBUTE = "amz_stream_replay"
+# Set on latency canary records, only the landing zone subscription receives them
+CANARY_ATTRIBUTE = "amz_stream_canary"
+
+
+def to_sns_message(body):
+    # records are newline terminated so that Firehose writes newline delimited JSON objects to S3
+    return body + "\n"
+
+
+def publish_batch(
+    sns_client, topic_arn, bodies, message_attributes=None, message_group_ids=None, deduplication_ids=None
+):
+    """
+    Publishes up to MAX_BATCH_SIZE message bodies, returns the failed entries with Id set to the index of the body.
+    FIFO topics need the message group and deduplication id of every body.
+    """
+    entries = []
+    for i, body in enumerate(bodies):
+        entry = {"Id": str(i), "Message": to_sns_message(body)}
+        if message_attributes:
+            entry["MessageAttributes"] = message_attributes
+        if message_group_ids:
+            entry["MessageGroupId"] = message_group_ids[i]
+            entry["MessageDeduplicationId"] = deduplication_ids[i]
+        entries.append(entry)
+
+    response = sns_client.publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=entries)
+    return response.get("Failed", [])
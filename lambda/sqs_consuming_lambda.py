@@ -15,7 +15,10 @@
 
 import json
 import logging as log
+import os
+import time
 import batch
+import tracing
 
 
 def is_subscription_confirmation(message):
@@ -27,6 +30,17 @@ def get_messages_list(event):
     return event.get("Records", [])
 
 
+def stream_messages(event):
+    """
+    Yields the messages of an event in order and drops each from the event as it is handed out, so that message
+    bodies can be freed once processed instead of living until the end of the invocation
+    """
+    messages = get_messages_list(event)
+    messages.reverse()
+    while messages:
+        yield messages.pop()
+
+
 def get_message_body(message):
     return json.loads(message["body"])
 
@@ -39,6 +53,59 @@ def default_batch_error_handler(error, context=None):
     log.error("%s, additional info: %s", error, context)
 
 
+class BatchFailures:
+    """
+    Failed messages of an invocation. Callbacks append and extend it with messages, only their ids are kept.
+    """
+
+    def __init__(self):
+        self.message_ids = {}
+
+    def append(self, message):
+        self.message_ids[message.get("messageId")] = None
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def __len__(self):
+        return len(self.message_ids)
+
+    def as_batch_item_failures(self):
+        return [{"itemIdentifier": message_id} for message_id in self.message_ids]
+
+
+def upstream_trace_header(event):
+    """
+    Returns the trace header propagated by the publisher of the first message, records published by a traced fanout
+    lambda carry it as a message attribute
+    """
+    records = get_messages_list(event)
+    if not records:
+        return None
+    attribute = records[0].get("messageAttributes", {}).get(tracing.TRACE_ATTRIBUTE)
+    return attribute.get("stringValue") if attribute else None
+
+
+def oldest_message_age_ms(event, now_ms):
+    sent_timestamps = [
+        int(message["attributes"]["SentTimestamp"])
+        for message in get_messages_list(event)
+        if "SentTimestamp" in message.get("attributes", {})
+    ]
+    return now_ms - min(sent_timestamps) if sent_timestamps else 0
+
+
+def _process_batch(next_batch, batch_callback, batch_failures, error_handler, span_name="batch"):
+    try:
+        with tracing.get_tracer().span(span_name, messages=len(next_batch)):
+            batch_callback(next_batch, batch_failures, error_handler)
+    except Exception as error:
+        # failure in callback, fail entire micro-batch
+        batch_failures.extend(next_batch)
+        error_handler(error, [message.get("messageId") for message in next_batch])
+
+
 def process_messages_in_batches(
     all_messages,
     messages_filter,
@@ -47,21 +114,60 @@ def process_messages_in_batches(
     max_batch_size,
     error_handler=default_batch_error_handler,
 ):
-    filtered_messages = list(filter(messages_filter, all_messages))
-
-    for next_batch in batch.batch_of(filtered_messages, max_batch_size):
-        try:
-            batch_callback(next_batch, batch_failures, error_handler)
-        except Exception as error:
-            # failure in callback, fail entire micro-batch
-            batch_failures.extend(next_batch)
-            error_handler(error, json.dumps(next_batch))
+    with tracing.get_tracer().span("process_messages_in_batches"):
+        for next_batch in batch.batch_of(filter(messages_filter, all_messages), max_batch_size):
+            _process_batch(next_batch, batch_callback, batch_failures, error_handler)
 
 
-def batch_handler(event, entire_batch_callback):
-    all_messages = get_messages_list(event)
-    batch_failures = []
+def process_routed_messages(
+    all_messages,
+    router,
+    route_callbacks,
+    batch_failures,
+    max_batch_size,
+    error_handler=default_batch_error_handler,
+):
+    """
+    Routes all messages in a single pass, router returns the key of the route_callbacks entry that handles a message.
+    A route's batch is processed as soon as it is full, so at most one partial batch per route is held at a time.
+    max_batch_size is either one size for all routes or a dict with the size of every route.
+    """
+    batch_sizes = max_batch_size if isinstance(max_batch_size, dict) else dict.fromkeys(route_callbacks, max_batch_size)
+    pending = {route: [] for route in route_callbacks}
+    with tracing.get_tracer().span("process_routed_messages"):
+        for message in all_messages:
+            try:
+                route = router(message)
+                pending[route].append(message)
+            except Exception as error:
+                batch_failures.append(message)
+                error_handler(error, message.get("messageId"))
+                continue
+            if len(pending[route]) >= batch_sizes[route]:
+                next_batch, pending[route] = pending[route], []
+                _process_batch(next_batch, route_callbacks[route], batch_failures, error_handler, f"route:{route}")
+
+        for route, next_batch in pending.items():
+            if next_batch:
+                _process_batch(next_batch, route_callbacks[route], batch_failures, error_handler, f"route:{route}")
 
-    entire_batch_callback(all_messages, batch_failures)
 
-    return {"batchItemFailures": [as_error_id(i) for i in batch_failures]}
+def batch_handler(event, entire_batch_callback):
+    """
+    Passes the messages of the event to entire_batch_callback as a one-shot iterator, and reports the ids of the
+    messages added to batch_failures as partial batch failures
+    """
+    batch_failures = BatchFailures()
+    tracer = tracing.get_tracer()
+
+    with tracer.invocation("batch_handler", upstream_trace_header(event), os.environ.get("_X_AMZN_TRACE_ID")):
+        if tracer.sampled:
+            # time the oldest message waited in the queue before this invocation
+            tracer.annotate(
+                messages=len(get_messages_list(event)),
+                oldest_message_age_ms=oldest_message_age_ms(event, int(time.time() * 1000)),
+            )
+        entire_batch_callback(stream_messages(event), batch_failures)
+        tracer.annotate(failed_messages=len(batch_failures))
+
+    return {"batchItemFailures": batch_failures.as_batch_item_failures()}
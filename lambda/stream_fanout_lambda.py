@@ -15,23 +15,72 @@
 
 import json
 import os
+import time
+from functools import lru_cache
+import adaptive_rate
 import aws_clients
+import canary
+import record_validation
+import sns_publisher
 import sqs_consuming_lambda as sqs_lambda
+import tracing
 
+DATA_ROUTE = "data"
+CONFIRMATION_ROUTE = "confirmation"
+QUARANTINE_ROUTE = "quarantine"
+CANARY_ROUTE = "canary"
 
-def on_route_to_sns(messages_batch, batch_failures, error_handler, destination_topic_arn):
-    batch_to_publish = [
-        {
-            "Id": str(i),
-            "Message": message["body"] + "\n",
-        }
-        for i, message in enumerate(messages_batch)
-    ]
 
-    response = aws_clients.sns_client.publish_batch(
-        TopicArn=destination_topic_arn, PublishBatchRequestEntries=batch_to_publish
-    )
-    failures = response.get("Failed", [])
+@lru_cache(maxsize=None)
+def dataset_validator(data_set_id):
+    return record_validation.validator_for(data_set_id)
+
+
+def quarantine_reason(message, validate):
+    """
+    Returns why a message can not be forwarded as a record of the dataset, or None
+    """
+    try:
+        body = json.loads(message["body"])
+    except ValueError:
+        return "body is not valid JSON"
+    return validate(body)
+
+
+def route_message(message, validate):
+    """
+    Decodes the body once to pick the route of a message, subscription confirmations and canaries are not validated
+    """
+    try:
+        body = json.loads(message["body"])
+    except ValueError:
+        return QUARANTINE_ROUTE
+    if type(body) is dict and body.get("Type") == "SubscriptionConfirmation":
+        return CONFIRMATION_ROUTE
+    if canary.is_canary(body):
+        return CANARY_ROUTE
+    return DATA_ROUTE if validate(body) is None else QUARANTINE_ROUTE
+
+
+def on_route_to_sns(messages_batch, batch_failures, error_handler, destination_topic_arn, metrics=None):
+    limiter = adaptive_rate.publish_rate_limiter()
+    if limiter is not None:
+        limiter.acquire(len(messages_batch))
+    started_at = time.monotonic()
+    try:
+        failures = sns_publisher.publish_batch(
+            aws_clients.sns_client,
+            destination_topic_arn,
+            [message["body"] for message in messages_batch],
+            message_attributes=tracing.get_tracer().message_attributes(),
+        )
+    except Exception as error:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        if adaptive_rate.is_throttling(code):
+            _record_publish(metrics, limiter, started_at, 0, len(messages_batch))
+        raise
+    throttled = sum(1 for failure in failures if adaptive_rate.is_throttling(failure.get("Code")))
+    _record_publish(metrics, limiter, started_at, len(messages_batch) - len(failures), throttled)
     if failures:
         error_handler(
             f"Partial batch failure from SNS, {len(failures)} failed out of {len(messages_batch)}",
@@ -41,36 +90,104 @@ def on_route_to_sns(messages_batch, batch_failures, error_handler, destination_t
     batch_failures.extend([messages_batch[int(failure["Id"])] for failure in failures])
 
 
+def _record_publish(metrics, limiter, started_at, published, throttled):
+    elapsed_s = time.monotonic() - started_at
+    if limiter is not None:
+        limiter.on_result(elapsed_s, throttled > 0)
+    if metrics is not None:
+        metrics.record(published, throttled, elapsed_s * 1000, limiter.rate if limiter is not None else None)
+
+
+def on_route_canary(messages_batch, batch_failures, error_handler, destination_topic_arn):
+    """
+    Stamps canaries with the fanout time and publishes them with the canary attribute, emits their ingress latency
+    """
+    fanout_at_ms = int(time.time() * 1000)
+    bodies, ingress_latencies_ms = [], []
+    for message in messages_batch:
+        record = json.loads(message["body"])
+        record["fanoutAt"] = fanout_at_ms
+        bodies.append(json.dumps(record))
+        if isinstance(record.get("injectedAt"), int):
+            ingress_latencies_ms.append(fanout_at_ms - record["injectedAt"])
+
+    failures = sns_publisher.publish_batch(
+        aws_clients.sns_client,
+        destination_topic_arn,
+        bodies,
+        message_attributes={
+            sns_publisher.CANARY_ATTRIBUTE: {"DataType": "String", "StringValue": "true"},
+            **tracing.get_tracer().message_attributes(),
+        },
+    )
+    if failures:
+        error_handler(
+            f"Partial batch failure from SNS, {len(failures)} failed out of {len(messages_batch)}",
+            json.dumps(failures),
+        )
+    batch_failures.extend([messages_batch[int(failure["Id"])] for failure in failures])
+
+    if ingress_latencies_ms:
+        print(
+            canary.as_emf(
+                os.environ.get("DATA_SET_ID", "unknown"), {"IngressLatencyMs": (ingress_latencies_ms, "Milliseconds")}
+            )
+        )
+
+
 def on_route_to_sqs(messages_batch, batch_failures, error_handler, destination_queue_url):
     for message in messages_batch:
         try:
             aws_clients.sqs_client.send_message(QueueUrl=destination_queue_url, MessageBody=message["body"])
         except Exception as error:
             batch_failures.append(message)
-            error_handler(error, json.dumps(message))
+            error_handler(error, message.get("messageId"))
 
 
-def on_entire_batch(all_messages, batch_failures):
-    fanout_config = [
-        (
-            lambda x: not sqs_lambda.is_subscription_confirmation(x),
-            lambda x, y, z: on_route_to_sns(x, y, z, os.environ["DATA_FANOUT_TOPIC_ARN"]),
-        ),
-        (
-            sqs_lambda.is_subscription_confirmation,
-            lambda x, y, z: on_route_to_sqs(x, y, z, os.environ["SUBSCRIPTION_CONFIRMATION_QUEUE_URL"]),
-        ),
+def on_route_to_quarantine(messages_batch, batch_failures, error_handler, quarantine_queue_url, validate):
+    entries = [
+        {
+            "Id": str(i),
+            "MessageBody": message["body"],
+            "MessageAttributes": {
+                "reason": {"DataType": "String", "StringValue": quarantine_reason(message, validate)},
+                "dataSetId": {"DataType": "String", "StringValue": os.environ.get("DATA_SET_ID", "unknown")},
+            },
+        }
+        for i, message in enumerate(messages_batch)
     ]
-
-    for messages_filter, batch_callback in fanout_config:
-        sqs_lambda.process_messages_in_batches(
-            all_messages,
-            messages_filter,
-            batch_callback,
-            batch_failures,
-            max_batch_size=10,
+    failures = aws_clients.sqs_client.send_message_batch(QueueUrl=quarantine_queue_url, Entries=entries).get(
+        "Failed", []
+    )
+    if failures:
+        error_handler(
+            f"Partial batch failure from SQS, {len(failures)} failed out of {len(messages_batch)}",
+            json.dumps(failures),
         )
 
+    batch_failures.extend([messages_batch[int(failure["Id"])] for failure in failures])
+
+
+def on_entire_batch(all_messages, batch_failures):
+    validate = dataset_validator(os.environ.get("DATA_SET_ID", ""))
+    metrics = adaptive_rate.PublishMetrics() if os.environ.get("FANOUT_PUBLISH_METRICS") else None
+    route_callbacks = {
+        DATA_ROUTE: lambda x, y, z: on_route_to_sns(x, y, z, os.environ["DATA_FANOUT_TOPIC_ARN"], metrics),
+        CONFIRMATION_ROUTE: lambda x, y, z: on_route_to_sqs(x, y, z, os.environ["SUBSCRIPTION_CONFIRMATION_QUEUE_URL"]),
+        QUARANTINE_ROUTE: lambda x, y, z: on_route_to_quarantine(x, y, z, os.environ["QUARANTINE_QUEUE_URL"], validate),
+        CANARY_ROUTE: lambda x, y, z: on_route_canary(x, y, z, os.environ["DATA_FANOUT_TOPIC_ARN"]),
+    }
+
+    sqs_lambda.process_routed_messages(
+        all_messages,
+        lambda x: route_message(x, validate),
+        route_callbacks,
+        batch_failures,
+        max_batch_size=10,
+    )
+    if metrics is not None:
+        metrics.flush(os.environ.get("DATA_SET_ID", "unknown"))
+
 
 def handler(event, context):
     return sqs_lambda.batch_handler(event, on_entire_batch)
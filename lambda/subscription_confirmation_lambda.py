@@ -13,26 +13,98 @@
 # IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-import aws_clients
 import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import aws_clients
 import sqs_consuming_lambda as sqs_lambda
 
+MAX_CONCURRENT_CONFIRMATIONS = 10
+# (TopicArn, Token) pairs confirmed by this container, SNS resends confirmations when a subscription is re-requested
+CONFIRMED_CACHE_SIZE = 1024
+CONFIRMED_CACHE_TTL_S = 24 * 3600
+
+log = logging.getLogger("subscription_confirmation")
+log.setLevel(logging.INFO)
+
+
+class ConfirmedCache:
+    """
+    Recently confirmed (TopicArn, Token) pairs, kept across invocations of a warm container
+    """
+
+    def __init__(self, max_size=CONFIRMED_CACHE_SIZE, ttl_s=CONFIRMED_CACHE_TTL_S, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self._confirmed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, pair):
+        with self._lock:
+            confirmed_at = self._confirmed.get(pair)
+            if confirmed_at is None:
+                return False
+            if self.clock() - confirmed_at > self.ttl_s:
+                del self._confirmed[pair]
+                return False
+            return True
+
+    def add(self, pair):
+        with self._lock:
+            self._confirmed[pair] = self.clock()
+            self._confirmed.move_to_end(pair)
+            while len(self._confirmed) > self.max_size:
+                self._confirmed.popitem(last=False)
+
+
+confirmed_cache = ConfirmedCache()
+executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_CONFIRMATIONS)
+
+
+def log_outcome(topic_arn, outcome, message_ids, error=None):
+    entry = {"event": "subscription_confirmation", "topicArn": topic_arn, "outcome": outcome, "messageIds": message_ids}
+    if error is not None:
+        entry["error"] = str(error)
+    (log.error if error is not None else log.info)(json.dumps(entry))
+
+
+def confirm(pair):
+    """
+    Confirms a subscription unless this container already did, returns the outcome
+    """
+    if pair in confirmed_cache:
+        return "already-confirmed"
+    topic_arn, token = pair
+    aws_clients.sns_client.confirm_subscription(TopicArn=topic_arn, Token=token)
+    confirmed_cache.add(pair)
+    return "confirmed"
+
 
 def on_confirm_subscription(messages_batch, batch_failures, error_handler):
+    # messages of the same confirmation are confirmed once
+    messages_by_pair = {}
     for message in messages_batch:
         try:
-            body = message["body"]
-            print(f"Confirmation request: {body}")
-
-            confirmation_request = json.loads(body)
-            topic_arn = confirmation_request["TopicArn"]
-            subs_token = confirmation_request["Token"]
+            confirmation_request = json.loads(message["body"])
+            pair = (confirmation_request["TopicArn"], confirmation_request["Token"])
+        except (ValueError, KeyError, TypeError) as error:
+            batch_failures.append(message)
+            log_outcome(None, "invalid", [message.get("messageId")], error)
+            continue
+        messages_by_pair.setdefault(pair, []).append(message)
 
-            aws_clients.sns_client.confirm_subscription(TopicArn=topic_arn, Token=subs_token)
-            print(f"Confirmed: {body}")
+    futures = {pair: executor.submit(confirm, pair) for pair in messages_by_pair}
+    for pair, future in futures.items():
+        message_ids = [message.get("messageId") for message in messages_by_pair[pair]]
+        try:
+            log_outcome(pair[0], future.result(), message_ids)
         except Exception as error:
-            batch_failures.append(message)
-            error_handler(error, json.dumps(message))
+            batch_failures.extend(messages_by_pair[pair])
+            log_outcome(pair[0], "failed", message_ids, error)
 
 
 def on_entire_batch(all_messages, batch_failures):
@@ -41,7 +113,7 @@ def on_entire_batch(all_messages, batch_failures):
         lambda x: True,
         on_confirm_subscription,
         batch_failures,
-        max_batch_size=10,
+        max_batch_size=MAX_CONCURRENT_CONFIRMATIONS,
     )
 
 
@@ -0,0 +1,190 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Sampled X-Ray tracing without the X-Ray SDK, which is not packaged with the lambdas. Segment documents are sent to
+# the X-Ray daemon that Lambda runs next to functions with active tracing.
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Message attribute carrying the trace header of the span which published a record to the fanout topic
+TRACE_ATTRIBUTE = "amz_stream_trace"
+DAEMON_HEADER = '{"format": "json", "version": 1}\n'
+DEFAULT_DAEMON_ADDRESS = "127.0.0.1:2000"
+
+_cold_start = True
+
+
+def parse_trace_header(header):
+    """
+    Parses a trace header such as Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=1
+    """
+    fields = {}
+    for part in (header or "").split(";"):
+        key, _, value = part.partition("=")
+        if value:
+            fields[key.strip()] = value.strip()
+    return fields
+
+
+def new_trace_id(now):
+    return f"1-{int(now):08x}-{os.urandom(12).hex()}"
+
+
+def new_span_id():
+    return os.urandom(8).hex()
+
+
+class UdpEmitter:
+    def __init__(self, daemon_address):
+        host, _, port = daemon_address.rpartition(":")
+        self.address = (host, int(port))
+        self._socket = None
+
+    def emit(self, document):
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.sendto((DAEMON_HEADER + json.dumps(document)).encode("utf-8"), self.address)
+
+
+class Tracer:
+    """
+    Records spans of sampled invocations. Outside of a sampled invocation spans are no-ops, so that unsampled
+    invocations pay one random draw per invocation and one check per span.
+
+    A sampled invocation continues the trace of its upstream publisher when there is one, otherwise it is a
+    subsegment of the Lambda segment when Lambda sampled the invocation too, or a segment of a new trace.
+    """
+
+    def __init__(self, sample_rate, emitter, service_name, random=random.random, clock=time.time):
+        self.sample_rate = sample_rate
+        self.emitter = emitter
+        self.service_name = service_name
+        self.random = random
+        self.clock = clock
+        self._local = threading.local()
+
+    @property
+    def _spans(self):
+        spans = getattr(self._local, "spans", None)
+        if spans is None:
+            spans = self._local.spans = []
+        return spans
+
+    @property
+    def sampled(self):
+        return bool(self._spans)
+
+    def _start(self, upstream_header, lambda_header):
+        upstream = parse_trace_header(upstream_header)
+        if upstream.get("Sampled") == "1" and "Root" in upstream:
+            return upstream["Root"], upstream.get("Parent"), False
+        if self.sample_rate <= 0 or self.random() >= self.sample_rate:
+            return None
+        facade = parse_trace_header(lambda_header)
+        if facade.get("Sampled") == "1" and "Root" in facade:
+            return facade["Root"], facade.get("Parent"), True
+        return new_trace_id(self.clock()), None, False
+
+    @contextmanager
+    def invocation(self, name, upstream_header=None, lambda_header=None):
+        global _cold_start
+        cold_start, _cold_start = _cold_start, False
+        started = self._start(upstream_header, lambda_header)
+        if started is None:
+            yield
+            return
+
+        trace_id, parent_id, is_subsegment = started
+        span = {"id": new_span_id(), "trace_id": trace_id, "start_time": self.clock(), "annotations": {}}
+        if parent_id:
+            span["parent_id"] = parent_id
+        if is_subsegment:
+            span.update(name=name, type="subsegment")
+        else:
+            span.update(name=self.service_name, origin="AWS::Lambda::Function")
+            span["annotations"]["operation"] = name
+        span["annotations"]["cold_start"] = cold_start
+        with self._recording(span):
+            yield
+
+    @contextmanager
+    def span(self, name, **annotations):
+        spans = self._spans
+        if not spans:
+            yield
+            return
+        parent = spans[-1]
+        span = {
+            "id": new_span_id(),
+            "trace_id": parent["trace_id"],
+            "parent_id": parent["id"],
+            "type": "subsegment",
+            "name": name,
+            "start_time": self.clock(),
+            "annotations": annotations,
+        }
+        with self._recording(span):
+            yield
+
+    @contextmanager
+    def _recording(self, span):
+        spans = self._spans
+        spans.append(span)
+        try:
+            yield
+        except Exception:
+            span["fault"] = True
+            raise
+        finally:
+            spans.pop()
+            span["end_time"] = self.clock()
+            if not span["annotations"]:
+                del span["annotations"]
+            self.emitter.emit(span)
+
+    def annotate(self, **annotations):
+        if self._spans:
+            self._spans[-1]["annotations"].update(annotations)
+
+    def trace_header(self):
+        spans = self._spans
+        if not spans:
+            return None
+        return f"Root={spans[-1]['trace_id']};Parent={spans[-1]['id']};Sampled=1"
+
+    def message_attributes(self):
+        """
+        Returns the SNS message attributes propagating the current span to subscribers, empty when not sampled
+        """
+        header = self.trace_header()
+        if header is None:
+            return {}
+        return {TRACE_ATTRIBUTE: {"DataType": "String", "StringValue": header}}
+
+
+@lru_cache(maxsize=None)
+def get_tracer():
+    return Tracer(
+        float(os.environ.get("TRACE_SAMPLE_RATE", "0")),
+        UdpEmitter(os.environ.get("AWS_XRAY_DAEMON_ADDRESS", DEFAULT_DAEMON_ADDRESS)),
+        os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "amz-stream"),
+    )
@@ -0,0 +1,258 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+In-memory stand-ins for the AWS services used by the CLI tools, so they can be tested without an AWS account.
+"""
+
+import io
+import itertools
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timezone
+
+
+class LocalSqs:
+    def __init__(self):
+        self.queues = {}
+        self.visibility_changes = []
+        self._ids = itertools.count()
+
+    def create_queue(self, name):
+        url = f"https://sqs.local/000000000000/{name}"
+        self.queues[url] = {"visible": deque(), "in_flight": {}}
+        return url
+
+    def send_message(self, QueueUrl, MessageBody, MessageAttributes=None, **kwargs):
+        message_id = str(next(self._ids))
+        message = {"MessageId": message_id, "Body": MessageBody}
+        if MessageAttributes:
+            message["MessageAttributes"] = MessageAttributes
+        self.queues[QueueUrl]["visible"].append(message)
+        return {"MessageId": message_id}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        for entry in Entries:
+            self.send_message(QueueUrl, entry["MessageBody"], entry.get("MessageAttributes"))
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, **kwargs):
+        queue = self.queues[QueueUrl]
+        if not queue["visible"] and WaitTimeSeconds:
+            # a short pause instead of the long poll, so that idle receivers do not spin
+            time.sleep(0.01)
+        messages = []
+        while len(messages) < MaxNumberOfMessages:
+            try:
+                message = queue["visible"].popleft()
+            except IndexError:
+                break
+            receipt_handle = f"rh-{message['MessageId']}-{next(self._ids)}"
+            queue["in_flight"][receipt_handle] = message
+            messages.append({**message, "ReceiptHandle": receipt_handle})
+        return {"Messages": messages} if messages else {}
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        for entry in Entries:
+            self.queues[QueueUrl]["in_flight"].pop(entry["ReceiptHandle"], None)
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    def change_message_visibility_batch(self, QueueUrl, Entries):
+        self.visibility_changes.extend(Entries)
+        for entry in Entries:
+            if entry["VisibilityTimeout"] == 0 and entry["ReceiptHandle"] in self.queues[QueueUrl]["in_flight"]:
+                self.queues[QueueUrl]["visible"].append(self.queues[QueueUrl]["in_flight"].pop(entry["ReceiptHandle"]))
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames):
+        queue = self.queues[QueueUrl]
+        return {
+            "Attributes": {
+                "ApproximateNumberOfMessages": str(len(queue["visible"])),
+                "ApproximateNumberOfMessagesNotVisible": str(len(queue["in_flight"])),
+            }
+        }
+
+
+class _Paginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return self.pages(**kwargs)
+
+
+class LocalCloudFormation:
+    def __init__(self, stack_resources):
+        self.stack_resources = stack_resources
+
+    def get_paginator(self, operation_name):
+        def pages(StackName):
+            if StackName not in self.stack_resources:
+                raise Exception(f"Stack with id {StackName} does not exist")
+            yield {"StackResourceSummaries": self.stack_resources[StackName]}
+
+        return _Paginator(pages)
+
+
+class LocalCloudWatch:
+    def __init__(self, ages_by_queue_name=None):
+        self.ages_by_queue_name = ages_by_queue_name or {}
+
+    def get_metric_data(self, MetricDataQueries, **kwargs):
+        results = []
+        for query in MetricDataQueries:
+            queue_name = query["MetricStat"]["Metric"]["Dimensions"][0]["Value"]
+            age = self.ages_by_queue_name.get(queue_name)
+            results.append({"Id": query["Id"], "Values": [] if age is None else [age]})
+        return {"MetricDataResults": results}
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class LocalS3:
+    class exceptions:
+        NoSuchKey = NoSuchKey
+
+    def __init__(self):
+        self.objects = {}
+        self.last_modified = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        if hasattr(Body, "read"):
+            Body = Body.read()
+        self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+        self.last_modified[(Bucket, Key)] = datetime.now(timezone.utc)
+        return {}
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise NoSuchKey("An error occurred (NoSuchKey) when calling the GetObject operation")
+        data = self.objects[(Bucket, Key)]
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def delete_objects(self, Bucket, Delete):
+        for entry in Delete["Objects"]:
+            self.objects.pop((Bucket, entry["Key"]), None)
+        return {"Deleted": Delete["Objects"]}
+
+    def get_paginator(self, operation_name):
+        def pages(Bucket, Prefix=""):
+            keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+            yield {
+                "Contents": [
+                    {
+                        "Key": key,
+                        "Size": len(self.objects[(Bucket, key)]),
+                        "LastModified": self.last_modified[(Bucket, key)],
+                    }
+                    for key in keys
+                ]
+            }
+
+        return _Paginator(pages)
+
+
+class LocalSns:
+    def __init__(self):
+        self.published = []
+        self._lock = threading.Lock()
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        with self._lock:
+            self.published.extend(PublishBatchRequestEntries)
+        return {"Successful": [{"Id": entry["Id"]} for entry in PublishBatchRequestEntries], "Failed": []}
+
+
+class LocalDynamoDb:
+    """Stand-in for tables keyed by a partition and sort key, queried by partition key."""
+
+    def __init__(self, partition_attribute="partition", sort_attribute="key"):
+        self.partition_attribute = partition_attribute
+        self.sort_attribute = sort_attribute
+        self.items = {}
+
+    def _key(self, item):
+        return item[self.partition_attribute]["S"], item[self.sort_attribute]["S"]
+
+    def put_item(self, TableName, Item, **kwargs):
+        self.items[self._key(Item)] = Item
+        return {}
+
+    def delete_item(self, TableName, Key, **kwargs):
+        self.items.pop(self._key(Key), None)
+        return {}
+
+    def get_paginator(self, operation_name):
+        def pages(TableName, ExpressionAttributeValues, **kwargs):
+            (partition,) = [value["S"] for value in ExpressionAttributeValues.values()]
+            yield {"Items": [item for (p, _), item in sorted(self.items.items()) if p == partition]}
+
+        return _Paginator(pages)
+
+
+class LocalKinesis:
+    """Stand-in for a Kinesis data stream, failing the first `throttled` records put with a throttling error."""
+
+    def __init__(self, shards=2, throttled=0):
+        self.shards = {f"shardId-{i:012d}": [] for i in range(shards)}
+        self.throttled = throttled
+        self.put_requests = []
+
+    def put_records(self, Records, StreamName=None, StreamARN=None):
+        self.put_requests.append(len(Records))
+        results = []
+        for entry in Records:
+            if self.throttled:
+                self.throttled -= 1
+                results.append({"ErrorCode": "ProvisionedThroughputExceededException", "ErrorMessage": "Rate exceeded"})
+                continue
+            shard_ids = sorted(self.shards)
+            shard_id = shard_ids[zlib.crc32(entry["PartitionKey"].encode("utf-8")) % len(shard_ids)]
+            sequence_number = f"{len(self.shards[shard_id]):020d}"
+            self.shards[shard_id].append(
+                {"SequenceNumber": sequence_number, "Data": entry["Data"], "PartitionKey": entry["PartitionKey"]}
+            )
+            results.append({"ShardId": shard_id, "SequenceNumber": sequence_number})
+        return {"FailedRecordCount": sum("ErrorCode" in result for result in results), "Records": results}
+
+    def list_shards(self, **kwargs):
+        return {"Shards": [{"ShardId": shard_id} for shard_id in sorted(self.shards)]}
+
+    def _position(self, shard_id, starting_type, sequence_number=None):
+        if starting_type == "AFTER_SEQUENCE_NUMBER":
+            return int(sequence_number) + 1
+        if starting_type == "AT_SEQUENCE_NUMBER":
+            return int(sequence_number)
+        return len(self.shards[shard_id]) if starting_type == "LATEST" else 0
+
+    def get_shard_iterator(self, ShardId, ShardIteratorType, StartingSequenceNumber=None, **kwargs):
+        return {"ShardIterator": f"{ShardId}:{self._position(ShardId, ShardIteratorType, StartingSequenceNumber)}"}
+
+    def get_records(self, ShardIterator, Limit=10000, **kwargs):
+        shard_id, position = ShardIterator.rsplit(":", 1)
+        records = self.shards[shard_id][int(position) : int(position) + Limit]
+        return {"Records": records, "NextShardIterator": f"{shard_id}:{int(position) + len(records)}"}
+
+    def subscribe_to_shard(self, ConsumerARN, ShardId, StartingPosition):
+        position = self._position(ShardId, StartingPosition["Type"], StartingPosition.get("SequenceNumber"))
+        records = self.shards[ShardId][position:]
+        continuation = records[-1]["SequenceNumber"] if records else f"{position - 1:020d}"
+        event = {"SubscribeToShardEvent": {"Records": records, "ContinuationSequenceNumber": continuation}}
+        return {"EventStream": [event]}
@@ -0,0 +1,146 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+
+import pytest
+
+import adaptive_rate
+import concurrency_controller_lambda
+import stream_fanout_lambda
+from tests.unit.local_aws import LocalSns
+
+
+class ThrottlingSns(LocalSns):
+    """Throttles the first `throttled` entries published."""
+
+    def __init__(self, throttled):
+        super().__init__()
+        self.throttled = throttled
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        throttled = PublishBatchRequestEntries[: self.throttled]
+        self.throttled -= len(throttled)
+        super().publish_batch(TopicArn, PublishBatchRequestEntries[len(throttled) :])
+        return {"Failed": [{"Id": entry["Id"], "Code": "Throttling", "SenderFault": False} for entry in throttled]}
+
+
+def test_rate_halves_once_per_throttled_burst_and_recovers_additively():
+    now = [0.0]
+    limiter = adaptive_rate.AimdRateLimiter(1000, min_rate=100, increase_per_s=50, clock=lambda: now[0])
+
+    limiter.on_result(0.01, throttled=True)
+    limiter.on_result(0.01, throttled=True)
+    assert limiter.rate == 500
+    now[0] = 1.5
+    limiter.on_result(0.01, throttled=True)
+    limiter.on_result(0.01, throttled=True)
+    assert limiter.rate == 250
+    for _ in range(3):
+        limiter.on_result(1.0, throttled=False)
+    assert limiter.rate == 400
+
+
+def test_acquire_waits_for_the_current_rate():
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    limiter = adaptive_rate.AimdRateLimiter(100, min_rate=10, clock=lambda: now[0], sleep=sleep)
+    limiter.on_result(0, throttled=True)
+    for _ in range(10):
+        limiter.acquire(10)
+
+    # 50 messages per second after the decrease, a 50 message burst then one batch every 0.2s
+    assert now[0] == pytest.approx(1.0)
+
+
+def test_fanout_publishes_throttling_metrics_and_slows_down(monkeypatch, capsys):
+    sns = ThrottlingSns(throttled=3)
+    monkeypatch.setattr(stream_fanout_lambda.aws_clients, "sns_client", sns)
+    monkeypatch.setenv("DATA_SET_ID", "budget-usage")
+    monkeypatch.setenv("DATA_FANOUT_TOPIC_ARN", "arn:aws:sns:us-east-1:000000000000:fanout")
+    monkeypatch.setenv("FANOUT_PUBLISH_METRICS", "1")
+    monkeypatch.setenv("FANOUT_MAX_PUBLISH_RATE", "1000")
+    adaptive_rate.publish_rate_limiter.cache_clear()
+    body = json.dumps({"advertiserId": "A", "marketplaceId": "M", "budgetScopeId": "B"})
+    event = {"Records": [{"messageId": str(i), "body": body} for i in range(20)]}
+
+    try:
+        result = stream_fanout_lambda.handler(event, None)
+        limiter = adaptive_rate.publish_rate_limiter()
+    finally:
+        adaptive_rate.publish_rate_limiter.cache_clear()
+
+    assert [failure["itemIdentifier"] for failure in result["batchItemFailures"]] == ["0", "1", "2"]
+    assert limiter.rate < 1000
+    emf = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert emf["PublishedMessages"] == 17
+    assert emf["ThrottledMessages"] == 3
+    assert len(emf["PublishLatencyMs"]) == 2
+    assert emf["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "AmzStream/Fanout"
+
+
+@pytest.mark.parametrize(
+    "current, published, throttled, latency_p90_ms, expected",
+    [
+        (40, 10000, 500, 40.0, 20),
+        (3, 10000, 500, 40.0, 2),
+        (40, 10000, 0, 40.0, 42),
+        (40, 10000, 0, None, 42),
+        (40, 10000, 0, 800.0, 20),
+        (50, 10000, 0, 40.0, 50),
+        (40, 0, 0, None, 40),
+    ],
+)
+def test_next_concurrency(current, published, throttled, latency_p90_ms, expected):
+    concurrency = concurrency_controller_lambda.next_concurrency(
+        current, published, throttled, latency_p90_ms, 2, 50, 2, 0.01, 500
+    )
+    assert concurrency == expected
+
+
+def test_controller_updates_event_source_mapping(monkeypatch):
+    class LocalCloudWatch:
+        def get_metric_data(self, MetricDataQueries, StartTime, EndTime):
+            self.stats = {query["Id"]: query["MetricStat"]["Stat"] for query in MetricDataQueries}
+            values = {"publishedmessages": [6000.0, 4000.0], "throttledmessages": [], "publishlatencyms": [900.0]}
+            return {
+                "MetricDataResults": [{"Id": query["Id"], "Values": values[query["Id"]]} for query in MetricDataQueries]
+            }
+
+    class LocalLambda:
+        def __init__(self):
+            self.updates = []
+
+        def get_event_source_mapping(self, UUID):
+            return {"UUID": UUID, "ScalingConfig": {"MaximumConcurrency": 30}}
+
+        def update_event_source_mapping(self, UUID, ScalingConfig):
+            self.updates.append((UUID, ScalingConfig))
+
+    lambda_client, cloudwatch_client = LocalLambda(), LocalCloudWatch()
+    monkeypatch.setattr(concurrency_controller_lambda.aws_clients, "cloudwatch_client", cloudwatch_client)
+    monkeypatch.setattr(concurrency_controller_lambda.aws_clients, "lambda_client", lambda_client)
+    monkeypatch.setenv("DATA_SET_ID", "sp-traffic")
+    monkeypatch.setenv("EVENT_SOURCE_MAPPING_ID", "mapping")
+    monkeypatch.setenv("MAX_CONCURRENCY", "50")
+
+    assert concurrency_controller_lambda.handler({}, None) == {"concurrency": 15}
+    assert lambda_client.updates == [("mapping", {"MaximumConcurrency": 15})]
+    assert cloudwatch_client.stats["publishlatencyms"] == "p90"
@@ -14,8 +14,12 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import aws_cdk as core
+import pytest
 import aws_cdk.assertions as assertions
+from amz_stream_infra.infra_rollout import rollout_stacks, validate_delivery_method
 from amz_stream_infra.stack_definitions import AmzStreamConsumerStack
+from amz_stream_infra.stack_definitions_firehose import AmzStreamConsumerStackFirehose
+from amz_stream_infra.stack_definitions_kinesis import AmzStreamConsumerStackKinesis
 
 AMBASSADOR_CONFIG = {"reviewerArn": "arn:aws:iam::926844853897:role/ReviewerRole"}
 
@@ -43,3 +47,372 @@ def test_sns_topic_created():
     template = assertions.Template.from_stack(stack)
 
     template.resource_count_is("AWS::SNS::Topic", 1)
+
+
+def test_landing_zone_subscription_skips_replayed_records():
+    app = core.App()
+    stack = AmzStreamConsumerStack(app, "NA", "us-east-1", DATASET_CONFIG["NA"][0], AMBASSADOR_CONFIG)
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties(
+        "AWS::SNS::Subscription",
+        {"Protocol": "firehose", "FilterPolicy": {"amz_stream_replay": [{"exists": False}]}},
+    )
+
+
+def test_landing_zone_index_is_opt_in():
+    app = core.App()
+    stack = AmzStreamConsumerStack(app, "NA", "us-east-1", DATASET_CONFIG["NA"][0], AMBASSADOR_CONFIG)
+    assertions.Template.from_stack(stack).resource_count_is("AWS::DynamoDB::Table", 0)
+
+    indexed_stack = AmzStreamConsumerStack(
+        core.App(), "EU", "eu-west-1", {**DATASET_CONFIG["NA"][0], "landingZoneIndex": True}, AMBASSADOR_CONFIG
+    )
+    template = assertions.Template.from_stack(indexed_stack)
+
+    template.resource_count_is("AWS::DynamoDB::Table", 1)
+    template.has_resource_properties(
+        "AWS::Lambda::Function", {"Handler": "landing_zone_index_lambda.handler", "Timeout": 300}
+    )
+    template.has_resource_properties(
+        "Custom::S3BucketNotifications",
+        {
+            "NotificationConfiguration": {
+                "LambdaFunctionConfigurations": assertions.Match.array_with(
+                    [assertions.Match.object_like({"Events": ["s3:ObjectRemoved:*"]})]
+                )
+            }
+        },
+    )
+
+
+def test_latest_state_materializes_entity_datasets_from_fanout_topic():
+    dataset_config = {
+        "dataSetId": "campaigns",
+        "snsSourceArn": "arn:aws:sns:us-east-1:570159413969:*",
+        "latestState": True,
+    }
+    stack = AmzStreamConsumerStack(core.App(), "NA", "us-east-1", dataset_config, AMBASSADOR_CONFIG)
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties(
+        "AWS::DynamoDB::Table", {"PointInTimeRecoverySpecification": {"PointInTimeRecoveryEnabled": True}}
+    )
+    template.has_resource_properties("AWS::SNS::Subscription", {"Protocol": "sqs", "RawMessageDelivery": True})
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        {"Handler": "entity_state_lambda.handler", "Environment": {"Variables": {"ENTITY_ID_FIELD": "campaignId"}}},
+    )
+    template.has_resource_properties("AWS::Events::Rule", {"ScheduleExpression": "rate(1 day)"})
+
+
+def test_latest_state_requires_entity_dataset():
+    with pytest.raises(ValueError):
+        AmzStreamConsumerStack(
+            core.App(), "NA", "us-east-1", {**DATASET_CONFIG["NA"][0], "latestState": True}, AMBASSADOR_CONFIG
+        )
+
+
+def test_hourly_rollups_aggregate_fanout_topic_into_landing_zone():
+    stack = AmzStreamConsumerStack(
+        core.App(), "NA", "us-east-1", {**DATASET_CONFIG["NA"][0], "hourlyRollups": True}, AMBASSADOR_CONFIG
+    )
+    template = assertions.Template.from_stack(stack)
+
+    template.resource_count_is("AWS::DynamoDB::Table", 2)
+    template.has_resource_properties("AWS::DynamoDB::Table", {"StreamSpecification": {"StreamViewType": "KEYS_ONLY"}})
+    template.has_resource_properties("AWS::SNS::Subscription", {"Protocol": "sqs", "RawMessageDelivery": True})
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        {"Handler": "rollup_lambda.handler", "Environment": {"Variables": {"DATA_SET_ID": "sp-traffic"}}},
+    )
+    template.has_resource_properties(
+        "AWS::Lambda::EventSourceMapping", {"BatchSize": 1000, "MaximumBatchingWindowInSeconds": 300}
+    )
+
+
+def test_hourly_rollups_require_known_metrics():
+    dataset_config = {"dataSetId": "budget-usage", "snsSourceArn": "arn:aws:sns:*", "hourlyRollups": True}
+    with pytest.raises(ValueError):
+        AmzStreamConsumerStack(core.App(), "NA", "us-east-1", dataset_config, AMBASSADOR_CONFIG)
+
+
+def test_container_ingress_consumer_replaces_fanout_event_source():
+    lambda_stack = AmzStreamConsumerStack(core.App(), "NA", "us-east-1", DATASET_CONFIG["NA"][0], AMBASSADOR_CONFIG)
+    container_stack = AmzStreamConsumerStack(
+        core.App(), "NA", "us-east-1", {**DATASET_CONFIG["NA"][0], "ingressConsumer": "container"}, AMBASSADOR_CONFIG
+    )
+    template = assertions.Template.from_stack(container_stack)
+
+    assertions.Template.from_stack(lambda_stack).resource_count_is("AWS::Lambda::EventSourceMapping", 2)
+    template.resource_count_is("AWS::Lambda::EventSourceMapping", 1)
+    template.has_resource_properties(
+        "AWS::IAM::Role",
+        {
+            "AssumeRolePolicyDocument": {
+                "Statement": [
+                    assertions.Match.object_like({"Principal": {"Service": "ecs-tasks.amazonaws.com"}}),
+                ]
+            }
+        },
+    )
+
+
+def test_kinesis_stack_forwards_ingress_to_data_stream():
+    dataset_config = {**DATASET_CONFIG["NA"][0], "kinesisShardCount": 4, "kinesisConsumers": ["analytics", "ml"]}
+    stack = AmzStreamConsumerStackKinesis(core.App(), "NA", "us-east-1", dataset_config, AMBASSADOR_CONFIG)
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties(
+        "AWS::Kinesis::Stream", {"ShardCount": 4, "StreamModeDetails": {"StreamMode": "PROVISIONED"}}
+    )
+    template.resource_count_is("AWS::Kinesis::StreamConsumer", 2)
+    template.has_resource_properties("AWS::Lambda::Function", {"Handler": "kinesis_forwarder_lambda.handler"})
+    template.has_resource_properties(
+        "AWS::Lambda::EventSourceMapping",
+        {"BatchSize": 500, "FunctionResponseTypes": ["ReportBatchItemFailures"]},
+    )
+    template.resource_count_is("AWS::SNS::Topic", 0)
+
+
+def test_kinesis_stack_defaults_to_on_demand_stream():
+    stack = AmzStreamConsumerStackKinesis(core.App(), "NA", "us-east-1", DATASET_CONFIG["NA"][0], AMBASSADOR_CONFIG)
+    assertions.Template.from_stack(stack).has_resource_properties(
+        "AWS::Kinesis::Stream", {"StreamModeDetails": {"StreamMode": "ON_DEMAND"}}
+    )
+
+
+def test_kinesis_is_a_supported_delivery_method():
+    validate_delivery_method("kinesis")
+    with pytest.raises(ValueError):
+        validate_delivery_method("kafka")
+
+
+def test_adaptive_concurrency_caps_fanout_event_source_and_schedules_controller():
+    dataset_config = {**DATASET_CONFIG["NA"][0], "adaptiveConcurrency": True, "fanoutMaxConcurrency": 20}
+    stack = AmzStreamConsumerStack(core.App(), "NA", "us-east-1", dataset_config, AMBASSADOR_CONFIG)
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {"ScalingConfig": {"MaximumConcurrency": 20}})
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        {
+            "Handler": "stream_fanout_lambda.handler",
+            "Environment": {
+                "Variables": assertions.Match.object_like(
+                    {"FANOUT_PUBLISH_METRICS": "1", "FANOUT_MAX_PUBLISH_RATE": "3000"}
+                )
+            },
+        },
+    )
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        {
+            "Handler": "concurrency_controller_lambda.handler",
+            "Environment": {"Variables": assertions.Match.object_like({"MAX_PUBLISH_LATENCY_MS": "500"})},
+        },
+    )
+    template.has_resource_properties("AWS::Events::Rule", {"ScheduleExpression": "rate(1 minute)"})
+
+
+def test_latency_canary_injects_into_ingress_queue_and_is_kept_from_consumers():
+    dataset_config = {**DATASET_CONFIG["NA"][0], "latencyCanary": True, "hourlyRollups": True}
+    stack = AmzStreamConsumerStack(core.App(), "NA", "us-east-1", dataset_config, AMBASSADOR_CONFIG)
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        {
+            "Handler": "latency_canary_lambda.handler",
+            "Environment": {
+                "Variables": assertions.Match.object_like({"INGRESS_QUEUE_URL": assertions.Match.any_value()})
+            },
+        },
+    )
+    template.has_resource_properties("AWS::Events::Rule", {"ScheduleExpression": "rate(5 minutes)"})
+    template.has_resource_properties(
+        "AWS::SNS::Subscription",
+        {"Protocol": "sqs", "FilterPolicy": {"amz_stream_canary": [{"exists": False}]}},
+    )
+
+
+def test_latency_canary_injects_into_firehose_without_ingress_queue():
+    dataset_config = {**DATASET_CONFIG["NA"][0], "latencyCanary": True}
+    ambassadors_config = {**AMBASSADOR_CONFIG, "subscriberRoleArn": "arn:aws:iam::926844853897:role/SubscriberRole"}
+    stack = AmzStreamConsumerStackFirehose(core.App(), "NA", "us-east-1", dataset_config, ambassadors_config)
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        {
+            "Handler": "latency_canary_lambda.handler",
+            "Environment": {
+                "Variables": assertions.Match.object_like({"DELIVERY_STREAM_NAME": assertions.Match.any_value()})
+            },
+        },
+    )
+
+
+def test_monitoring_alarms_use_config_thresholds_with_dataset_overrides():
+    dataset_config = {**DATASET_CONFIG["NA"][0], "monitoring": {"ingressQueueMaxAgeSeconds": 60}}
+    monitoring_config = {"ingressQueueMaxAgeSeconds": 600, "alarmTopicArn": "arn:aws:sns:us-east-1:000000000000:ops"}
+    stack = AmzStreamConsumerStack(core.App(), "NA", "us-east-1", dataset_config, AMBASSADOR_CONFIG, monitoring_config)
+    template = assertions.Template.from_stack(stack)
+
+    template.resource_count_is("AWS::CloudWatch::Alarm", 8)
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "MetricName": "ApproximateAgeOfOldestMessage",
+            "Threshold": 60,
+            "AlarmActions": ["arn:aws:sns:us-east-1:000000000000:ops"],
+        },
+    )
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {"MetricName": "DeliveryToS3.Success", "Threshold": 1, "ComparisonOperator": "LessThanThreshold"},
+    )
+    assertions.Template.from_stack(
+        AmzStreamConsumerStack(core.App(), "NA", "us-east-1", DATASET_CONFIG["NA"][0], AMBASSADOR_CONFIG)
+    ).resource_count_is("AWS::CloudWatch::Alarm", 0)
+
+
+def test_firehose_stack_monitors_landing_delivery():
+    ambassadors_config = {**AMBASSADOR_CONFIG, "subscriberRoleArn": "arn:aws:iam::926844853897:role/SubscriberRole"}
+    stack = AmzStreamConsumerStackFirehose(
+        core.App(), "NA", "us-east-1", DATASET_CONFIG["NA"][0], ambassadors_config, {}
+    )
+    template = assertions.Template.from_stack(stack)
+
+    template.resource_count_is("AWS::CloudWatch::Alarm", 2)
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm", {"MetricName": "DeliveryToS3.DataFreshness", "Threshold": 900}
+    )
+
+
+def test_rollout_creates_one_dashboard_per_region_when_monitoring_is_configured():
+    config = {
+        "ambassadors": AMBASSADOR_CONFIG,
+        "datasets": {"NA": [DATASET_CONFIG["NA"][0], {**DATASET_CONFIG["NA"][0], "dataSetId": "sp-conversion"}]},
+        "consumerStackInstallationAwsRegion": {"NA": "us-east-1"},
+        "monitoring": {"firehoseMaxFreshnessSeconds": 600},
+    }
+    app = core.App()
+    rollout_stacks(app, config, "sqs")
+    dashboard_stack = app.node.find_child("AmzStream-NA-Dashboard")
+    template = assertions.Template.from_stack(dashboard_stack)
+
+    template.resource_count_is("AWS::CloudWatch::Dashboard", 1)
+    template.has_resource_properties("AWS::CloudWatch::Dashboard", {"DashboardName": "AmzStream-NA"})
+
+    app = core.App()
+    rollout_stacks(app, {**config, "monitoring": None}, "sqs")
+    assert app.node.try_find_child("AmzStream-NA-Dashboard") is None
+
+
+def test_trace_sample_rate_turns_on_active_tracing():
+    dataset_config = {**DATASET_CONFIG["NA"][0], "traceSampleRate": 0.01}
+    stack = AmzStreamConsumerStack(core.App(), "NA", "us-east-1", dataset_config, AMBASSADOR_CONFIG)
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        {
+            "Handler": "stream_fanout_lambda.handler",
+            "TracingConfig": {"Mode": "Active"},
+            "Environment": {"Variables": assertions.Match.object_like({"TRACE_SAMPLE_RATE": "0.01"})},
+        },
+    )
+
+
+def test_fanout_and_firehose_settings_are_read_from_dataset_config():
+    dataset_config = {
+        **DATASET_CONFIG["NA"][0],
+        "fanoutBatchSize": 100,
+        "fanoutBatchingWindowSeconds": 1,
+        "fanoutMemoryMB": 256,
+        "firehoseBufferingIntervalSeconds": 900,
+        "firehoseBufferingSizeMB": 128,
+    }
+    stack = AmzStreamConsumerStack(core.App(), "NA", "us-east-1", dataset_config, AMBASSADOR_CONFIG)
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties(
+        "AWS::Lambda::EventSourceMapping", {"BatchSize": 100, "MaximumBatchingWindowInSeconds": 1}
+    )
+    template.has_resource_properties(
+        "AWS::Lambda::Function", {"Handler": "stream_fanout_lambda.handler", "MemorySize": 256}
+    )
+    template.has_resource_properties(
+        "AWS::KinesisFirehose::DeliveryStream",
+        {
+            "ExtendedS3DestinationConfiguration": assertions.Match.object_like(
+                {"BufferingHints": {"IntervalInSeconds": 900, "SizeInMBs": 128}}
+            )
+        },
+    )
+
+
+def test_ordered_delivery_uses_fifo_topic_and_queue_for_latest_state():
+    dataset_config = {
+        "dataSetId": "campaigns",
+        "snsSourceArn": "arn:aws:sns:us-east-1:570159413969:*",
+        "latestState": True,
+        "orderedDelivery": True,
+    }
+    stack = AmzStreamConsumerStack(core.App(), "NA", "us-east-1", dataset_config, AMBASSADOR_CONFIG)
+    template = assertions.Template.from_stack(stack)
+
+    template.resource_count_is("AWS::SNS::Topic", 2)
+    template.has_resource_properties("AWS::SNS::Topic", {"FifoTopic": True})
+    template.has_resource_properties("AWS::SQS::Queue", {"FifoQueue": True})
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        {
+            "Handler": "ordered_forwarder_lambda.handler",
+            "Environment": {"Variables": assertions.Match.object_like({"ORDERING_KEY_FIELDS": "campaignId"})},
+        },
+    )
+    # the fanout lambda only publishes to the standard topic, the forwarder queue is subscribed to it
+    fanout_lambda = template.find_resources(
+        "AWS::Lambda::Function", {"Properties": {"Handler": "stream_fanout_lambda.handler"}}
+    )
+    (fanout_environment,) = [resource["Properties"]["Environment"]["Variables"] for resource in fanout_lambda.values()]
+    assert "ORDERED_FANOUT_TOPIC_ARN" not in fanout_environment
+    with pytest.raises(ValueError):
+        AmzStreamConsumerStack(
+            core.App(), "NA", "us-east-1", {**DATASET_CONFIG["NA"][0], "orderedDelivery": True}, AMBASSADOR_CONFIG
+        )
+
+
+@pytest.mark.parametrize("stack_class", [AmzStreamConsumerStack, AmzStreamConsumerStackFirehose])
+def test_normalize_records_adds_firehose_transformation_lambda(stack_class):
+    dataset_config = {**DATASET_CONFIG["NA"][0], "normalizeRecords": True}
+    ambassadors_config = {**AMBASSADOR_CONFIG, "subscriberRoleArn": "arn:aws:iam::926844853897:role/SubscriberRole"}
+    stack = stack_class(core.App(), "NA", "us-east-1", dataset_config, ambassadors_config)
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        {
+            "Handler": "firehose_transform_lambda.handler",
+            "Environment": {"Variables": {"DATA_SET_ID": "sp-traffic"}},
+        },
+    )
+    template.has_resource_properties(
+        "AWS::KinesisFirehose::DeliveryStream",
+        {
+            "ExtendedS3DestinationConfiguration": assertions.Match.object_like(
+                {"ProcessingConfiguration": assertions.Match.object_like({"Enabled": True})}
+            )
+        },
+    )
+
+
+def test_records_are_not_normalized_by_default():
+    stack = AmzStreamConsumerStack(core.App(), "NA", "us-east-1", DATASET_CONFIG["NA"][0], AMBASSADOR_CONFIG)
+    template = assertions.Template.from_stack(stack)
+
+    assert not template.find_resources(
+        "AWS::Lambda::Function", {"Properties": {"Handler": "firehose_transform_lambda.handler"}}
+    )
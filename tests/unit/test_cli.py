@@ -0,0 +1,93 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+from typer.testing import CliRunner
+
+from amz_stream_cli import cli
+
+SUBSCRIPTIONS = [
+    {"subscriptionId": "amzn1.fead.2", "dataSetId": "sp-traffic", "status": "DELETED"},
+    {"subscriptionId": "amzn1.fead.1", "dataSetId": "sp-conversion", "status": "ACTIVE"},
+]
+
+
+class FakeStream:
+    payload = {}
+
+    def list_subscriptions(self, **kwargs):
+        return SimpleNamespace(payload=FakeStream.payload)
+
+    def get_subscription(self, subscription_id, **kwargs):
+        return SimpleNamespace(payload=FakeStream.payload)
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    monkeypatch.setattr(cli, "_stream", lambda api_region: FakeStream())
+    return CliRunner()
+
+
+def test_list_ndjson_writes_one_subscription_per_line(runner):
+    FakeStream.payload = {"subscriptions": SUBSCRIPTIONS}
+    result = runner.invoke(cli.app, ["list", "--output", "ndjson"])
+
+    assert result.exit_code == 0
+    assert [json.loads(line) for line in result.stdout.splitlines()] == SUBSCRIPTIONS
+
+
+def test_list_json_without_subscriptions_writes_empty_array(runner):
+    FakeStream.payload = {}
+    result = runner.invoke(cli.app, ["list", "-o", "json"])
+
+    assert result.exit_code == 0
+    assert json.loads(result.stdout) == []
+
+
+def test_get_json_writes_subscription(runner):
+    FakeStream.payload = {"subscription": SUBSCRIPTIONS[0]}
+    result = runner.invoke(cli.app, ["get", "-s", "amzn1.fead.2", "-o", "json"])
+
+    assert result.exit_code == 0
+    assert json.loads(result.stdout) == SUBSCRIPTIONS[0]
+
+
+def test_api_error_keeps_exit_code_in_json_mode(runner):
+    FakeStream.payload = {"message": "Throttled"}
+    result = runner.invoke(cli.app, ["get", "-s", "amzn1.fead.2", "-o", "json"])
+
+    assert result.exit_code == -1
+    assert result.stdout == ""
+
+
+def test_version_does_not_import_api_client_or_rich():
+    code = (
+        "import sys\n"
+        "from amz_stream_cli.__main__ import main\n"
+        "sys.argv = ['amz_stream_cli', '--version']\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted(m for m in ('ad_api', 'rich') if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.splitlines()[-1] == "[]"
@@ -0,0 +1,106 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import gzip
+import json
+import random
+from datetime import datetime, timedelta
+
+from amz_stream_cli import compaction, landing_zone
+from amz_stream_cli.object_store import LocalObjectStore, S3ObjectStore
+from tests.unit.local_aws import LocalS3
+
+PREFIX = landing_zone.partition_prefix("sp-traffic", datetime(2024, 5, 1, 22))
+
+
+def _land_small_objects(store, count, records_per_object=10, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        lines = [
+            json.dumps(
+                {"idempotency_id": f"{seed}-{i}-{j}", "time_window_start": f"2024-05-01T22:{rng.randint(0, 59):02}"}
+            )
+            for j in range(records_per_object)
+        ]
+        store.put_bytes(f"{PREFIX}AmzStream-firehose-{seed}-{i}", ("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def _compacted_records(store, manifest):
+    records = []
+    for entry in manifest["objects"]:
+        with store.open(entry["key"]) as f:
+            records.extend(json.loads(line) for line in gzip.decompress(f.read()).splitlines())
+    return records
+
+
+def test_compaction_merges_partition_into_sorted_objects_and_expires_originals(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    _land_small_objects(store, count=30)
+
+    manifest = compaction.PartitionCompactor(store, target_object_bytes=8 * 1024, sort_buffer_bytes=4 * 1024).compact(
+        PREFIX
+    )
+
+    records = _compacted_records(store, manifest)
+    assert manifest["records"] == len(records) == 300
+    assert len(manifest["objects"]) > 1
+    assert [r["time_window_start"] for r in records] == sorted(r["time_window_start"] for r in records)
+    assert sorted(summary["Key"] for summary in store.list(PREFIX)) == sorted(
+        [entry["key"] for entry in manifest["objects"]] + [compaction.manifest_key(PREFIX)]
+    )
+
+
+def test_compaction_is_incremental(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    compactor = compaction.PartitionCompactor(store)
+    _land_small_objects(store, count=5)
+    compactor.compact(PREFIX)
+
+    assert compactor.compact(PREFIX) is None
+
+    _land_small_objects(store, count=2, seed=1)
+    manifest = compactor.compact(PREFIX)
+
+    assert manifest["records"] == 70
+    assert len(_compacted_records(store, manifest)) == 70
+
+
+def test_interrupted_compaction_does_not_duplicate_records(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    _land_small_objects(store, count=5)
+    manifest = compaction.PartitionCompactor(store).compact(PREFIX)
+    # an original which was replaced but not deleted yet, and a compacted object which was never committed
+    store.put_bytes(manifest["replaced"][0], b'{"idempotency_id": "replaced"}\n')
+    store.put_bytes(f"{PREFIX}compacted-orphan-0000.ndjson.gz", gzip.compress(b'{"idempotency_id": "orphan"}\n'))
+
+    assert compaction.PartitionCompactor(store).compact(PREFIX) is None
+    assert len(_compacted_records(store, manifest)) == 50
+    assert len(list(store.list(PREFIX))) == len(manifest["objects"]) + 1
+
+
+def test_compaction_against_s3(tmp_path):
+    store = S3ObjectStore(LocalS3(), "landing-zone")
+    _land_small_objects(store, count=3)
+
+    manifest = compaction.PartitionCompactor(store).compact(PREFIX)
+
+    assert len(_compacted_records(store, manifest)) == 30
+    assert len(list(store.list(PREFIX))) == 2
+
+
+def test_closed_partition_hours_respects_grace_period():
+    hours = compaction.closed_partition_hours(timedelta(hours=3), now=datetime(2024, 5, 1, 12, 10))
+
+    assert hours == [datetime(2024, 5, 1, 8), datetime(2024, 5, 1, 9), datetime(2024, 5, 1, 10)]
@@ -0,0 +1,125 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+
+import pytest
+
+import entity_state_lambda
+import record_normalization
+from amz_stream_cli.entity_state import EntityStateStore
+
+
+class ConditionalCheckFailedException(Exception):
+    pass
+
+
+class LocalStateTable:
+    """Stand-in for the latest state table, evaluating the version condition of entity_state_lambda."""
+
+    class exceptions:
+        ConditionalCheckFailedException = ConditionalCheckFailedException
+
+    def __init__(self):
+        self.items = {}
+
+    def put_item(self, TableName, Item, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues):
+        current = self.items.get(Item["entityId"]["S"])
+        if current is not None and int(current["version"]["N"]) >= int(ExpressionAttributeValues[":version"]["N"]):
+            raise ConditionalCheckFailedException()
+        self.items[Item["entityId"]["S"]] = Item
+
+    def get_item(self, TableName, Key):
+        item = self.items.get(Key["entityId"]["S"])
+        return {"Item": item} if item else {}
+
+    def batch_get_item(self, RequestItems):
+        ((table_name, request),) = RequestItems.items()
+        items = [self.items[key["entityId"]["S"]] for key in request["Keys"] if key["entityId"]["S"] in self.items]
+        return {"Responses": {table_name: items}, "UnprocessedKeys": {}}
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = LocalStateTable()
+    monkeypatch.setattr(entity_state_lambda.aws_clients, "dynamodb_client", table)
+    monkeypatch.setenv("ENTITY_STATE_TABLE_NAME", "state")
+    monkeypatch.setenv("ENTITY_ID_FIELD", "campaignId")
+    return table
+
+
+def _event(*records):
+    return {"Records": [{"messageId": str(i), "body": json.dumps(record)} for i, record in enumerate(records)]}
+
+
+def test_out_of_order_updates_keep_latest_version(table):
+    result = entity_state_lambda.handler(
+        _event(
+            {"campaignId": "1", "version": 2, "state": "PAUSED"},
+            {"campaignId": "1", "version": 3, "state": "ENABLED"},
+            {"campaignId": "1", "version": 1, "state": "ENABLED"},
+            {"campaignId": "2", "version": 1, "state": "ARCHIVED"},
+        ),
+        None,
+    )
+
+    assert result == {"batchItemFailures": []}
+    store = EntityStateStore(table, "state")
+    assert store.get("1")["version"] == 3
+    assert {entity_id: state["state"] for entity_id, state in store.get_many(["1", "2", "3"]).items()} == {
+        "1": "ENABLED",
+        "2": "ARCHIVED",
+    }
+
+
+def test_update_time_orders_records_without_version(table):
+    entity_state_lambda.handler(
+        _event(
+            {"campaignId": "1", "audit": {"lastUpdatedDateTime": "2024-05-01T10:00:00Z"}, "name": "new"},
+            {"campaignId": "1", "audit": {"lastUpdatedDateTime": "2024-05-01T09:00:00Z"}, "name": "old"},
+        ),
+        None,
+    )
+
+    assert EntityStateStore(table, "state").get("1")["name"] == "new"
+
+
+def test_records_flattened_by_normalization_are_ordered_by_update_time(table):
+    records = [
+        {"campaignId": "1", "audit": {"lastUpdatedDateTime": "2024-05-01T10:00:00Z"}, "name": "new"},
+        {"campaignId": "1", "audit": {"lastUpdatedDateTime": "2024-05-01T09:00:00Z"}, "name": "old"},
+    ]
+
+    result = entity_state_lambda.handler(_event(*[record_normalization.flatten(record) for record in records]), None)
+
+    assert result == {"batchItemFailures": []}
+    assert EntityStateStore(table, "state").get("1")["name"] == "new"
+
+
+def test_records_without_entity_id_are_reported_as_failures(table):
+    result = entity_state_lambda.handler(_event({"version": 1}), None)
+
+    assert result == {"batchItemFailures": [{"itemIdentifier": "0"}]}
+
+
+def test_fifo_queue_messages_after_a_failure_are_reported_as_failures(table):
+    event = _event({"campaignId": "1", "version": 1}, {"version": 1}, {"campaignId": "2", "version": 1})
+    for record in event["Records"]:
+        record["eventSourceARN"] = "arn:aws:sqs:us-east-1:000000000000:latest-state.fifo"
+
+    result = entity_state_lambda.handler(event, None)
+
+    assert result == {"batchItemFailures": [{"itemIdentifier": "1"}, {"itemIdentifier": "2"}]}
+    assert EntityStateStore(table, "state").get("2") is None
@@ -0,0 +1,119 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import base64
+import json
+
+import canary
+import firehose_transform_lambda
+from record_normalization import flatten, normalizer_for
+
+TRAFFIC = {
+    "idempotency_id": "id-1",
+    "dataset_id": "sp-traffic",
+    "marketplace_id": "ATVPDKIKX0DER",
+    "advertiser_id": "ENTITY1ABCDEFGHIJK",
+    "campaign_id": 100001,
+    "time_window_start": "2024-05-01T22:00:00.000Z",
+    "impressions": "120",
+    "clicks": 3,
+    "cost": "1.26",
+}
+
+
+def firehose_record(record_id, *records):
+    data = "".join(record if isinstance(record, str) else json.dumps(record) + "\n" for record in records)
+    return {"recordId": record_id, "data": base64.b64encode(data.encode("utf-8")).decode("ascii")}
+
+
+def decoded_lines(record):
+    return [json.loads(line) for line in base64.b64decode(record["data"]).splitlines()]
+
+
+def test_flatten_joins_nested_keys_and_keeps_lists():
+    record = {"campaignId": "1", "budget": {"budget": 10, "policy": {"type": "daily"}}, "tags": [{"a": 1}]}
+
+    assert flatten(record) == {
+        "campaignId": "1",
+        "budget_budget": 10,
+        "budget_policy_type": "daily",
+        "tags": [{"a": 1}],
+    }
+
+
+def test_normalizer_casts_schema_fields_to_their_type():
+    record, problem = normalizer_for("sp-traffic")(dict(TRAFFIC))
+
+    assert problem is None
+    assert record["campaign_id"] == "100001"
+    assert record["impressions"] == 120
+    assert record["cost"] == 1.26
+
+
+def test_normalizer_rejects_values_which_can_not_be_cast():
+    record, problem = normalizer_for("sp-traffic")({**TRAFFIC, "clicks": "many"})
+
+    assert record is None
+    assert problem == "field clicks is not a number"
+    assert normalizer_for("sp-traffic")({**TRAFFIC, "cost": "nan"})[1] == "field cost is not a number"
+
+
+def test_handler_normalizes_every_record_of_a_batch(monkeypatch):
+    monkeypatch.setattr(firehose_transform_lambda, "DATA_SET_ID", "sp-traffic")
+    event = {
+        "records": [
+            firehose_record("1", TRAFFIC),
+            firehose_record("2", {**TRAFFIC, "idempotency_id": "id-2"}, {**TRAFFIC, "idempotency_id": "id-3"}),
+        ]
+    }
+
+    result = firehose_transform_lambda.handler(event, None)["records"]
+
+    assert [record["result"] for record in result] == ["Ok", "Ok"]
+    assert [line["idempotency_id"] for line in decoded_lines(result[1])] == ["id-2", "id-3"]
+    assert decoded_lines(result[0])[0]["impressions"] == 120
+    assert base64.b64decode(result[0]["data"]).endswith(b"\n")
+
+
+def test_unparseable_and_invalid_records_fail_processing_unchanged():
+    invalid = firehose_record("1", {**TRAFFIC, "impressions": None})
+    unparseable = firehose_record("2", TRAFFIC, "{not json\n")
+
+    result = firehose_transform_lambda.transform_records([invalid, unparseable], "sp-traffic")
+
+    assert result == [
+        {"recordId": "1", "result": "ProcessingFailed", "data": invalid["data"]},
+        {"recordId": "2", "result": "ProcessingFailed", "data": unparseable["data"]},
+    ]
+
+
+def test_empty_records_are_dropped_and_canaries_kept():
+    probe = canary.new_canary("sp-traffic", 1000)
+
+    result = firehose_transform_lambda.transform_records(
+        [firehose_record("1", "\n"), firehose_record("2", probe)], "sp-traffic"
+    )
+
+    assert result[0]["result"] == "Dropped"
+    assert result[1]["result"] == "Ok"
+    assert decoded_lines(result[1]) == [probe]
+
+
+def test_datasets_without_schema_are_only_flattened():
+    result = firehose_transform_lambda.transform_records(
+        [firehose_record("1", {"id": 1, "detail": {"kind": "click"}})], "sb-clickstream"
+    )
+
+    assert decoded_lines(result[0]) == [{"id": 1, "detail_kind": "click"}]
@@ -0,0 +1,90 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from amz_stream_cli import health
+from amz_stream_cli.stack_config import consumer_stacks
+from tests.unit.local_aws import LocalCloudFormation, LocalCloudWatch, LocalSqs
+
+CONFIG = {
+    "datasets": {
+        "NA": [{"dataSetId": "sp-traffic"}, {"dataSetId": "sp-conversion"}],
+        "EU": [{"dataSetId": "sp-traffic"}],
+    },
+    "consumerStackInstallationAwsRegion": {"NA": "us-east-1", "EU": "eu-west-1"},
+}
+
+THRESHOLDS = health.HealthThresholds(max_age_s=300, max_messages=100, max_dlq_messages=0)
+
+
+def _queue_resources(sqs, stack_name):
+    return [
+        {
+            "LogicalResourceId": logical_id,
+            "ResourceType": "AWS::SQS::Queue",
+            "PhysicalResourceId": sqs.create_queue(f"{stack_name}-{logical_id}"),
+        }
+        for logical_id in ("IngressQueue26236266", "IngressDlq7B3C4F0A", "FanoutSubsConfirmationQueue1A2B3C4D")
+    ] + [{"LogicalResourceId": "FanoutLambda", "ResourceType": "AWS::Lambda::Function", "PhysicalResourceId": "fn"}]
+
+
+def _local_clients(sqs, cloudformation, cloudwatch):
+    return lambda service, region: {"sqs": sqs, "cloudformation": cloudformation, "cloudwatch": cloudwatch}[service]
+
+
+def test_consumer_stacks_filters_by_region_and_dataset():
+    stacks = consumer_stacks(CONFIG, advertising_regions=["NA"], data_set_ids=["sp-traffic"])
+
+    assert [(stack.stack_name, stack.installation_region) for stack in stacks] == [
+        ("AmzStream-NA-sp-traffic", "us-east-1")
+    ]
+
+
+def test_pipeline_health_reports_lagging_queues_first_and_skips_missing_stacks():
+    sqs = LocalSqs()
+    cloudformation = LocalCloudFormation(
+        {name: _queue_resources(sqs, name) for name in ("AmzStream-NA-sp-traffic", "AmzStream-NA-sp-conversion")}
+    )
+    lagging_queue = "AmzStream-NA-sp-conversion-IngressQueue26236266"
+    cloudwatch = LocalCloudWatch({lagging_queue: 900.0})
+    for _ in range(3):
+        sqs.send_message(f"https://sqs.local/000000000000/{lagging_queue}", "{}")
+
+    report = health.pipeline_health(consumer_stacks(CONFIG), _local_clients(sqs, cloudformation, cloudwatch))
+
+    assert len(report) == 6
+    assert report[0].queue.queue_name == lagging_queue
+    assert report[0].messages == 3
+    assert report[0].oldest_message_age_s == 900.0
+    assert {queue_health.queue.role for queue_health in report} == {
+        health.QueueRole.ingress,
+        health.QueueRole.ingress_dlq,
+        health.QueueRole.confirmation,
+    }
+
+
+def test_threshold_breaches_flags_old_messages_and_dlq_depth():
+    sqs = LocalSqs()
+    cloudformation = LocalCloudFormation({"AmzStream-NA-sp-traffic": _queue_resources(sqs, "AmzStream-NA-sp-traffic")})
+    cloudwatch = LocalCloudWatch({"AmzStream-NA-sp-traffic-IngressQueue26236266": 301.0})
+    sqs.send_message("https://sqs.local/000000000000/AmzStream-NA-sp-traffic-IngressDlq7B3C4F0A", "{}")
+
+    report = health.pipeline_health(
+        consumer_stacks(CONFIG, data_set_ids=["sp-traffic"]), _local_clients(sqs, cloudformation, cloudwatch)
+    )
+    breaches = health.threshold_breaches(report, THRESHOLDS)
+
+    assert len(breaches) == 2
+    assert "oldest message is 301s old" in breaches[0]
+    assert "1 messages in DLQ" in breaches[1]
@@ -0,0 +1,115 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import threading
+import time
+
+import pytest
+
+import ingress_consumer_daemon
+import stream_fanout_lambda
+from tests.unit.local_aws import LocalSns, LocalSqs
+
+
+class FlakySns(LocalSns):
+    """Fails the publication of records marked with "fail"."""
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        failing = [entry for entry in PublishBatchRequestEntries if '"fail": true' in entry["Message"]]
+        super().publish_batch(TopicArn, [entry for entry in PublishBatchRequestEntries if entry not in failing])
+        return {"Failed": [{"Id": entry["Id"], "Code": "InternalError"} for entry in failing]}
+
+
+def _traffic(idempotency_id, **overrides):
+    record = {
+        "idempotency_id": idempotency_id,
+        "dataset_id": "sp-traffic",
+        "marketplace_id": "ATVPDKIKX0DER",
+        "advertiser_id": "ADV1",
+        "campaign_id": "C1",
+        "time_window_start": "2024-05-01T22:00:00.000Z",
+        "impressions": 10,
+        "clicks": 1,
+        "cost": 0.5,
+    }
+    record.update(overrides)
+    return record
+
+
+@pytest.fixture
+def local_aws(monkeypatch):
+    sns, sqs = FlakySns(), LocalSqs()
+    monkeypatch.setattr(stream_fanout_lambda.aws_clients, "sns_client", sns)
+    monkeypatch.setattr(stream_fanout_lambda.aws_clients, "sqs_client", sqs)
+    monkeypatch.setenv("DATA_SET_ID", "sp-traffic")
+    monkeypatch.setenv("DATA_FANOUT_TOPIC_ARN", "arn:aws:sns:us-east-1:000000000000:fanout")
+    monkeypatch.setenv("SUBSCRIPTION_CONFIRMATION_QUEUE_URL", sqs.create_queue("confirmation"))
+    monkeypatch.setenv("QUARANTINE_QUEUE_URL", sqs.create_queue("quarantine"))
+    return sns, sqs
+
+
+def test_consumer_routes_deletes_processed_and_keeps_failed_messages(local_aws):
+    sns, sqs = local_aws
+    ingress_url = sqs.create_queue("ingress")
+    for i in range(45):
+        sqs.send_message(ingress_url, json.dumps(_traffic(str(i))))
+    sqs.send_message(ingress_url, json.dumps({"Type": "SubscriptionConfirmation", "Token": "t"}))
+    sqs.send_message(ingress_url, json.dumps(_traffic("bad", clicks="1")))
+    sqs.send_message(ingress_url, json.dumps(_traffic("failing", fail=True)))
+
+    consumer = ingress_consumer_daemon.IngressConsumer(
+        sqs, ingress_url, stream_fanout_lambda.on_entire_batch, receivers=4, wait_time_s=1
+    )
+    stop_event = threading.Event()
+    runner = threading.Thread(target=consumer.run, args=(stop_event,))
+    runner.start()
+    deadline = time.monotonic() + 10
+    while consumer.stats["received"] < 48 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stop_event.set()
+    runner.join(timeout=10)
+
+    assert not runner.is_alive()
+    assert consumer.stats == {"received": 48, "deleted": 47, "failed": 1}
+    assert sorted(json.loads(entry["Message"])["idempotency_id"] for entry in sns.published) == sorted(
+        str(i) for i in range(45)
+    )
+    assert len(sqs.queues["https://sqs.local/000000000000/confirmation"]["visible"]) == 1
+    assert len(sqs.queues["https://sqs.local/000000000000/quarantine"]["visible"]) == 1
+    # the failed message is not deleted, it becomes visible again after the visibility timeout
+    assert [
+        json.loads(message["Body"])["idempotency_id"] for message in sqs.queues[ingress_url]["in_flight"].values()
+    ] == ["failing"]
+
+
+def test_visibility_is_extended_only_for_batches_close_to_timeout():
+    sqs = LocalSqs()
+    now = [0.0]
+    extender = ingress_consumer_daemon.VisibilityExtender(sqs, "queue", 60, 15, clock=lambda: now[0])
+    slow = extender.track(["rh-1", "rh-2"])
+    now[0] = 30.0
+    extender.track(["rh-3"])
+
+    now[0] = 40.0
+    assert extender.extend_due() == 0
+    now[0] = 46.0
+    assert extender.extend_due() == 2
+    assert [entry["ReceiptHandle"] for entry in sqs.visibility_changes] == ["rh-1", "rh-2"]
+    assert {entry["VisibilityTimeout"] for entry in sqs.visibility_changes} == {60}
+
+    extender.release(slow)
+    now[0] = 80.0
+    assert extender.extend_due() == 1
@@ -0,0 +1,155 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import itertools
+import json
+
+import pytest
+
+import kinesis_forwarder_lambda
+from amz_stream_cli.kinesis_consumer import KinesisStreamConsumer
+from tests.unit.local_aws import LocalKinesis, LocalSqs
+
+
+def _traffic(idempotency_id, advertiser_id):
+    return {
+        "idempotency_id": idempotency_id,
+        "dataset_id": "sp-traffic",
+        "marketplace_id": "ATVPDKIKX0DER",
+        "advertiser_id": advertiser_id,
+        "campaign_id": "C1",
+        "time_window_start": "2024-05-01T22:00:00.000Z",
+        "impressions": 10,
+        "clicks": 1,
+        "cost": 0.5,
+    }
+
+
+def _event(records):
+    return {"Records": [{"messageId": str(i), "body": json.dumps(record)} for i, record in enumerate(records)]}
+
+
+@pytest.fixture
+def local_aws(monkeypatch):
+    kinesis, sqs = LocalKinesis(), LocalSqs()
+    monkeypatch.setattr(kinesis_forwarder_lambda.aws_clients, "kinesis_client", kinesis)
+    monkeypatch.setattr(kinesis_forwarder_lambda.aws_clients, "sqs_client", sqs)
+    monkeypatch.setenv("DATA_SET_ID", "sp-traffic")
+    monkeypatch.setenv("KINESIS_STREAM_NAME", "stream")
+    monkeypatch.setenv("SUBSCRIPTION_CONFIRMATION_QUEUE_URL", sqs.create_queue("confirmation"))
+    monkeypatch.setenv("QUARANTINE_QUEUE_URL", sqs.create_queue("quarantine"))
+    return kinesis, sqs
+
+
+def test_records_are_aggregated_per_advertiser_and_read_in_order(local_aws):
+    kinesis, sqs = local_aws
+    records = [_traffic(str(i), f"ADV{i % 3}") for i in range(300)]
+    messages = _event(records)
+    messages["Records"].append({"messageId": "confirmation", "body": json.dumps({"Type": "SubscriptionConfirmation"})})
+
+    assert kinesis_forwarder_lambda.handler(messages, None) == {"batchItemFailures": []}
+
+    # 300 records of 3 advertisers are packed into a handful of Kinesis records put in a single request
+    assert len(kinesis.put_requests) == 1
+    assert kinesis.put_requests[0] < 30
+    assert len(sqs.queues["https://sqs.local/000000000000/confirmation"]["visible"]) == 1
+
+    for consumer_arn in (None, "arn:aws:kinesis:us-east-1:000000000000:stream/stream/consumer/analytics:1"):
+        consumer = KinesisStreamConsumer(kinesis, "stream-arn", consumer_arn, sleep=lambda s: None)
+        read = []
+        for shard_id in consumer.shard_ids():
+            shard_records = sum(len(kinesis_record["Data"].splitlines()) for kinesis_record in kinesis.shards[shard_id])
+            read.extend(itertools.islice(consumer.read_shard(shard_id), shard_records))
+        for advertiser_id in ("ADV0", "ADV1", "ADV2"):
+            ids = [r.record["idempotency_id"] for r in read if r.record["advertiser_id"] == advertiser_id]
+            assert ids == [record["idempotency_id"] for record in records if record["advertiser_id"] == advertiser_id]
+        assert len(read) == 300
+
+
+def test_resuming_after_a_checkpoint_skips_read_records(local_aws):
+    kinesis, _ = local_aws
+    kinesis_forwarder_lambda.handler(_event([_traffic(str(i), "ADV1") for i in range(10)]), None)
+    kinesis_forwarder_lambda.handler(_event([_traffic(str(i), "ADV1") for i in range(10, 15)]), None)
+    (shard_id,) = [shard_id for shard_id, shard in kinesis.shards.items() if shard]
+
+    consumer = KinesisStreamConsumer(kinesis, "stream-arn", "consumer-arn")
+    first = next(consumer.read_shard(shard_id))
+    resumed = list(itertools.islice(consumer.read_shard(shard_id, after_sequence_number=first.sequence_number), 5))
+
+    assert [r.record["idempotency_id"] for r in resumed] == ["10", "11", "12", "13", "14"]
+
+
+def test_resuming_within_an_aggregate_reads_the_rest_of_it(local_aws):
+    kinesis, _ = local_aws
+    kinesis_forwarder_lambda.handler(_event([_traffic(str(i), "ADV1") for i in range(10)]), None)
+    kinesis_forwarder_lambda.handler(_event([_traffic(str(i), "ADV1") for i in range(10, 12)]), None)
+    (shard_id,) = [shard_id for shard_id, shard in kinesis.shards.items() if shard]
+
+    for consumer_arn in (None, "consumer-arn"):
+        consumer = KinesisStreamConsumer(kinesis, "stream-arn", consumer_arn, sleep=lambda s: None)
+        checkpoint = list(itertools.islice(consumer.read_shard(shard_id), 4))[-1]
+        assert (checkpoint.sub_sequence, checkpoint.is_last) == (3, False)
+
+        resumed = list(
+            itertools.islice(
+                consumer.read_shard(
+                    shard_id,
+                    after_sequence_number=checkpoint.sequence_number,
+                    after_sub_sequence=checkpoint.sub_sequence,
+                ),
+                8,
+            )
+        )
+
+        assert [r.record["idempotency_id"] for r in resumed] == [str(i) for i in range(4, 12)]
+        assert [r.is_last for r in resumed] == [False] * 5 + [True, False, True]
+
+
+def test_throttled_records_are_retried_and_reported_when_retries_run_out(local_aws):
+    kinesis, _ = local_aws
+    records = [_traffic(str(i), f"ADV{i}") for i in range(4)]
+
+    kinesis.throttled = 2
+    failed = kinesis_forwarder_lambda.put_aggregates(
+        kinesis, "stream", kinesis_forwarder_lambda.aggregate(_event(records)["Records"]), sleep=lambda s: None
+    )
+    assert failed == []
+    assert kinesis.put_requests == [4, 2]
+
+    kinesis.throttled = 100
+    result = kinesis_forwarder_lambda.handler(_event(records[:2]), None)
+    assert result == {"batchItemFailures": [{"itemIdentifier": "0"}, {"itemIdentifier": "1"}]}
+
+
+def test_retried_records_are_followed_again_by_the_later_records_of_their_advertiser(local_aws, monkeypatch):
+    kinesis, _ = local_aws
+    records = [_traffic(str(i), "ADV1") for i in range(3)]
+    aggregates = kinesis_forwarder_lambda.aggregate(_event(records)["Records"], target_bytes=1)
+
+    kinesis.throttled = 1
+    assert kinesis_forwarder_lambda.put_aggregates(kinesis, "stream", aggregates, sleep=lambda s: None) == []
+    assert kinesis.put_requests == [3, 3]
+    (shard,) = [shard for shard in kinesis.shards.values() if shard]
+    assert [json.loads(record["Data"])["idempotency_id"] for record in shard[-3:]] == ["0", "1", "2"]
+
+    # an aggregate which still fails holds back the later aggregates of its advertiser in the following requests
+    monkeypatch.setattr(kinesis_forwarder_lambda, "MAX_PUT_RECORDS", 1)
+    records = [_traffic("a1", "ADV1"), _traffic("b1", "ADV2"), _traffic("a2", "ADV1")]
+    kinesis.throttled, kinesis.put_requests = 3, []
+    aggregates = kinesis_forwarder_lambda.aggregate(_event(records)["Records"], target_bytes=1)
+    failed = kinesis_forwarder_lambda.put_aggregates(kinesis, "stream", aggregates, sleep=lambda s: None)
+    assert kinesis.put_requests == [1, 1, 1, 1]
+    assert [message["messageId"] for message in failed] == ["0", "2"]
+    assert not any(b'"a2"' in record["Data"] for record in shard)
@@ -0,0 +1,125 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import canary
+import latency_canary_lambda
+import stream_fanout_lambda
+from tests.unit.local_aws import LocalS3, LocalSns, LocalSqs
+
+BUCKET = "landing-zone"
+
+
+class LocalFirehose:
+    def __init__(self):
+        self.records = []
+
+    def put_record(self, DeliveryStreamName, Record):
+        self.records.append(Record["Data"])
+        return {"RecordId": str(len(self.records))}
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    s3, sqs, sns, firehose = LocalS3(), LocalSqs(), LocalSns(), LocalFirehose()
+    for name, client in (("s3_client", s3), ("sqs_client", sqs), ("sns_client", sns), ("firehose_client", firehose)):
+        monkeypatch.setattr(latency_canary_lambda.aws_clients, name, client)
+    monkeypatch.setenv("DATA_SET_ID", "sp-traffic")
+    monkeypatch.setenv("LANDING_BUCKET_NAME", BUCKET)
+    monkeypatch.setenv("DATA_FANOUT_TOPIC_ARN", "arn:aws:sns:us-east-1:000000000000:fanout")
+    monkeypatch.setenv("SUBSCRIPTION_CONFIRMATION_QUEUE_URL", sqs.create_queue("confirmation"))
+    monkeypatch.setenv("QUARANTINE_QUEUE_URL", sqs.create_queue("quarantine"))
+    return s3, sqs, sns, firehose
+
+
+def _land(s3, bodies):
+    """Writes bodies to the landing zone the way the StreamLanding Firehose does"""
+    prefix = datetime.now(timezone.utc).strftime("sp-traffic/year=%Y/month=%m/day=%d/hour=%H/")
+    key = f"{prefix}landing-{len(s3.objects)}"
+    s3.put_object(Bucket=BUCKET, Key=key, Body="".join(body + "\n" for body in bodies))
+
+
+def test_canary_is_followed_from_ingress_queue_through_fanout_to_landing_zone(clients, monkeypatch, capsys):
+    s3, sqs, sns, _ = clients
+    ingress_queue_url = sqs.create_queue("ingress")
+    monkeypatch.setenv("INGRESS_QUEUE_URL", ingress_queue_url)
+
+    assert latency_canary_lambda.handler({}, None) == {"landed": 0, "lost": 0, "pending": 1}
+    injected = sqs.receive_message(QueueUrl=ingress_queue_url, MaxNumberOfMessages=10)["Messages"]
+    assert len(injected) == 1
+
+    # not validated as a sp-traffic record, published for the landing zone subscription only
+    response = stream_fanout_lambda.handler({"Records": [{"messageId": "m1", "body": injected[0]["Body"]}]}, None)
+    assert response == {"batchItemFailures": []}
+    assert len(sns.published) == 1
+    assert "amz_stream_canary" in sns.published[0]["MessageAttributes"]
+    landed_record = json.loads(sns.published[0]["Message"])
+    assert landed_record["fanoutAt"] >= landed_record["injectedAt"]
+    assert "IngressLatencyMs" in capsys.readouterr().out
+
+    _land(s3, [json.dumps({"idempotency_id": "a"}), sns.published[0]["Message"].rstrip("\n")])
+    assert latency_canary_lambda.handler({}, None) == {"landed": 1, "lost": 0, "pending": 1}
+    metrics = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert metrics["_aws"]["CloudWatchMetrics"][0]["Namespace"] == canary.METRICS_NAMESPACE
+    assert len(metrics["TotalLatencyMs"]) == len(metrics["DeliveryLatencyMs"]) == 1
+    assert metrics["LostCanaries"] == 0
+
+
+def test_canary_goes_to_firehose_without_ingress_queue_and_is_lost_after_timeout(clients, monkeypatch, capsys):
+    s3, _, _, firehose = clients
+    monkeypatch.setenv("DELIVERY_STREAM_NAME", "landing")
+    monkeypatch.setenv("CANARY_TIMEOUT_SECONDS", "0")
+
+    latency_canary_lambda.handler({}, None)
+    record = json.loads(firehose.records[0])
+    assert canary.is_canary(record) and record["dataset_id"] == "sp-traffic"
+
+    assert latency_canary_lambda.handler({}, None) == {"landed": 0, "lost": 1, "pending": 1}
+    assert json.loads(capsys.readouterr().out.strip().splitlines()[-1])["LostCanaries"] == 1
+    state = json.loads(s3.objects[(BUCKET, latency_canary_lambda.state_key("sp-traffic"))])
+    assert [entry["id"] for entry in state["pending"]] == [json.loads(firehose.records[1])["amz_stream_canary"]]
+
+
+def test_compacted_objects_are_not_searched():
+    assert latency_canary_lambda._is_delivered_object("sp-traffic/year=2024/month=05/day=01/hour=22/landing-1")
+    assert not latency_canary_lambda._is_delivered_object(
+        "sp-traffic/year=2024/month=05/day=01/hour=22/_compacted.json"
+    )
+    assert not latency_canary_lambda._is_delivered_object("sp-traffic/year=2024/month=05/day=01/hour=22/compacted-1.gz")
+
+
+def test_search_streams_recent_objects_and_stops_once_every_canary_is_found(clients):
+    s3 = clients[0]
+    prefix = datetime.now(timezone.utc).strftime("sp-traffic/year=%Y/month=%m/day=%d/hour=%H/")
+    s3.put_object(Bucket=BUCKET, Key=prefix + "landing-0", Body=json.dumps({"amz_stream_canary": "old"}) + "\n")
+    s3.put_object(Bucket=BUCKET, Key=prefix + "landing-1", Body=json.dumps({"amz_stream_canary": "c1"}) + "\n")
+    s3.put_object(Bucket=BUCKET, Key=prefix + "landing-2", Body=json.dumps({"amz_stream_canary": "c2"}) + "\n")
+    s3.last_modified[(BUCKET, prefix + "landing-0")] = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    read = []
+    get_object = s3.get_object
+    s3.get_object = lambda Bucket, Key: read.append(Key) or get_object(Bucket=Bucket, Key=Key)
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+
+    landed = latency_canary_lambda.find_landed(BUCKET, "sp-traffic", [{"id": "c1"}], now_ms - 60000, now_ms)
+
+    assert [record["amz_stream_canary"] for record, _ in landed] == ["c1"]
+    assert read == [prefix + "landing-1"]
+
+
+def test_missing_state_starts_without_pending_canaries(clients):
+    assert latency_canary_lambda.load_state(BUCKET, "sp-traffic") == {"checkedAt": None, "pending": []}
@@ -0,0 +1,77 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+
+import pytest
+
+import ordered_forwarder_lambda
+from tests.unit.local_aws import LocalSns
+
+
+class RejectingSns(LocalSns):
+    """Rejects the entries whose message contains `rejected`."""
+
+    def __init__(self, rejected):
+        super().__init__()
+        self.rejected = rejected
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        failed = [entry for entry in PublishBatchRequestEntries if self.rejected in entry["Message"]]
+        super().publish_batch(TopicArn, [entry for entry in PublishBatchRequestEntries if entry not in failed])
+        return {"Failed": [{"Id": entry["Id"], "Code": "InternalError", "SenderFault": False} for entry in failed]}
+
+
+@pytest.fixture
+def forwarder(monkeypatch):
+    sns = RejectingSns(rejected='"C3"')
+    monkeypatch.setattr(ordered_forwarder_lambda.aws_clients, "sns_client", sns)
+    monkeypatch.setenv("ORDERED_FANOUT_TOPIC_ARN", "arn:aws:sns:us-east-1:000000000000:ordered.fifo")
+    monkeypatch.setenv("ORDERING_KEY_FIELDS", "campaignId")
+    return sns
+
+
+def _event(bodies, first_id=0):
+    # raw delivery from the data fanout topic keeps the newline records are published with
+    return {"Records": [{"messageId": str(first_id + i), "body": body + "\n"} for i, body in enumerate(bodies)]}
+
+
+def test_records_are_forwarded_to_the_fifo_topic_grouped_by_entity(forwarder):
+    bodies = [
+        json.dumps({"advertiserId": "A", "marketplaceId": "M", "campaignId": campaign_id, "version": version})
+        for campaign_id, version in (("C1", 1), ("C2", 1), ("C1", 2))
+    ]
+
+    assert ordered_forwarder_lambda.handler(_event(bodies), None) == {"batchItemFailures": []}
+    # a redelivered record gets the same deduplication id
+    ordered_forwarder_lambda.handler(_event(bodies[:1], first_id=3), None)
+
+    ordered = forwarder.published
+    assert [(entry["MessageGroupId"], json.loads(entry["Message"])["version"]) for entry in ordered] == [
+        ("C1", 1),
+        ("C2", 1),
+        ("C1", 2),
+        ("C1", 1),
+    ]
+    assert [entry["Message"] for entry in ordered[:3]] == [body + "\n" for body in bodies]
+    assert ordered[0]["MessageDeduplicationId"] == ordered[3]["MessageDeduplicationId"]
+    assert len({entry["MessageDeduplicationId"] for entry in ordered[:3]}) == 3
+
+
+def test_only_records_rejected_by_the_fifo_topic_are_retried(forwarder):
+    bodies = [json.dumps({"campaignId": campaign_id, "version": 1}) for campaign_id in ("C1", "C3", "C2")]
+
+    assert ordered_forwarder_lambda.handler(_event(bodies), None) == {"batchItemFailures": [{"itemIdentifier": "1"}]}
+    assert [entry["MessageGroupId"] for entry in forwarder.published] == ["C1", "C2"]
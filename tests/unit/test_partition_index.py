@@ -0,0 +1,87 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import landing_zone_index_lambda
+from amz_stream_cli.partition_index import PartitionIndex
+from tests.unit.local_aws import LocalDynamoDb, LocalS3
+
+BUCKET = "landing-zone"
+
+
+def _event(event_name, key):
+    return {"Records": [{"eventName": event_name, "s3": {"bucket": {"name": BUCKET}, "object": {"key": key}}}]}
+
+
+def _records(*times):
+    return ("\n".join(json.dumps({"time_window_start": t}) for t in times) + "\n").encode("utf-8")
+
+
+@pytest.fixture
+def local_aws(monkeypatch):
+    s3, dynamodb = LocalS3(), LocalDynamoDb()
+    monkeypatch.setattr(landing_zone_index_lambda.aws_clients, "s3_client", s3)
+    monkeypatch.setattr(landing_zone_index_lambda.aws_clients, "dynamodb_client", dynamodb)
+    monkeypatch.setenv("INDEX_TABLE_NAME", "index")
+    return s3, dynamodb
+
+
+def _land(s3, key, body):
+    s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+    landing_zone_index_lambda.handler(_event("ObjectCreated:Put", key), None)
+
+
+def test_index_tracks_created_and_removed_objects(local_aws):
+    s3, dynamodb = local_aws
+    first = "sp-traffic/year=2024/month=05/day=01/hour=22/AmzStream-1"
+    second = "sp-traffic/year=2024/month=05/day=01/hour=22/compacted-1-0000.ndjson.gz"
+    _land(s3, first, _records("2024-05-01T21:00:00Z", "2024-05-01T22:00:00Z"))
+    _land(s3, second, gzip.compress(_records("2024-05-01T20:00:00Z")))
+    _land(s3, "sp-traffic/year=2024/month=05/day=01/hour=22/_compacted.json", b"{}")
+    _land(s3, "errors/sp-traffic/failure", b"{}")
+
+    index = PartitionIndex(dynamodb, "index")
+    objects = index.partition_objects("sp-traffic/year=2024/month=05/day=01/hour=22/")
+
+    assert [(o["key"], o["records"], o["minEventTime"]) for o in objects] == [
+        (first, 2, "2024-05-01T21:00:00Z"),
+        (second, 1, "2024-05-01T20:00:00Z"),
+    ]
+
+    landing_zone_index_lambda.handler(_event("ObjectRemoved:Delete", first), None)
+    assert [o["key"] for o in index.partition_objects("sp-traffic/year=2024/month=05/day=01/hour=22/")] == [second]
+
+
+def test_resolve_time_range_with_late_records(local_aws):
+    s3, dynamodb = local_aws
+    _land(s3, "sp-traffic/year=2024/month=05/day=01/hour=10/on-time", _records("2024-05-01T10:00:00Z"))
+    _land(s3, "sp-traffic/year=2024/month=05/day=01/hour=12/late", _records("2024-05-01T10:30:00Z"))
+    _land(s3, "sp-traffic/year=2024/month=05/day=01/hour=12/current", _records("2024-05-01T12:00:00Z"))
+
+    index = PartitionIndex(dynamodb, "index")
+    start, end = datetime(2024, 5, 1, 10), datetime(2024, 5, 1, 11)
+
+    assert [o["key"] for o in index.resolve("sp-traffic", start, end)] == [
+        "sp-traffic/year=2024/month=05/day=01/hour=10/on-time"
+    ]
+    assert [o["key"] for o in index.resolve("sp-traffic", start, end, max_lateness=timedelta(hours=2))] == [
+        "sp-traffic/year=2024/month=05/day=01/hour=10/on-time",
+        "sp-traffic/year=2024/month=05/day=01/hour=12/late",
+    ]
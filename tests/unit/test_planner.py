@@ -0,0 +1,108 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from typer.testing import CliRunner
+
+from amz_stream_cli import cli, planner
+from amz_stream_cli.stack_config import consumer_stacks
+
+CONFIG_TEXT = """ambassadors:
+  reviewerArn: arn:aws:iam::926844853897:role/ReviewerRole
+
+datasets:
+  NA:
+    - dataSetId: sp-traffic
+      snsSourceArn: arn:aws:sns:us-east-1:906013806264:*
+      expectedRecordsPerSecond: 2000
+      averageRecordBytes: 600
+      fanoutBatchSize: 10
+
+    - dataSetId: sp-conversion
+      snsSourceArn: arn:aws:sns:us-east-1:802324068763:*
+  EU:
+    - dataSetId: sp-traffic
+      snsSourceArn: arn:aws:sns:eu-west-1:668473351658:*
+      expectedRecordsPerSecond: 5
+consumerStackInstallationAwsRegion:
+  NA: us-east-1
+  EU: eu-west-1
+"""
+
+
+def _plans(**kwargs):
+    import yaml
+
+    return planner.plan(consumer_stacks(yaml.safe_load(CONFIG_TEXT)), **kwargs)
+
+
+def test_current_settings_are_modelled_with_the_stack_defaults():
+    estimate = planner.estimate(planner.Volume(2000, 600), planner.DEFAULT_SETTINGS)
+
+    assert estimate.messages_per_invocation == 10
+    assert estimate.invocations == 200
+    assert estimate.firehose_records == 2000
+    # a 5 MB buffer fills in about 4 seconds
+    assert 4 <= estimate.landing_delay_s <= 5
+    assert 800 <= estimate.s3_objects_per_hour <= 900
+
+
+def test_recommendations_scale_with_volume_and_respect_the_landing_delay():
+    high = planner.recommend(planner.Volume(2000, 600))
+    low = planner.recommend(planner.Volume(5, 600), max_landing_delay_s=300)
+
+    assert high["fanoutBatchingWindowSeconds"] == 1
+    assert high["fanoutBatchSize"] % planner.SNS_PUBLISH_BATCH_SIZE == 0
+    assert high["fanoutBatchSize"] <= planner.MAX_RECOMMENDED_BATCH_SIZE
+    assert high["firehoseBufferingSizeMB"] == planner.FIREHOSE_MAX_BUFFERING_SIZE_MB
+    assert low["fanoutBatchSize"] == 10 and low["fanoutBatchingWindowSeconds"] == 0
+    assert low["firehoseBufferingIntervalSeconds"] == 300
+
+
+def test_plan_skips_datasets_without_volume_and_recommends_fewer_invocations():
+    plans = _plans()
+
+    assert [dataset_plan.stack.stack_name for dataset_plan in plans] == [
+        "AmzStream-NA-sp-traffic",
+        "AmzStream-EU-sp-traffic",
+    ]
+    assert plans[0].recommended.invocations < plans[0].current.invocations
+    assert plans[0].recommended.s3_objects_per_hour < plans[0].current.s3_objects_per_hour
+
+
+def test_config_diff_updates_each_dataset_entry_in_place():
+    diff = planner.config_diff(CONFIG_TEXT, _plans())
+
+    assert "-      fanoutBatchSize: 10\n" in diff
+    # settings are added at the end of their entry, before the blank line separating it from the next one
+    assert (
+        "+      fanoutBatchSize: 100\n"
+        "+      fanoutBatchingWindowSeconds: 1\n"
+        "+      firehoseBufferingIntervalSeconds: 112\n"
+        "+      firehoseBufferingSizeMB: 128\n"
+        " \n"
+        "     - dataSetId: sp-conversion\n"
+    ) in diff
+    assert "       expectedRecordsPerSecond: 5\n+      firehoseBufferingIntervalSeconds: 900\n" in diff
+
+
+def test_plan_command_writes_the_diff(tmp_path):
+    config_path = tmp_path / "config.yml"
+    config_path.write_text(CONFIG_TEXT)
+
+    result = CliRunner().invoke(cli.app, ["plan", "--config", str(config_path), "--diff", "-a", "EU"])
+
+    assert result.exit_code == 0
+    assert result.stdout.startswith("--- a/")
+    assert "+      firehoseBufferingIntervalSeconds: 900" in result.stdout
+    assert "fanoutBatchSize" not in result.stdout
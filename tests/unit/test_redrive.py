@@ -0,0 +1,102 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+
+import pytest
+
+from amz_stream_cli.rate_limit import TokenBucket
+from amz_stream_cli.redrive import Redrive
+from tests.unit.local_aws import LocalSqs
+
+
+def _queues_with_dlq_backlog(data_messages, confirmations):
+    sqs = LocalSqs()
+    dlq_url = sqs.create_queue("dlq")
+    queue_url = sqs.create_queue("queue")
+    for i in range(data_messages):
+        sqs.send_message(dlq_url, json.dumps({"idempotency_id": str(i)}))
+    for i in range(confirmations):
+        sqs.send_message(dlq_url, json.dumps({"Type": "SubscriptionConfirmation", "Token": str(i)}))
+    return sqs, dlq_url, queue_url
+
+
+def test_redrive_moves_all_messages_with_parallel_receivers():
+    sqs, dlq_url, queue_url = _queues_with_dlq_backlog(data_messages=45, confirmations=0)
+
+    stats = Redrive(sqs, dlq_url, queue_url, TokenBucket(10000), wait_time_s=0).run(receivers=4)
+
+    assert stats.redriven == 45
+    assert len(sqs.queues[queue_url]["visible"]) == 45
+    assert sqs.get_queue_attributes(dlq_url, [])["Attributes"] == {
+        "ApproximateNumberOfMessages": "0",
+        "ApproximateNumberOfMessagesNotVisible": "0",
+    }
+
+
+def test_redrive_only_selected_message_types():
+    sqs, dlq_url, queue_url = _queues_with_dlq_backlog(data_messages=5, confirmations=3)
+
+    stats = Redrive(
+        sqs, dlq_url, queue_url, TokenBucket(10000), message_types=["SubscriptionConfirmation"], wait_time_s=0
+    ).run(receivers=2)
+
+    assert (stats.redriven, stats.skipped) == (3, 5)
+    assert len(sqs.queues[queue_url]["visible"]) == 3
+    assert len(sqs.queues[dlq_url]["visible"]) == 5
+
+
+def test_dry_run_counts_types_without_moving_messages():
+    sqs, dlq_url, queue_url = _queues_with_dlq_backlog(data_messages=5, confirmations=3)
+
+    stats = Redrive(sqs, dlq_url, queue_url, TokenBucket(10000), dry_run=True, wait_time_s=0).run(receivers=2)
+
+    assert stats.types == {"": 5, "SubscriptionConfirmation": 3}
+    assert stats.redriven == 0
+    assert not sqs.queues[queue_url]["visible"]
+    # the scanned messages are visible again once the dry run ends
+    assert sqs.get_queue_attributes(dlq_url, [])["Attributes"] == {
+        "ApproximateNumberOfMessages": "8",
+        "ApproximateNumberOfMessagesNotVisible": "0",
+    }
+
+
+def test_token_bucket_waits_for_refill():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate_per_s=10, clock=lambda: now[0], sleep=sleep)
+    bucket.acquire(10)
+    bucket.acquire(5)
+
+    assert sleeps == [0.5]
+
+
+def test_token_bucket_keeps_rates_below_the_batch_size():
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    bucket = TokenBucket(rate_per_s=2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(10):
+        bucket.acquire(10)
+
+    # the first batch is sent right away, each of the other nine waits for its ten tokens at two per second
+    assert now[0] == pytest.approx(45)
@@ -0,0 +1,161 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+from amz_stream_cli import compaction, landing_zone
+from amz_stream_cli.object_store import S3ObjectStore
+from amz_stream_cli.rate_limit import TokenBucket
+from amz_stream_cli.replay import Replay, ReplayCheckpoint, load_sns_publisher
+from tests.unit.local_aws import LocalS3, LocalSns
+
+BUCKET = "landing-zone"
+START = datetime(2024, 5, 1, 22)
+END = datetime(2024, 5, 2, 0)
+
+
+def _landing_zone_with_history():
+    s3 = LocalS3()
+    records = []
+    for hour in landing_zone.partition_hours(START, END):
+        prefix = landing_zone.partition_prefix("sp-traffic", hour)
+        for part in range(3):
+            lines = [json.dumps({"idempotency_id": f"{hour:%H}-{part}-{i}"}) for i in range(15)]
+            records.extend(lines)
+            body = ("\n".join(lines) + "\n").encode("utf-8")
+            key = f"{prefix}object-{part}"
+            if part == 0:
+                body, key = gzip.compress(body), key + ".gz"
+            s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+    prefixes = [landing_zone.partition_prefix("sp-traffic", hour) for hour in landing_zone.partition_hours(START, END)]
+    return s3, prefixes, records
+
+
+def _replay(s3, sns, checkpoint_path, sns_publisher=None):
+    return Replay(
+        s3,
+        sns,
+        BUCKET,
+        "arn:aws:sns:us-east-1:000000000000:topic",
+        TokenBucket(100000),
+        ReplayCheckpoint(str(checkpoint_path)),
+        sns_publisher=sns_publisher,
+        sleep=lambda s: None,
+    )
+
+
+def test_partition_prefixes_match_firehose_layout():
+    assert landing_zone.partition_prefix("sp-traffic", START) == "sp-traffic/year=2024/month=05/day=01/hour=22/"
+    assert landing_zone.partition_hour("sp-traffic/year=2024/month=05/day=01/hour=22/x.gz") == START
+    assert len(landing_zone.partition_hours(START, END)) == 2
+
+
+def test_replay_publishes_every_landed_record_tagged_as_replay(tmp_path):
+    s3, prefixes, records = _landing_zone_with_history()
+    sns = LocalSns()
+
+    stats = _replay(s3, sns, tmp_path / "checkpoint.json").run(prefixes, workers=2)
+
+    assert stats.published == len(records) == 90
+    assert sorted(entry["Message"] for entry in sns.published) == sorted(record + "\n" for record in records)
+    assert all("amz_stream_replay" in entry["MessageAttributes"] for entry in sns.published)
+
+
+def test_replay_after_compaction_skips_the_partition_manifests(tmp_path):
+    s3, prefixes, records = _landing_zone_with_history()
+    for prefix in prefixes:
+        assert compaction.PartitionCompactor(S3ObjectStore(s3, BUCKET)).compact(prefix) is not None
+    sns = LocalSns()
+
+    stats = _replay(s3, sns, tmp_path / "checkpoint.json").run(prefixes, workers=2)
+
+    assert stats.published == len(records)
+    assert sorted(entry["Message"] for entry in sns.published) == sorted(record + "\n" for record in records)
+
+
+def test_interrupted_replay_resumes_without_republishing(tmp_path):
+    s3, prefixes, records = _landing_zone_with_history()
+    sns = LocalSns()
+    sns_publisher = load_sns_publisher()
+
+    class InterruptedPublisher:
+        MAX_BATCH_SIZE = sns_publisher.MAX_BATCH_SIZE
+        MAX_BATCH_PAYLOAD_BYTES = sns_publisher.MAX_BATCH_PAYLOAD_BYTES
+        REPLAY_ATTRIBUTE = sns_publisher.REPLAY_ATTRIBUTE
+        to_sns_message = staticmethod(sns_publisher.to_sns_message)
+        calls = 0
+
+        @classmethod
+        def publish_batch(cls, *args, **kwargs):
+            cls.calls += 1
+            if cls.calls == 4:
+                raise KeyboardInterrupt()
+            return sns_publisher.publish_batch(*args, **kwargs)
+
+    with pytest.raises(KeyboardInterrupt):
+        _replay(s3, sns, tmp_path / "checkpoint.json", InterruptedPublisher).run(prefixes[:1], workers=1)
+    _replay(s3, sns, tmp_path / "checkpoint.json").run(prefixes, workers=2)
+
+    assert sorted(entry["Message"] for entry in sns.published) == sorted(record + "\n" for record in records)
+
+
+def test_replay_skips_latency_canaries_but_counts_their_lines(tmp_path):
+    s3 = LocalS3()
+    prefix = landing_zone.partition_prefix("sp-traffic", START)
+    lines = []
+    for i in range(12):
+        lines.append(json.dumps({"idempotency_id": str(i)}))
+        if i % 4 == 0:
+            lines.append(json.dumps({"amz_stream_canary": f"c{i}", "injectedAt": 0}))
+    s3.put_object(Bucket=BUCKET, Key=prefix + "object", Body="\n".join(lines) + "\n")
+    sns = LocalSns()
+    replay = _replay(s3, sns, tmp_path / "checkpoint.json")
+    offsets = []
+    replay.checkpoint.advance = lambda key, read_lines: offsets.append(read_lines)
+
+    replay.replay_object(prefix + "object")
+
+    assert len(sns.published) == 12
+    assert not any("amz_stream_canary" in entry["Message"] for entry in sns.published)
+    assert offsets == [13, 15]
+
+
+def test_records_failing_to_publish_are_retried_by_the_next_run(tmp_path):
+    s3, prefixes, records = _landing_zone_with_history()
+    failing_record = json.dumps({"idempotency_id": "22-1-7"})
+
+    class FailingSns(LocalSns):
+        def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+            failed = [entry for entry in PublishBatchRequestEntries if entry["Message"] == failing_record + "\n"]
+            super().publish_batch(TopicArn, [entry for entry in PublishBatchRequestEntries if entry not in failed])
+            return {
+                "Successful": [{"Id": entry["Id"]} for entry in PublishBatchRequestEntries if entry not in failed],
+                "Failed": [{"Id": entry["Id"], "Code": "InternalError", "SenderFault": False} for entry in failed],
+            }
+
+    first_sns, second_sns = FailingSns(), LocalSns()
+    first = _replay(s3, first_sns, tmp_path / "checkpoint.json").run(prefixes, workers=2)
+    second = _replay(s3, second_sns, tmp_path / "checkpoint.json").run(prefixes, workers=2)
+
+    assert first.failed == 1
+    assert failing_record + "\n" not in [entry["Message"] for entry in first_sns.published]
+    assert failing_record + "\n" in [entry["Message"] for entry in second_sns.published]
+    assert second.failed == 0
+    published = {entry["Message"] for entry in first_sns.published + second_sns.published}
+    assert published == {record + "\n" for record in records}
@@ -0,0 +1,189 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import re
+from decimal import Decimal
+
+import pytest
+
+import rollup_emit_lambda
+import rollup_lambda
+from tests.unit.local_aws import LocalDynamoDb, LocalS3
+
+
+class TransactionCanceledException(Exception):
+    pass
+
+
+class LocalRollupTables(LocalDynamoDb):
+    """Stand-in for the records and rollups tables, evaluating the transactions of rollup_lambda."""
+
+    class exceptions:
+        TransactionCanceledException = TransactionCanceledException
+
+    def __init__(self):
+        super().__init__()
+        self.records = {}
+        self.before_transaction = None
+
+    def get_item(self, TableName, Key, ConsistentRead=False):
+        item = self.records.get(Key["id"]["S"])
+        return {"Item": item} if item else {}
+
+    def transact_write_items(self, TransactItems):
+        if self.before_transaction:
+            hook, self.before_transaction = self.before_transaction, None
+            hook()
+        put = TransactItems[0]["Put"]
+        current = self.records.get(put["Item"]["id"]["S"])
+        if put["ConditionExpression"] == "attribute_not_exists(#id)":
+            if current is not None:
+                raise TransactionCanceledException()
+        elif current is None or current["revision"] != put["ExpressionAttributeValues"][":revision"]:
+            raise TransactionCanceledException()
+        self.records[put["Item"]["id"]["S"]] = put["Item"]
+
+        for entry in TransactItems[1:]:
+            update = entry["Update"]
+            item = self.items.setdefault(self._key(update["Key"]), dict(update["Key"]))
+            names, values = update["ExpressionAttributeNames"], update["ExpressionAttributeValues"]
+            add, assign = re.match(r"ADD (.*) SET (.*)", update["UpdateExpression"]).groups()
+            for clause in add.split(", "):
+                name, value = clause.split(" ")
+                total = Decimal(item.get(names[name], {"N": "0"})["N"]) + Decimal(values[value]["N"])
+                item[names[name]] = {"N": str(total)}
+            for clause in assign.split(", "):
+                name, value = clause.split(" = ")
+                item[names[name]] = values[value]
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    tables = LocalRollupTables()
+    monkeypatch.setattr(rollup_lambda.aws_clients, "dynamodb_client", tables)
+    monkeypatch.setenv("DATA_SET_ID", "sp-conversion")
+    monkeypatch.setenv("ROLLUP_RECORDS_TABLE_NAME", "records")
+    monkeypatch.setenv("ROLLUPS_TABLE_NAME", "rollups")
+    monkeypatch.setenv("ROLLUP_SHARDS", "4")
+    monkeypatch.setenv("ROLLUP_METRIC_FIELDS", "attributed_conversions_1d,attributed_sales_1d")
+    return tables
+
+
+def _conversion(idempotency_id, campaign_id, conversions, sales, hour="2024-05-01T22"):
+    return {
+        "idempotency_id": idempotency_id,
+        "advertiser_id": "ADV1",
+        "campaign_id": campaign_id,
+        "time_window_start": f"{hour}:00:00.000Z",
+        "attributed_conversions_1d": conversions,
+        "attributed_sales_1d": sales,
+    }
+
+
+def _event(*records):
+    return {"Records": [{"messageId": str(i), "body": json.dumps(record)} for i, record in enumerate(records)]}
+
+
+def _rollups(tables):
+    return {
+        (item["hour"]["S"], item["campaign_id"]["S"]): (
+            float(item["attributed_conversions_1d"]["N"]),
+            float(item["attributed_sales_1d"]["N"]),
+            int(item["records"]["N"]),
+        )
+        for item in tables.items.values()
+    }
+
+
+def test_duplicates_and_late_revisions_are_applied_once(tables):
+    result = rollup_lambda.handler(
+        _event(
+            _conversion("a", "C1", 1, 10.5),
+            _conversion("b", "C1", 2, 20.0),
+            _conversion("a", "C1", 1, 10.5),
+            _conversion("c", "C2", 1, 5.0),
+        ),
+        None,
+    )
+    assert result == {"batchItemFailures": []}
+
+    # a conversion attributed later revises record "a", redelivery of the revision changes nothing
+    rollup_lambda.handler(_event(_conversion("a", "C1", 3, 31.5), _conversion("a", "C1", 3, 31.5)), None)
+
+    assert _rollups(tables) == {
+        ("2024-05-01T22", "C1"): (5.0, 51.5, 2),
+        ("2024-05-01T22", "C2"): (1.0, 5.0, 1),
+    }
+
+
+def test_concurrent_revision_is_retried_against_the_new_revision(tables):
+    rollup_lambda.handler(_event(_conversion("a", "C1", 1, 10.0)), None)
+    tables.before_transaction = lambda: rollup_lambda.apply_record(
+        _conversion("a", "C1", 2, 20.0), "records", "rollups", ["attributed_conversions_1d", "attributed_sales_1d"], 4
+    )
+
+    rollup_lambda.handler(_event(_conversion("a", "C1", 4, 40.0)), None)
+
+    assert _rollups(tables) == {("2024-05-01T22", "C1"): (4.0, 40.0, 1)}
+    assert tables.records["a"]["revision"] == {"N": "3"}
+
+
+def test_emit_writes_one_compact_object_per_changed_hour(tables, monkeypatch):
+    rollup_lambda.handler(
+        _event(
+            _conversion("a", "C2", 1, 10.0),
+            _conversion("b", "C1", 2, 20.0),
+            _conversion("c", "C1", 1, 1.0, hour="2024-05-01T23"),
+            _conversion("c", "C1", 1, 1.0, hour="2024-05-02T00"),
+        ),
+        None,
+    )
+    s3 = LocalS3()
+    monkeypatch.setattr(rollup_emit_lambda.aws_clients, "s3_client", s3)
+    monkeypatch.setenv("ROLLUP_BUCKET_NAME", "lz")
+    monkeypatch.setenv("ROLLUP_PREFIX", "rollups/sp-conversion/")
+    stream_event = {
+        "Records": [{"dynamodb": {"Keys": {"partition": {"S": p}, "key": {"S": k}}}} for p, k in tables.items]
+    }
+
+    result = rollup_emit_lambda.handler(stream_event, None)
+
+    assert result["written"] == [
+        "rollups/sp-conversion/year=2024/month=05/day=01/hour=22/rollup.ndjson",
+        "rollups/sp-conversion/year=2024/month=05/day=01/hour=23/rollup.ndjson",
+        "rollups/sp-conversion/year=2024/month=05/day=02/hour=00/rollup.ndjson",
+    ]
+    hour_22 = [json.loads(line) for line in s3.objects[("lz", result["written"][0])].decode().splitlines()]
+    assert hour_22 == [
+        {
+            "advertiser_id": "ADV1",
+            "campaign_id": "C1",
+            "hour": "2024-05-01T22:00:00Z",
+            "attributed_conversions_1d": 2,
+            "attributed_sales_1d": 20,
+            "records": 1,
+        },
+        {
+            "advertiser_id": "ADV1",
+            "campaign_id": "C2",
+            "hour": "2024-05-01T22:00:00Z",
+            "attributed_conversions_1d": 1,
+            "attributed_sales_1d": 10,
+            "records": 1,
+        },
+    ]
+    # the record revised into the next day leaves an empty rollup behind
+    assert s3.objects[("lz", result["written"][1])] == b""
@@ -0,0 +1,99 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import tracemalloc
+
+import sqs_consuming_lambda as sqs_lambda
+
+BODY_SIZE = 64 * 1024
+MAX_BATCH_SIZE = 10
+
+
+def _event(count):
+    return {
+        "Records": [
+            {"messageId": str(i), "body": json.dumps({"idempotency_id": str(i), "payload": "x" * BODY_SIZE})}
+            for i in range(count)
+        ]
+    }
+
+
+def _decode_and_fail_odd(messages_batch, batch_failures, error_handler):
+    for message in messages_batch:
+        if int(sqs_lambda.get_message_body(message)["idempotency_id"]) % 2:
+            batch_failures.append(message)
+
+
+def _handler_memory(event_size, entire_batch_callback):
+    """
+    Returns the result of the handler, the memory allocated for the event, the peak memory above it while
+    handling the event, and the memory still held once the handler returned
+    """
+    tracemalloc.start()
+    try:
+        event = _event(event_size)
+        event_memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = sqs_lambda.batch_handler(event, entire_batch_callback)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, event_memory, peak - event_memory, retained
+
+
+def test_memory_is_bounded_by_batch_size_and_bodies_are_released():
+    def on_entire_batch(all_messages, batch_failures):
+        sqs_lambda.process_messages_in_batches(
+            all_messages, lambda x: True, _decode_and_fail_odd, batch_failures, MAX_BATCH_SIZE
+        )
+
+    result, event_memory, peak_above_event, retained = _handler_memory(400, on_entire_batch)
+
+    assert result["batchItemFailures"][:2] == [{"itemIdentifier": "1"}, {"itemIdentifier": "3"}]
+    assert len(result["batchItemFailures"]) == 200
+    assert event_memory > 400 * BODY_SIZE
+    # processing a 25MB event needs no more than a couple of batches on top of it
+    assert peak_above_event < 2 * MAX_BATCH_SIZE * BODY_SIZE
+    # processed bodies are freed, failures are tracked by message id only
+    assert retained < event_memory / 20
+
+
+def test_routed_messages_are_processed_as_route_batches_fill():
+    processed = []
+
+    def on_route(route):
+        def callback(messages_batch, batch_failures, error_handler):
+            processed.append((route, [message["messageId"] for message in messages_batch]))
+            if route == "odd":
+                raise ValueError("route down")
+
+        return callback
+
+    def on_entire_batch(all_messages, batch_failures):
+        sqs_lambda.process_routed_messages(
+            all_messages,
+            lambda message: "odd" if int(message["messageId"]) % 2 else "even",
+            {"even": on_route("even"), "odd": on_route("odd")},
+            batch_failures,
+            max_batch_size=2,
+        )
+
+    event = {"Records": [{"messageId": str(i), "body": "{}"} for i in range(5)]}
+    result = sqs_lambda.batch_handler(event, on_entire_batch)
+
+    assert processed == [("even", ["0", "2"]), ("odd", ["1", "3"]), ("even", ["4"])]
+    assert result == {"batchItemFailures": [{"itemIdentifier": "1"}, {"itemIdentifier": "3"}]}
+    assert event["Records"] == []
@@ -0,0 +1,111 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import stat
+from types import SimpleNamespace
+
+import requests
+
+from amz_stream_cli import api_session
+from amz_stream_cli.api_session import TokenCache, send_with_retries
+from amz_stream_cli.stream_api import Stream
+
+CREDENTIALS = {
+    "refresh_token": "refresh-token",
+    "client_id": "client-id",
+    "client_secret": "client-secret",
+    "profile_id": "profile-id",
+}
+
+
+def _response(status_code, headers=None):
+    return SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def test_token_cache_round_trip_with_owner_only_permissions(tmp_path):
+    now = [1000.0]
+    cache = TokenCache(str(tmp_path), clock=lambda: now[0])
+    cache.put(CREDENTIALS, "token", expires_in=3600)
+
+    (cache_file,) = tmp_path.iterdir()
+    assert stat.S_IMODE(os.stat(cache_file).st_mode) == 0o600
+    assert cache.get(CREDENTIALS) == "token"
+
+    now[0] += 3600 - api_session.TOKEN_EXPIRY_SKEW_S
+    assert cache.get(CREDENTIALS) is None
+
+
+def test_token_cache_ignores_files_readable_by_others(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    cache.put(CREDENTIALS, "token", expires_in=3600)
+    (cache_file,) = tmp_path.iterdir()
+    os.chmod(cache_file, 0o644)
+
+    assert cache.get(CREDENTIALS) is None
+
+
+def test_retries_throttled_requests_honouring_retry_after():
+    responses = iter([_response(429, {"Retry-After": "2"}), _response(503), _response(200)])
+    sleeps = []
+
+    response = send_with_retries(lambda: next(responses), sleep=sleeps.append)
+
+    assert response.status_code == 200
+    assert sleeps[0] == 2.0
+    assert 0 <= sleeps[1] <= api_session.DEFAULT_BASE_DELAY_S * 2
+
+
+def test_gives_up_after_max_retries():
+    calls = []
+
+    def send():
+        calls.append(1)
+        return _response(429)
+
+    response = send_with_retries(send, max_retries=2, sleep=lambda s: None)
+
+    assert response.status_code == 429
+    assert len(calls) == 3
+
+
+def test_retries_connection_errors():
+    attempts = iter([requests.exceptions.ConnectionError(), _response(200)])
+
+    def send():
+        outcome = next(attempts)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert send_with_retries(send, sleep=lambda s: None).status_code == 200
+
+
+def test_stream_reuses_cached_access_token(tmp_path, monkeypatch):
+    cache = TokenCache(str(tmp_path))
+    exchanges = []
+
+    def get_auth():
+        exchanges.append(1)
+        return SimpleNamespace(access_token="fresh-token", expires_in=3600)
+
+    first = Stream(credentials=CREDENTIALS, token_cache=cache)
+    monkeypatch.setattr(first._auth, "get_auth", get_auth)
+    assert first.auth.access_token == "fresh-token"
+
+    second = Stream(credentials=CREDENTIALS, token_cache=cache)
+    monkeypatch.setattr(second._auth, "get_auth", get_auth)
+    assert second.auth.access_token == "fresh-token"
+    assert len(exchanges) == 1
@@ -0,0 +1,89 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+
+import pytest
+
+import record_validation
+import stream_fanout_lambda
+from amz_stream_cli.stream_types import DataSet
+from tests.unit.local_aws import LocalSns, LocalSqs
+
+
+def _traffic(**overrides):
+    record = {
+        "idempotency_id": "a",
+        "dataset_id": "sp-traffic",
+        "marketplace_id": "ATVPDKIKX0DER",
+        "advertiser_id": "ADV1",
+        "campaign_id": "C1",
+        "time_window_start": "2024-05-01T22:00:00.000Z",
+        "impressions": 10,
+        "clicks": 1,
+        "cost": 0.5,
+    }
+    record.update(overrides)
+    return record
+
+
+@pytest.fixture
+def fanout(monkeypatch):
+    sns, sqs = LocalSns(), LocalSqs()
+    monkeypatch.setattr(stream_fanout_lambda.aws_clients, "sns_client", sns)
+    monkeypatch.setattr(stream_fanout_lambda.aws_clients, "sqs_client", sqs)
+    monkeypatch.setenv("DATA_SET_ID", "sp-traffic")
+    monkeypatch.setenv("DATA_FANOUT_TOPIC_ARN", "arn:aws:sns:us-east-1:000000000000:fanout")
+    monkeypatch.setenv("SUBSCRIPTION_CONFIRMATION_QUEUE_URL", sqs.create_queue("confirmation"))
+    monkeypatch.setenv("QUARANTINE_QUEUE_URL", sqs.create_queue("quarantine"))
+    return sns, sqs
+
+
+def test_invalid_records_are_quarantined_in_the_same_pass(fanout):
+    sns, sqs = fanout
+    bodies = [
+        json.dumps(_traffic()),
+        json.dumps({"Type": "SubscriptionConfirmation", "Token": "t"}),
+        json.dumps(_traffic(clicks="1")),
+        json.dumps(_traffic(campaign_id=None)),
+        "{not json",
+        json.dumps(_traffic(idempotency_id="b")),
+    ]
+    event = {"Records": [{"messageId": str(i), "body": body} for i, body in enumerate(bodies)]}
+
+    assert stream_fanout_lambda.handler(event, None) == {"batchItemFailures": []}
+
+    assert [json.loads(entry["Message"])["idempotency_id"] for entry in sns.published] == ["a", "b"]
+    assert len(sqs.queues["https://sqs.local/000000000000/confirmation"]["visible"]) == 1
+    quarantined = sqs.queues["https://sqs.local/000000000000/quarantine"]["visible"]
+    assert [message["MessageAttributes"]["reason"]["StringValue"] for message in quarantined] == [
+        "field clicks is not a number",
+        "missing field campaign_id",
+        "body is not valid JSON",
+    ]
+    assert [message["Body"] for message in quarantined] == bodies[2:5]
+
+
+def test_every_dataset_has_a_validator():
+    assert set(record_validation.DATASET_SCHEMAS) == {data_set.value for data_set in DataSet}
+
+
+def test_booleans_are_not_numbers():
+    validate = record_validation.validator_for("sp-traffic")
+    assert validate(_traffic()) is None
+    assert validate(_traffic(impressions=True)) == "field impressions is not a number"
+    assert validate([_traffic()]) == "record is not a JSON object"
+    assert record_validation.validator_for("new-dataset")({"any": "field"}) is None
+
@@ -0,0 +1,114 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import logging
+import threading
+import time
+
+import pytest
+
+import subscription_confirmation_lambda
+
+
+class SlowSns:
+    """Confirms subscriptions after a delay and records the confirmations running at the same time."""
+
+    def __init__(self, delay_s=0.05, failing_topics=()):
+        self.delay_s = delay_s
+        self.failing_topics = set(failing_topics)
+        self.confirmed = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def confirm_subscription(self, TopicArn, Token):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay_s)
+        with self._lock:
+            self.running -= 1
+            if TopicArn in self.failing_topics:
+                raise RuntimeError("AuthorizationError")
+            self.confirmed.append((TopicArn, Token))
+        return {"SubscriptionArn": f"{TopicArn}:subscription"}
+
+
+def _event(*topic_tokens):
+    return {
+        "Records": [
+            {
+                "messageId": str(i),
+                "body": json.dumps({"Type": "SubscriptionConfirmation", "TopicArn": topic, "Token": token}),
+            }
+            for i, (topic, token) in enumerate(topic_tokens)
+        ]
+    }
+
+
+@pytest.fixture
+def sns(monkeypatch):
+    sns = SlowSns(failing_topics=["arn:aws:sns:us-east-1:000000000000:denied"])
+    monkeypatch.setattr(subscription_confirmation_lambda.aws_clients, "sns_client", sns)
+    monkeypatch.setattr(
+        subscription_confirmation_lambda, "confirmed_cache", subscription_confirmation_lambda.ConfirmedCache()
+    )
+    return sns
+
+
+def test_confirmations_run_concurrently_once_per_topic_and_token(sns, caplog):
+    topics = [(f"arn:aws:sns:us-east-1:000000000000:topic-{i}", f"token-{i}") for i in range(8)]
+    caplog.set_level(logging.INFO, logger="subscription_confirmation")
+
+    result = subscription_confirmation_lambda.handler(_event(*topics, topics[0]), None)
+    # SNS resends the confirmations of a re-requested subscription to the warm container
+    subscription_confirmation_lambda.handler(_event(topics[1]), None)
+
+    assert result == {"batchItemFailures": []}
+    assert sorted(sns.confirmed) == sorted(topics)
+    assert sns.max_running > 1
+    outcomes = [json.loads(record.message) for record in caplog.records]
+    assert {entry["outcome"] for entry in outcomes} == {"confirmed", "already-confirmed"}
+    assert outcomes[0]["messageIds"] == ["0", "8"]
+    assert outcomes[-1] == {
+        "event": "subscription_confirmation",
+        "topicArn": topics[1][0],
+        "outcome": "already-confirmed",
+        "messageIds": ["0"],
+    }
+    assert not any("token-" in record.message for record in caplog.records)
+
+
+def test_failed_and_invalid_confirmations_are_batch_failures(sns):
+    event = _event(("arn:aws:sns:us-east-1:000000000000:denied", "t"), ("arn:aws:sns:us-east-1:000000000000:ok", "t"))
+    event["Records"].append({"messageId": "2", "body": json.dumps({"Type": "SubscriptionConfirmation"})})
+
+    result = subscription_confirmation_lambda.handler(event, None)
+
+    assert result == {"batchItemFailures": [{"itemIdentifier": "2"}, {"itemIdentifier": "0"}]}
+    assert sns.confirmed == [("arn:aws:sns:us-east-1:000000000000:ok", "t")]
+
+
+def test_confirmed_cache_expires_and_evicts():
+    now = [0.0]
+    cache = subscription_confirmation_lambda.ConfirmedCache(max_size=2, ttl_s=60, clock=lambda: now[0])
+    cache.add(("a", "1"))
+    cache.add(("b", "1"))
+    cache.add(("c", "1"))
+    assert ("a", "1") not in cache
+    assert ("b", "1") in cache
+    now[0] = 61.0
+    assert ("c", "1") not in cache
@@ -0,0 +1,108 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import json
+
+import pytest
+
+import sqs_consuming_lambda as sqs_lambda
+import stream_fanout_lambda
+import tracing
+from tests.unit.local_aws import LocalSns, LocalSqs
+from tests.unit.test_stream_fanout import _traffic
+
+
+class ListEmitter:
+    def __init__(self):
+        self.documents = []
+
+    def emit(self, document):
+        self.documents.append(document)
+
+
+def _use_tracer(monkeypatch, sample_rate):
+    emitter = ListEmitter()
+    tracer = tracing.Tracer(sample_rate, emitter, "fanout")
+    monkeypatch.setattr(tracing, "get_tracer", lambda: tracer)
+    return emitter
+
+
+@pytest.fixture
+def fanout(monkeypatch):
+    sns, sqs = LocalSns(), LocalSqs()
+    monkeypatch.setattr(stream_fanout_lambda.aws_clients, "sns_client", sns)
+    monkeypatch.setattr(stream_fanout_lambda.aws_clients, "sqs_client", sqs)
+    monkeypatch.setenv("DATA_SET_ID", "sp-traffic")
+    monkeypatch.setenv("DATA_FANOUT_TOPIC_ARN", "arn:aws:sns:us-east-1:000000000000:fanout")
+    monkeypatch.setenv("SUBSCRIPTION_CONFIRMATION_QUEUE_URL", sqs.create_queue("confirmation"))
+    monkeypatch.setenv("QUARANTINE_QUEUE_URL", sqs.create_queue("quarantine"))
+    return sns
+
+
+def _event(count, message_attributes=None):
+    return {
+        "Records": [
+            {
+                "messageId": str(i),
+                "body": json.dumps(_traffic(idempotency_id=str(i))),
+                "attributes": {"SentTimestamp": "1714600000000"},
+                "messageAttributes": message_attributes or {},
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def test_unsampled_invocations_record_nothing(fanout, monkeypatch):
+    emitter = _use_tracer(monkeypatch, 0)
+
+    stream_fanout_lambda.handler(_event(12), None)
+
+    assert emitter.documents == []
+    assert all("MessageAttributes" not in entry for entry in fanout.published)
+
+
+def test_sampled_fanout_traces_each_route_batch_and_propagates_context_to_sns(fanout, monkeypatch):
+    emitter = _use_tracer(monkeypatch, 1)
+    monkeypatch.setenv("_X_AMZN_TRACE_ID", "Root=1-66325f00-0123456789abcdef01234567;Parent=53995c3f42cd8ad8;Sampled=1")
+
+    stream_fanout_lambda.handler(_event(12), None)
+
+    spans = {document["name"]: document for document in emitter.documents if document["name"] != "route:data"}
+    route_spans = [document for document in emitter.documents if document["name"] == "route:data"]
+    handler_span = spans["batch_handler"]
+    assert handler_span["trace_id"] == "1-66325f00-0123456789abcdef01234567"
+    assert handler_span["parent_id"] == "53995c3f42cd8ad8"
+    assert handler_span["annotations"]["messages"] == 12
+    assert handler_span["annotations"]["oldest_message_age_ms"] > 0
+    assert spans["process_routed_messages"]["parent_id"] == handler_span["id"]
+    assert [span["annotations"]["messages"] for span in route_spans] == [10, 2]
+
+    headers = {entry["MessageAttributes"][tracing.TRACE_ATTRIBUTE]["StringValue"] for entry in fanout.published}
+    assert headers == {
+        f"Root=1-66325f00-0123456789abcdef01234567;Parent={span['id']};Sampled=1" for span in route_spans
+    }
+
+
+def test_subscribers_continue_the_trace_of_the_publisher(monkeypatch):
+    emitter = _use_tracer(monkeypatch, 0)
+    header = "Root=1-66325f00-0123456789abcdef01234567;Parent=a1b2c3d4e5f60718;Sampled=1"
+    event = _event(1, {tracing.TRACE_ATTRIBUTE: {"stringValue": header, "dataType": "String"}})
+
+    sqs_lambda.batch_handler(event, lambda messages, failures: list(messages))
+
+    [segment] = emitter.documents
+    assert segment["trace_id"] == "1-66325f00-0123456789abcdef01234567"
+    assert segment["parent_id"] == "a1b2c3d4e5f60718"
+    assert segment["name"] == "fanout" and "type" not in segment